@@ -0,0 +1,81 @@
+"""Measure metadata journal appends, group commit and warm restart time.
+
+Builds a catalog of N objects, snapshots it, appends a journal tail and
+times reopening the journal (snapshot load plus tail replay). Then runs
+several committing writers at once to show how many records each fsync
+covers.
+
+    python benchmarks/bench_journal.py [objects] [tail_records]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.metadata_journal import MetadataJournal
+
+def object_record(i: int) -> dict:
+    return {'filename': f'file-{i}.bin', 'file_size': 1024 * (i % 4096), 'chunks': 1 + i % 8,
+            'node_id': f'node-{i % 3 + 1:02d}', 'upload_time': '2026-10-17T12:00:00'}
+
+def build(directory: str, objects: int, tail: int) -> float:
+    """Fill a journal, snapshot it and leave a tail of unsnapshotted records; returns append rate"""
+    journal = MetadataJournal(directory, snapshot_every=objects + tail + 1)
+    started = time.perf_counter()
+    for i in range(objects):
+        journal.put('files', f'{i:032x}', object_record(i))
+    rate = objects / (time.perf_counter() - started)
+    journal.snapshot()
+
+    for i in range(tail):
+        journal.put('files', f'{i:032x}', {**object_record(i), 'downloads': 1})
+    journal.close()
+    return rate
+
+def concurrent_commits(directory: str, writers: int, records: int) -> dict:
+    """Writers that each wait for their own record to be durable"""
+    journal = MetadataJournal(directory)
+
+    def write(writer):
+        for i in range(records):
+            journal.commit(journal.put('nodes', f'{writer}-{i}', {'status': 'active'}))
+
+    threads = [threading.Thread(target=write, args=(writer,)) for writer in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stats = journal.get_stats()
+    journal.close()
+    return {'commits_per_s': writers * records / elapsed, 'records_per_fsync': stats['records_per_fsync']}
+
+def main():
+    objects = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    tail = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    directory = tempfile.mkdtemp(prefix='journal-bench-')
+    try:
+        rate = build(os.path.join(directory, 'catalog'), objects, tail)
+        print(f"appends: {rate:,.0f} records/s")
+
+        started = time.perf_counter()
+        journal = MetadataJournal(os.path.join(directory, 'catalog'))
+        elapsed = time.perf_counter() - started
+        stats = journal.get_stats()
+        journal.close()
+        print(f"restart: {stats['keys']:,} objects, {stats['recovered_records']:,} replayed in {elapsed * 1000:.0f} ms")
+
+        for writers in (1, 8, 32):
+            result = concurrent_commits(os.path.join(directory, f'commits-{writers}'), writers, 200)
+            print(f"{writers:>3} writers: {result['commits_per_s']:>9,.0f} durable commits/s, "
+                  f"{result['records_per_fsync']:.1f} records per fsync")
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Simulate replica placement policies under bursty writes to heterogeneous nodes.
+
+Each node is a FIFO server with exponential write times; one node is
+several times slower than the rest and one is nearly full. Chunks arrive
+as a Poisson stream with periodic bursts and are written to
+replication_factor nodes; a chunk is stored when its last replica is.
+Load-aware placement learns from the simulated completions exactly as the
+distribution layer does from real writes (queued writes plus a moving
+average of write time).
+
+    python benchmarks/bench_placement.py [seconds] [seed]
+"""
+import os
+import sys
+import heapq
+import random
+import hashlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.node_load import NodeLoadTracker
+from utils.placement import RandomPlacement, RendezvousPlacement, LoadAwarePlacement
+
+NODES = 8
+REPLICATION = 2
+WRITE_TIME = 0.010          # mean seconds per replica write on a normal node
+SLOW_FACTOR = 3             # node-01 writes this many times slower
+BASE_RATE = 120             # chunks per second between bursts
+BURST_RATE = 450            # chunks per second during a burst
+BURST_EVERY = 5.0
+BURST_LENGTH = 0.5
+
+def make_nodes() -> list:
+    nodes = [{'node_id': f'node-{i + 1:02d}', 'storage_used': 0, 'storage_limit': 100} for i in range(NODES)]
+    nodes[-1]['storage_used'] = 90
+    return nodes
+
+def arrivals(seconds: float, rng: random.Random):
+    """Chunk arrival times: Poisson at BASE_RATE, BURST_RATE during bursts"""
+    t = 0.0
+    while True:
+        rate = BURST_RATE if t % BURST_EVERY < BURST_LENGTH else BASE_RATE
+        t += rng.expovariate(rate)
+        if t >= seconds:
+            return
+        yield t
+
+def simulate(policy, tracker: NodeLoadTracker, seconds: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    random.seed(seed)
+    nodes = make_nodes()
+    mean = {n['node_id']: WRITE_TIME * (SLOW_FACTOR if n['node_id'] == 'node-01' else 1) for n in nodes}
+    free_at = {n['node_id']: 0.0 for n in nodes}
+    writes = {n['node_id']: 0 for n in nodes}
+    completions = []        # (finish time, node_id, service time)
+    latencies = []
+
+    for i, now in enumerate(arrivals(seconds, rng)):
+        while completions and completions[0][0] <= now:
+            _, node_id, service = heapq.heappop(completions)
+            tracker.end_write(node_id)
+            tracker.record(node_id, service)
+
+        key = hashlib.blake2b(str(i).encode(), digest_size=16).hexdigest()
+        finished = now
+        for node in policy.select(key, nodes, REPLICATION):
+            node_id = node['node_id']
+            service = rng.expovariate(1 / mean[node_id])
+            start = max(now, free_at[node_id])
+            free_at[node_id] = start + service
+            tracker.begin_write(node_id)
+            heapq.heappush(completions, (free_at[node_id], node_id, service))
+            writes[node_id] += 1
+            finished = max(finished, free_at[node_id])
+        latencies.append(finished - now)
+
+    latencies.sort()
+    total = sum(writes.values())
+    return {
+        'p50': percentile(latencies, 50),
+        'p99': percentile(latencies, 99),
+        'p999': percentile(latencies, 99.9),
+        'slow_share': writes['node-01'] / total,
+        'full_share': writes[nodes[-1]['node_id']] / total
+    }
+
+def percentile(values: list, p: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 60
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+    print(f"{NODES} nodes, node-01 {SLOW_FACTOR}x slower, node-{NODES:02d} 90% full, "
+          f"{BASE_RATE}/s chunks with {BURST_RATE}/s bursts, {seconds:.0f} s simulated")
+    print(f"{'policy':<12} {'p50 ms':>8} {'p99 ms':>8} {'p99.9 ms':>9} {'slow node':>10} {'full node':>10}")
+    for name, make in (('random', lambda t: RandomPlacement()),
+                       ('rendezvous', lambda t: RendezvousPlacement()),
+                       ('load_aware', lambda t: LoadAwarePlacement(t, rng=random.Random(seed)))):
+        tracker = NodeLoadTracker()
+        result = simulate(make(tracker), tracker, seconds, seed)
+        print(f"{name:<12} {result['p50'] * 1000:>8.1f} {result['p99'] * 1000:>8.1f} {result['p999'] * 1000:>9.1f} "
+              f"{result['slow_share']:>10.1%} {result['full_share']:>10.1%}")
+
+if __name__ == '__main__':
+    main()
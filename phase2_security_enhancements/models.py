@@ -3,6 +3,8 @@ import os
 from datetime import datetime
 from typing import List, Dict, Optional
 
+from utils.metadata_store import open_metadata_store
+
 class UserModel:
     """User data model for secure mode"""
 
@@ -87,22 +89,15 @@ class UserModel:
 class FileModel:
     """File metadata model for secure mode"""
 
-    def __init__(self, metadata_file: str = 'metadata_secure.json'):
+    def __init__(self, metadata_file: str = 'metadata_secure.db'):
         self.metadata_file = metadata_file
-        self._ensure_file()
-
-    def _ensure_file(self):
-        """Ensure metadata file exists"""
-        if not os.path.exists(self.metadata_file):
-            with open(self.metadata_file, 'w') as f:
-                json.dump({}, f, indent=4)
+        self.store = open_metadata_store(metadata_file)
 
     def create_file_record(self, file_id: str, filename: str, owner: str,
                           file_size: int, encryption_key: str,
-                          chunks_info: List[Dict], checksum: str) -> Dict:
+                          chunks_info: List[Dict], checksum: str,
+                          chunk_distribution: Optional[Dict] = None) -> Dict:
         """Create a new file record"""
-        metadata = self._load_metadata()
-
         file_record = {
             'filename': filename,
             'owner': owner,
@@ -111,73 +106,39 @@ class FileModel:
             'encryption_key': encryption_key,
             'chunks': chunks_info,
             'checksum': checksum,
+            'chunk_distribution': chunk_distribution,
             'download_count': 0,
             'last_download': None
         }
 
-        metadata[file_id] = file_record
-        self._save_metadata(metadata)
+        self.store.put_file(file_id, file_record)
 
         return file_record
 
     def get_file_record(self, file_id: str) -> Optional[Dict]:
         """Get file record by ID"""
-        metadata = self._load_metadata()
-        return metadata.get(file_id)
+        return self.store.get_file(file_id)
 
-    def get_user_files(self, username: str) -> List[Dict]:
+    def get_user_files(self, username: str, with_chunks: bool = True) -> List[Dict]:
         """Get all files owned by a user"""
-        metadata = self._load_metadata()
-        user_files = []
-
-        for file_id, file_data in metadata.items():
-            if file_data['owner'] == username:
-                file_data_copy = file_data.copy()
-                file_data_copy['file_id'] = file_id
-                user_files.append(file_data_copy)
+        return [{**file_data, 'file_id': file_id}
+                for file_id, file_data in self.store.iter_files(owner=username, with_chunks=with_chunks)]
 
-        return user_files
+    def get_user_summary(self, username: str) -> Dict:
+        """File count and storage used by a user"""
+        return self.store.summary(owner=username)
 
     def update_download_stats(self, file_id: str):
         """Update download statistics for a file"""
-        metadata = self._load_metadata()
-        if file_id in metadata:
-            metadata[file_id]['download_count'] += 1
-            metadata[file_id]['last_download'] = datetime.now().isoformat()
-            self._save_metadata(metadata)
+        self.store.increment(file_id, 'download_count', last_download=datetime.now().isoformat())
 
     def delete_file_record(self, file_id: str, owner: str) -> bool:
         """Delete file record if owned by user"""
-        metadata = self._load_metadata()
-        if file_id in metadata and metadata[file_id]['owner'] == owner:
-            del metadata[file_id]
-            self._save_metadata(metadata)
-            return True
-        return False
+        return self.store.delete_file(file_id, owner) is not None
 
     def list_all_files(self) -> List[Dict]:
         """List all files (admin only)"""
-        metadata = self._load_metadata()
-        files_list = []
-
-        for file_id, file_data in metadata.items():
-            file_data_copy = file_data.copy()
-            file_data_copy['file_id'] = file_id
-            files_list.append(file_data_copy)
-
-        return files_list
-
-    def _load_metadata(self) -> Dict:
-        """Load metadata from file"""
-        if os.path.exists(self.metadata_file):
-            with open(self.metadata_file, 'r') as f:
-                return json.load(f)
-        return {}
-
-    def _save_metadata(self, metadata: Dict):
-        """Save metadata to file"""
-        with open(self.metadata_file, 'w') as f:
-            json.dump(metadata, f, indent=4, default=str)
+        return [{**file_data, 'file_id': file_id} for file_id, file_data in self.store.iter_files()]
 
 
 # Global model instances
@@ -0,0 +1,208 @@
+import random
+
+import pytest
+
+from utils.availability import AvailabilityIndex
+
+NODE_IDS = [f'node-{i:02d}' for i in range(1, 6)]
+
+
+def replica(node_id, path):
+    return {'node_id': node_id, 'chunk_file': path}
+
+
+def shard(node_id, path, number, data_shards=2, parity_shards=1):
+    return {'node_id': node_id, 'chunk_file': path, 'shard': number,
+            'data_shards': data_shards, 'parity_shards': parity_shards}
+
+
+def key(location):
+    return location['node_id'], location['chunk_file']
+
+
+class Recount:
+    """What the index should report, recomputed from scratch over every location"""
+
+    def __init__(self):
+        self.files = {}
+        self.down = set()
+        self.missing = set()
+
+    def readable(self, locations):
+        return [loc for loc in locations if loc['node_id'] not in self.down and key(loc) not in self.missing]
+
+    def chunk_health(self, locations):
+        readable = self.readable(locations)
+        if 'shard' in locations[0]:
+            shards = locations[0]['data_shards'] + locations[0]['parity_shards']
+            return {'readable': len({loc['shard'] for loc in readable}),
+                    'needed': locations[0]['data_shards'], 'shards': shards}
+        return {'readable': len(readable), 'needed': 1, 'shards': None}
+
+    def available(self, distribution):
+        return sum(1 for locations in distribution.values()
+                   if len({loc.get('shard', 0) for loc in self.readable(locations)})
+                   >= self.chunk_health(locations)['needed'])
+
+    def referenced(self):
+        return {key(loc) for distribution in self.files.values()
+                for locations in distribution.values() for loc in locations}
+
+
+def assert_consistent(index, recount):
+    stats = index.get_stats()
+    unavailable = 0
+    under_replicated = set()
+    for file_id, distribution in recount.files.items():
+        available = recount.available(distribution)
+        unavailable += len(distribution) - available
+        tolerance = index.fault_tolerance(file_id)
+        assert (tolerance['available_chunks'], tolerance['total_chunks']) == (available, len(distribution))
+        assert tolerance['reconstructable'] == (available == len(distribution))
+        for chunk_id, locations in distribution.items():
+            health = recount.chunk_health(locations)
+            assert index.chunk_health(file_id, chunk_id) == health
+            if health['readable'] < (health['shards'] or 2):
+                under_replicated.add((file_id, chunk_id))
+
+    assert sorted(index.under_replicated(2)) == sorted(under_replicated)
+
+    assert stats['unavailable_chunks'] == unavailable
+    assert stats['files'] == len(recount.files)
+    assert stats['objects'] == len(recount.referenced())
+    assert stats['missing_objects'] == len(recount.missing)
+    assert set(stats['nodes_down']) == recount.down
+
+
+def random_distribution(rng, paths):
+    distribution = {}
+    for chunk in range(rng.randint(1, 4)):
+        if rng.random() < 0.3:
+            nodes = rng.sample(NODE_IDS, 3)
+            distribution[f'chunk_{chunk}'] = [shard(node_id, f'shard-{next(paths)}', number)
+                                              for number, node_id in enumerate(nodes)]
+        else:
+            # A small pool of paths, so deduplicated chunks share stored objects across files
+            path = f'dedup-{rng.randint(0, 5)}' if rng.random() < 0.4 else f'copy-{next(paths)}'
+            distribution[f'chunk_{chunk}'] = [replica(node_id, path) for node_id in rng.sample(NODE_IDS, 2)]
+    return distribution
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_counters_match_a_recount_after_every_change(seed):
+    rng = random.Random(seed)
+    paths = iter(range(10 ** 6))
+    index, recount = AvailabilityIndex(), Recount()
+
+    for _ in range(400):
+        operation = rng.choice(['add', 'add', 'remove', 'node', 'node', 'missing', 'repair'])
+        file_ids = sorted(recount.files)
+
+        if operation == 'add' or not file_ids:
+            file_id = f'file-{rng.randint(0, 15)}'
+            distribution = random_distribution(rng, paths)
+            index.add_file(file_id, distribution)
+            recount.files[file_id] = distribution
+            # Objects only the replaced file used are forgotten; writing one again brings it back
+            recount.missing &= recount.referenced()
+            recount.missing -= {key(loc) for locations in distribution.values() for loc in locations}
+        elif operation == 'remove':
+            file_id = rng.choice(file_ids)
+            index.remove_file(file_id)
+            del recount.files[file_id]
+            recount.missing &= recount.referenced()
+        elif operation == 'node':
+            node_id = rng.choice(NODE_IDS)
+            active = rng.random() < 0.5
+            changed = index.set_node_active(node_id, active)
+            assert changed == (active == (node_id in recount.down))
+            (recount.down.discard if active else recount.down.add)(node_id)
+        elif operation == 'missing':
+            location = rng.choice([loc for distribution in recount.files.values()
+                                   for locations in distribution.values() for loc in locations])
+            index.mark_missing(location)
+            recount.missing.add(key(location))
+        else:
+            file_id = rng.choice(file_ids)
+            chunk_id = rng.choice(sorted(recount.files[file_id]))
+            locations = recount.files[file_id][chunk_id]
+            if 'shard' in locations[0]:
+                missing = [loc for loc in locations if key(loc) in recount.missing]
+                if not missing:
+                    continue
+                location = rng.choice(missing)
+            else:
+                location = replica(rng.choice(NODE_IDS), f'copy-{next(paths)}')
+            index.add_replica(file_id, chunk_id, location)
+            locations.append(location)
+            recount.missing.discard(key(location))
+
+        assert_consistent(index, recount)
+
+
+def test_failed_nodes_are_named_only_for_unreadable_chunks():
+    index = AvailabilityIndex()
+    index.add_file('f', {'a': [replica('node-01', 'a1'), replica('node-02', 'a2')],
+                         'b': [replica('node-01', 'b1'), replica('node-03', 'b3')]})
+
+    index.set_node_active('node-01', False)
+    assert index.fault_tolerance('f')['failed_nodes'] == []
+
+    index.set_node_active('node-02', False)
+    assert index.fault_tolerance('f') == {'available_chunks': 1, 'total_chunks': 2, 'reconstructable': False,
+                                          'failed_nodes': ['node-01', 'node-02']}
+
+
+def test_erasure_coded_chunk_counts_distinct_shards():
+    index = AvailabilityIndex()
+    index.add_file('f', {'c': [shard('node-01', 's0', 0), shard('node-02', 's1', 1), shard('node-03', 's2', 2)]})
+    # A second copy of shard 0 adds no new piece
+    index.add_replica('f', 'c', shard('node-04', 's0-copy', 0))
+
+    index.set_node_active('node-02', False)
+    index.set_node_active('node-03', False)
+    assert index.chunk_health('f', 'c') == {'readable': 1, 'needed': 2, 'shards': 3}
+    assert not index.fault_tolerance('f')['reconstructable']
+
+
+def test_deduplicated_object_serves_every_file_that_uses_it():
+    index = AvailabilityIndex()
+    shared = replica('node-01', 'shared')
+    index.add_file('f1', {'c': [shared]})
+    index.add_file('f2', {'c': [shared, replica('node-02', 'own')]})
+
+    index.mark_missing(shared)
+    assert index.get_stats()['unavailable_chunks'] == 1
+    assert sorted(index.chunks_on_node('node-01')) == [('f1', 'c'), ('f2', 'c')]
+
+    index.remove_file('f1')
+    assert index.get_stats()['unavailable_chunks'] == 0
+    assert index.chunks_on_node('node-01') == [('f2', 'c')]
+
+
+def test_under_replicated_lists_only_chunks_below_full_redundancy():
+    index = AvailabilityIndex()
+    index.add_file('f', {'full': [replica('node-01', 'a1'), replica('node-02', 'a2')],
+                         'short': [replica('node-01', 'b1')],
+                         'coded': [shard('node-01', 's0', 0), shard('node-02', 's1', 1), shard('node-03', 's2', 2)]})
+    assert index.under_replicated(2) == [('f', 'short')]
+
+    index.set_node_active('node-03', False)
+    assert sorted(index.under_replicated(2)) == [('f', 'coded'), ('f', 'short')]
+
+    index.add_replica('f', 'short', replica('node-04', 'b4'))
+    index.set_node_active('node-03', True)
+    assert index.under_replicated(2) == []
+    assert index.under_replicated(3) == [('f', 'full'), ('f', 'short')]
+
+
+def test_unknown_files_and_chunks_are_ignored():
+    index = AvailabilityIndex()
+    index.add_replica('f', 'c', replica('node-01', 'x'))
+    index.remove_file('f')
+    index.mark_missing(replica('node-01', 'x'))
+
+    assert index.chunk_health('f', 'c') is None
+    assert index.fault_tolerance('f') is None
+    assert index.get_stats() == {'files': 0, 'objects': 0, 'missing_objects': 0, 'nodes_down': [],
+                                 'unavailable_chunks': 0}
@@ -0,0 +1,81 @@
+import email
+
+import pytest
+
+from utils.byte_ranges import parse_ranges, multipart_byteranges
+
+ETAG = 'a1b2c3'
+DATA = bytes(range(256)) * 4
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('bytes=0-99', [(0, 100)]),
+    ('bytes=1000-', [(1000, 1024)]),
+    ('bytes=-24', [(1000, 1024)]),
+    ('bytes=-5000', [(0, 1024)]),
+    ('bytes=900-5000', [(900, 1024)]),
+    ('bytes=0-0,10-19,-1', [(0, 1), (10, 20), (1023, 1024)]),
+])
+def test_satisfiable_ranges_are_clamped_to_the_file(header, expected):
+    assert parse_ranges(header, None, len(DATA), ETAG) == expected
+
+
+@pytest.mark.parametrize('header', ['bytes=1024-', 'bytes=2000-3000'])
+def test_ranges_past_the_end_are_unsatisfiable(header):
+    assert parse_ranges(header, None, len(DATA), ETAG) == []
+
+
+def test_unsatisfiable_ranges_are_dropped_from_a_list():
+    assert parse_ranges('bytes=0-9,2000-3000', None, len(DATA), ETAG) == [(0, 10)]
+
+
+@pytest.mark.parametrize('header', [None, '', 'items=0-9', 'bytes=9-0', 'bytes=abc'])
+def test_missing_or_unusable_range_means_the_whole_file(header):
+    assert parse_ranges(header, None, len(DATA), ETAG) is None
+
+
+def test_if_range_with_the_current_etag_keeps_the_range():
+    assert parse_ranges('bytes=100-199', f'"{ETAG}"', len(DATA), ETAG) == [(100, 200)]
+
+
+@pytest.mark.parametrize('if_range', ['"stale"', 'Wed, 21 Oct 2015 07:28:00 GMT'])
+def test_if_range_for_a_changed_file_sends_all_of_it(if_range):
+    assert parse_ranges('bytes=100-199', if_range, len(DATA), ETAG) is None
+
+
+def test_multipart_body_frames_each_range():
+    ranges = [(0, 10), (500, 520), (1020, 1024)]
+    body, length, content_type = multipart_byteranges(
+        ranges, lambda start, stop: [DATA[start:stop]], len(DATA), boundary='sep')
+    payload = b''.join(body)
+
+    assert content_type == 'multipart/byteranges; boundary=sep'
+    assert len(payload) == length
+    assert payload.endswith(b'\r\n--sep--\r\n')
+
+    message = email.message_from_bytes(f'Content-Type: {content_type}\r\n\r\n'.encode('ascii') + payload)
+    parts = message.get_payload()
+    assert [part['Content-Range'] for part in parts] == \
+        ['bytes 0-9/1024', 'bytes 500-519/1024', 'bytes 1020-1023/1024']
+    assert [part.get_payload(decode=True) for part in parts] == [DATA[start:stop] for start, stop in ranges]
+
+
+def test_multipart_body_reads_ranges_only_as_it_is_sent():
+    reads = []
+
+    def read_range(start, stop):
+        reads.append((start, stop))
+        yield DATA[start:stop]
+
+    body, _, _ = multipart_byteranges([(0, 4), (8, 12)], read_range, len(DATA))
+    assert reads == []
+    next(body), next(body)
+    assert reads == [(0, 4)]
+    b''.join(body)
+    assert reads == [(0, 4), (8, 12)]
+
+
+def test_multipart_boundaries_are_unique_per_response():
+    _, _, first = multipart_byteranges([(0, 1), (2, 3)], lambda start, stop: [b''], 4)
+    _, _, second = multipart_byteranges([(0, 1), (2, 3)], lambda start, stop: [b''], 4)
+    assert first != second
@@ -0,0 +1,70 @@
+import io
+import random
+
+import pytest
+
+from utils import cdc
+from utils.cdc import ContentDefinedChunkingUtils
+
+
+@pytest.fixture
+def chunker():
+    return ContentDefinedChunkingUtils(min_size=1024, avg_size=4096, max_size=16384)
+
+
+def sample(size, seed=7):
+    return random.Random(seed).randbytes(size)
+
+
+def chunk_hashes(chunker, data):
+    return [chunk['hash'] for chunk in chunker.split_file_into_chunks(data)]
+
+
+@pytest.mark.skipif(cdc.np is None, reason='NumPy is not installed')
+@pytest.mark.parametrize('size', [0, 100, 1024, 1025, 20000, 300000])
+def test_numpy_and_python_boundaries_agree(chunker, size):
+    data = sample(size) if size < 200000 else bytes(100000) + sample(size - 100000)
+    for eof in (True, False):
+        assert chunker._boundaries_vectorized(data, eof) == chunker._boundaries_python(data, eof)
+
+
+def test_chunks_respect_the_size_limits(chunker):
+    data = sample(500000) + bytes(100000)
+    boundaries = chunker.chunk_boundaries(data)
+    sizes = [end - start for start, end in zip([0] + boundaries, boundaries)]
+
+    assert boundaries[-1] == len(data)
+    assert all(size <= chunker.max_size for size in sizes)
+    assert all(size >= chunker.min_size for size in sizes[:-1])
+
+
+def test_insertion_only_changes_the_chunks_around_it(chunker):
+    data = sample(400000)
+    edited = data[:200000] + b'inserted bytes' + data[200000:]
+
+    before = chunk_hashes(chunker, data)
+    after = chunk_hashes(chunker, edited)
+
+    # Boundaries resynchronise right after the edit, so all but a chunk or two are reused
+    assert len(set(after) - set(before)) <= 2
+    assert after[:5] == before[:5]
+    assert after[-5:] == before[-5:]
+
+
+def test_stream_splits_like_whole_buffer(chunker):
+    data = sample(300000)
+    streamed = [chunk['hash'] for chunk in chunker.iter_chunks_from_stream(io.BytesIO(data))]
+
+    assert streamed == chunk_hashes(chunker, data)
+
+
+def test_python_fallback_warns_once(chunker, monkeypatch):
+    warnings = []
+    monkeypatch.setattr(cdc, 'np', None)
+    monkeypatch.setattr(cdc, '_fallback_warned', False)
+    monkeypatch.setattr(cdc.secure_logger, 'log_warning', lambda *args: warnings.append(args))
+
+    chunker.chunk_boundaries(sample(5000))
+    chunker.chunk_boundaries(sample(5000))
+
+    assert len(warnings) == 1
@@ -0,0 +1,79 @@
+import gc
+
+from utils.chunk_cache import ChunkCache
+
+
+def fill(cache, *keys, size=100):
+    for key in keys:
+        cache.put(key, key.encode() * size)
+
+
+def test_least_recently_used_chunks_are_evicted_first():
+    cache = ChunkCache(max_bytes=300, max_item_bytes=100)
+    fill(cache, 'a', 'b', 'c')
+    cache.get('a')
+
+    fill(cache, 'd')
+
+    assert [key for key in 'abcd' if cache.contains(key)] == ['a', 'c', 'd']
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_cache_stays_within_its_byte_budget():
+    cache = ChunkCache(max_bytes=1000)
+    for i in range(50):
+        cache.put(f'k{i}', b'x' * (i % 7 * 20 + 1))
+        assert cache.get_stats()['bytes'] <= 1000
+
+    cache.put('huge', b'x' * 126)
+    assert not cache.contains('huge')
+    cache.put('k49', b'y')
+    assert cache.get('k49') == b'y'
+    assert cache.get_stats()['bytes'] == sum(len(cache.get(f'k{i}') or b'') for i in range(50))
+
+
+def test_pinned_chunks_survive_eviction_within_the_budget():
+    cache = ChunkCache(max_bytes=300, max_item_bytes=100)
+    fill(cache, 'a', 'b')
+    view = cache.pin(['a', 'missing'])
+
+    fill(cache, 'c', 'd', 'e')
+
+    assert view.get('a') == b'a' * 100 and view.get('missing') is None
+    assert [key for key in 'abcde' if cache.contains(key)] == ['a', 'd', 'e']
+    stats = cache.get_stats()
+    assert (stats['bytes'], stats['pinned_entries'], stats['pinned_bytes']) == (300, 1, 100)
+
+
+def test_concurrent_pins_share_one_copy_and_cannot_exceed_the_budget():
+    cache = ChunkCache(max_bytes=200, max_item_bytes=100)
+    fill(cache, 'a', 'b')
+    views = [cache.pin(['a', 'b']) for _ in range(3)]
+
+    fill(cache, 'c')
+    cache.put('a', b'z' * 100)
+    cache.clear()
+
+    assert not cache.contains('c')
+    assert all(view.get('a') == b'a' * 100 for view in views)
+    assert cache.get_stats()['bytes'] == 200
+
+    views.pop().release()
+    views.pop().release()
+    fill(cache, 'c')
+    assert cache.contains('a') and cache.contains('b')
+
+
+def test_released_or_dropped_views_make_chunks_evictable():
+    cache = ChunkCache(max_bytes=200, max_item_bytes=100)
+    fill(cache, 'a', 'b')
+    released, dropped = cache.pin(['a']), cache.pin(['b'])
+
+    released.release()
+    released.release()
+    del dropped
+    gc.collect()
+    fill(cache, 'c', 'd')
+
+    assert [key for key in 'abcd' if cache.contains(key)] == ['c', 'd']
+    assert cache.get_stats()['pinned_entries'] == 0
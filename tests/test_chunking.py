@@ -0,0 +1,107 @@
+import os
+
+import pytest
+
+from utils.chunking import ChunkingUtils, DistributionUtils, DistributionError
+from utils.chunk_store import ChunkStore
+from utils.erasure import get_codec
+
+NODES = [{'node_id': f'node-{i:02d}', 'status': 'active'} for i in range(1, 5)]
+
+
+def make_chunks(blocks):
+    chunking = ChunkingUtils(hash_algorithm='blake2b')
+    return [chunking.build_chunk(data, sequence) for sequence, data in enumerate(blocks)]
+
+
+def stored_files(storage_dir):
+    """Every chunk copy on disk, leaving out the chunk store's own index"""
+    return sorted(
+        os.path.relpath(os.path.join(root, name), storage_dir)
+        for root, _, names in os.walk(storage_dir) for name in names
+        if not name.startswith('chunk_index')
+    )
+
+
+def refcounts(chunk_store, chunks):
+    return {c['hash']: (chunk_store.lookup(c['hash']) or {}).get('refcount') for c in chunks}
+
+
+def aborted_after(chunks, count):
+    """A chunk source that breaks off, like a client disconnecting midway"""
+    yield from chunks[:count]
+    raise ConnectionError('client went away')
+
+
+@pytest.fixture
+def distribution():
+    return DistributionUtils(replication_factor=2)
+
+
+def test_aborted_upload_gives_back_its_references(tmp_path, distribution):
+    storage_dir = str(tmp_path)
+    chunk_store = ChunkStore(storage_dir)
+    existing = make_chunks([b'a' * 1000, b'b' * 1000])
+    distribution.distribute_chunk_stream(existing, NODES, storage_dir, chunk_store)
+    before = stored_files(storage_dir), refcounts(chunk_store, existing)
+
+    # Shares its first chunk with the stored file, then the source fails
+    upload = make_chunks([b'a' * 1000, b'c' * 1000, b'd' * 1000])
+    with pytest.raises(ConnectionError):
+        distribution.distribute_chunk_stream(aborted_after(upload, 2), NODES, storage_dir, chunk_store)
+
+    assert (stored_files(storage_dir), refcounts(chunk_store, existing)) == before
+    assert chunk_store.lookup(upload[1]['hash']) is None
+
+
+def test_failed_chunk_rolls_back_the_chunks_stored_with_it(tmp_path, distribution, monkeypatch):
+    storage_dir = str(tmp_path)
+    chunk_store = ChunkStore(storage_dir)
+    existing = make_chunks([b'a' * 1000])
+    distribution.distribute_chunk_stream(existing, NODES, storage_dir, chunk_store)
+    before = stored_files(storage_dir), refcounts(chunk_store, existing)
+
+    upload = make_chunks([b'a' * 1000, b'c' * 1000, b'd' * 1000])
+    write_replica = distribution._write_replica
+
+    def failing_write(chunk, node, *args):
+        if chunk['sequence'] == 2:
+            raise OSError('disk full')
+        return write_replica(chunk, node, *args)
+
+    monkeypatch.setattr(distribution, '_write_replica', failing_write)
+    with pytest.raises(DistributionError) as excinfo:
+        distribution.distribute_chunk_stream(upload, NODES, storage_dir, chunk_store)
+
+    assert {error['chunk_id'] for error in excinfo.value.errors} == {'chunk_2'}
+    assert (stored_files(storage_dir), refcounts(chunk_store, existing)) == before
+    stats = chunk_store.get_stats()
+    assert (stats['unique_chunks'], stats['references']) == (1, 1)
+
+
+def test_aborted_upload_without_chunk_store_deletes_its_shards(tmp_path, distribution):
+    storage_dir = str(tmp_path)
+    upload = make_chunks([os.urandom(3000) for _ in range(3)])
+
+    with pytest.raises(ConnectionError):
+        distribution.distribute_chunk_stream(aborted_after(upload, 2), NODES, storage_dir,
+                                             codec=get_codec(2, 1))
+
+    assert stored_files(storage_dir) == []
+
+
+def test_too_few_shards_written_leaves_nothing_behind(tmp_path, distribution, monkeypatch):
+    storage_dir = str(tmp_path)
+    write_replica = distribution._write_replica
+
+    def failing_write(chunk, node, storage_dir, chunk_store=None, shard=None, *args):
+        if shard != 0:
+            raise OSError('node unreachable')
+        return write_replica(chunk, node, storage_dir, chunk_store, shard, *args)
+
+    monkeypatch.setattr(distribution, '_write_replica', failing_write)
+    with pytest.raises(DistributionError):
+        distribution.distribute_chunk(make_chunks([os.urandom(3000)])[0], NODES, storage_dir,
+                                      codec=get_codec(2, 1))
+
+    assert stored_files(storage_dir) == []
@@ -0,0 +1,57 @@
+import itertools
+import os
+
+import pytest
+
+from utils.erasure import ReedSolomonCodec, gf_inv, gf_mul
+
+
+def test_gf_inverse_of_every_nonzero_element():
+    assert all(gf_mul(a, gf_inv(a)) == 1 for a in range(1, 256))
+    with pytest.raises(ZeroDivisionError):
+        gf_inv(0)
+
+
+def test_encode_is_systematic_and_pads_evenly():
+    codec = ReedSolomonCodec(4, 2)
+    data = b'0123456789'
+
+    shards = codec.encode(data)
+
+    assert len(shards) == 6
+    assert {len(shard) for shard in shards} == {3}
+    assert b''.join(shards[:4]) == data + b'\0\0'
+
+
+@pytest.mark.parametrize('k, m', [(4, 2), (6, 3)])
+def test_decodes_from_every_k_of_the_shards(k, m):
+    codec = ReedSolomonCodec(k, m)
+    data = os.urandom(1000)
+    shards = dict(enumerate(codec.encode(data)))
+
+    # Every combination of m lost shards, parity and data alike
+    for lost in itertools.combinations(shards, m):
+        kept = {index: shard for index, shard in shards.items() if index not in lost}
+        assert codec.decode(kept, len(data)) == data
+
+
+def test_too_few_shards_cannot_decode():
+    codec = ReedSolomonCodec(4, 2)
+    shards = dict(enumerate(codec.encode(b'data')))
+    del shards[0], shards[3], shards[5]
+
+    with pytest.raises(ValueError):
+        codec.decode(shards, 4)
+
+
+def test_empty_and_tiny_chunks_round_trip():
+    codec = ReedSolomonCodec(6, 3)
+    for data in (b'', b'x'):
+        shards = dict(enumerate(codec.encode(data)))
+        assert codec.decode({i: shards[i] for i in range(3, 9)}, len(data)) == data
+
+
+@pytest.mark.parametrize('k, m', [(0, 1), (1, -1), (200, 57)])
+def test_invalid_layouts_are_rejected(k, m):
+    with pytest.raises(ValueError):
+        ReedSolomonCodec(k, m)
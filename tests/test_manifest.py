@@ -0,0 +1,91 @@
+import json
+import os
+
+import pytest
+
+from utils.manifest import ChunkManifest
+
+
+def make_record(count=3):
+    chunks = []
+    distribution = {}
+    for sequence in range(count):
+        chunk_id = f'chunk_{sequence}'
+        digest = os.urandom(32).hex()
+        chunks.append({'chunk_id': chunk_id, 'size': 1048576, 'hash': digest, 'hash_algorithm': 'blake2b',
+                       'sequence': sequence, 'compression': 'zstd', 'stored_size': 524288 + sequence,
+                       'digest': digest, 'total_chunks': count})
+        distribution[chunk_id] = [
+            {'node_id': 'node-01', 'chunk_file': f'{digest[:2]}/{digest}_node-01', 'pack': 'files/packs'},
+            {'node_id': 'node-02', 'chunk_file': f'{chunk_id}_node-02', 'path': f'/srv/{chunk_id}_node-02',
+             'shard': 0, 'compression': 'zstd'},
+        ]
+    return chunks, distribution
+
+
+def round_trip(chunks, distribution):
+    return ChunkManifest.decode(ChunkManifest.from_record(chunks, distribution).encode())
+
+
+def test_chunks_and_distribution_round_trip():
+    chunks, distribution = make_record()
+
+    manifest = round_trip(chunks, distribution)
+
+    assert manifest.chunks() == chunks
+    assert manifest.distribution() == distribution
+    assert manifest.chunk_count() == 3
+
+
+@pytest.mark.parametrize('with_chunks, with_distribution', [(True, False), (False, True), (False, False)])
+def test_missing_views_stay_missing(with_chunks, with_distribution):
+    chunks, distribution = make_record()
+
+    manifest = round_trip(chunks if with_chunks else None, distribution if with_distribution else None)
+
+    assert manifest.chunks() == (chunks if with_chunks else None)
+    assert manifest.distribution() == (distribution if with_distribution else None)
+
+
+def test_unusual_values_come_back_unchanged():
+    chunks = [
+        # Upper-case and odd-length hex must not come back normalised
+        {'chunk_id': 'chunk_0', 'hash': 'ABCDEF0123456789ABCDEF', 'size': 0, 'sequence': 0},
+        {'chunk_id': 'chunk_1', 'hash': '0123456789abcdef0', 'size': True, 'sequence': -1,
+         'custom': {'nested': [1, 2]}},
+        # A file may list the same deduplicated chunk twice
+        {'chunk_id': 'chunk_0', 'hash': 'ABCDEF0123456789ABCDEF', 'size': 0, 'sequence': 2},
+    ]
+    distribution = {'chunk_0': [], 'orphan': [{'node_id': 'node-03', 'shard': 4, 'weight': 1.5}]}
+
+    manifest = round_trip(chunks, distribution)
+
+    assert manifest.chunks() == chunks
+    assert manifest.distribution() == distribution
+    assert manifest.chunk_count() == 3
+
+
+def test_add_replica_extends_the_distribution():
+    chunks, distribution = make_record(1)
+    manifest = ChunkManifest.from_record(chunks, distribution)
+
+    assert manifest.add_replica('chunk_0', {'node_id': 'node-03', 'chunk_file': 'copy'}) == 2
+    assert manifest.add_replica('chunk_9', {'node_id': 'node-03', 'chunk_file': 'new'}) == 0
+
+    decoded = ChunkManifest.decode(manifest.encode())
+    assert decoded.distribution()['chunk_0'][-1] == {'node_id': 'node-03', 'chunk_file': 'copy'}
+    assert decoded.distribution()['chunk_9'] == [{'node_id': 'node-03', 'chunk_file': 'new'}]
+    assert decoded.chunk_count() == 1
+
+
+def test_encoded_manifest_is_much_smaller_than_json():
+    chunks, distribution = make_record(200)
+
+    encoded = ChunkManifest.from_record(chunks, distribution).encode()
+
+    assert len(encoded) < len(json.dumps({'chunks': chunks, 'chunk_distribution': distribution})) / 2
+
+
+def test_rejects_blobs_that_are_not_manifests():
+    with pytest.raises(ValueError):
+        ChunkManifest.decode(b'{"chunks": []}')
@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+
+import pytest
+
+from utils.metadata_journal import MetadataJournal
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path / 'journal')
+
+
+def files(directory, prefix):
+    return sorted(name for name in os.listdir(directory) if name.startswith(prefix))
+
+
+def test_committed_records_survive_a_crash_and_pending_ones_do_not(directory):
+    journal = MetadataJournal(directory)
+    journal.put('nodes', 'node-01', {'files_count': 1})
+    journal.put('nodes', 'node-02', {'files_count': 2})
+    journal.delete('nodes', 'node-02')
+    journal.commit()
+    journal.put('nodes', 'node-03', {'files_count': 3})  # Never committed before the crash
+
+    recovered = MetadataJournal(directory)
+
+    assert recovered.items('nodes') == [('node-01', {'files_count': 1})]
+    assert recovered.get_stats()['sequence'] == 3
+
+
+def test_torn_tail_is_cut_and_appends_continue_after_it(directory):
+    journal = MetadataJournal(directory)
+    for i in range(5):
+        journal.put('files', f'f{i}', i)
+    journal.commit()
+    segment = os.path.join(directory, files(directory, 'journal-')[-1])
+    with open(segment, 'ab') as f:
+        f.write(b'\x40\x00\x00\x00partial record')  # A crash in the middle of an append
+    size = os.path.getsize(segment)
+
+    recovered = MetadataJournal(directory)
+    assert [value for _, value in recovered.items('files')] == [0, 1, 2, 3, 4]
+    assert os.path.getsize(segment) < size
+
+    recovered.put('files', 'f5', 5)
+    recovered.commit()
+    assert MetadataJournal(directory).get('files', 'f5') == 5
+
+
+def test_corrupt_record_stops_replay_there(directory):
+    journal = MetadataJournal(directory)
+    journal.put('files', 'a', 'first')
+    journal.commit()
+    segment = os.path.join(directory, files(directory, 'journal-')[-1])
+    intact = os.path.getsize(segment)
+    journal.put('files', 'b', 'second')
+    journal.put('files', 'c', 'third')
+    journal.commit()
+    with open(segment, 'r+b') as f:
+        f.seek(intact + 20)
+        f.write(b'\xff')
+
+    recovered = MetadataJournal(directory)
+
+    assert recovered.items('files') == [('a', 'first')]
+
+
+def test_snapshot_drops_old_segments_and_replays_only_what_follows(directory):
+    journal = MetadataJournal(directory)
+    for i in range(100):
+        journal.put('files', f'f{i}', {'size': i})
+    journal.snapshot()
+    for i in range(100, 110):
+        journal.put('files', f'f{i}', {'size': i})
+    journal.delete('files', 'f0')
+    journal.commit()
+
+    assert files(directory, 'snapshot-') == [f'snapshot-{100:016d}.pkl']
+    assert files(directory, 'journal-') == [f'journal-{101:016d}.log']
+
+    recovered = MetadataJournal(directory)
+    stats = recovered.get_stats()
+    assert (stats['recovered_records'], stats['sequence'], stats['keys']) == (11, 111, 109)
+    assert recovered.get('files', 'f0') is None
+    assert recovered.get('files', 'f109') == {'size': 109}
+
+
+def test_snapshots_are_taken_in_the_background(directory):
+    journal = MetadataJournal(directory, snapshot_every=50)
+    for i in range(120):
+        journal.put('files', f'f{i}', i)
+    journal.commit()
+
+    deadline = time.time() + 5
+    while journal.get_stats()['snapshots'] < 1 and time.time() < deadline:
+        time.sleep(0.01)
+
+    recovered = MetadataJournal(directory)
+    assert len(recovered.items('files')) == 120
+    assert recovered.get_stats()['recovered_records'] < 120
+
+
+def test_concurrent_commits_share_fsyncs(directory):
+    journal = MetadataJournal(directory)
+
+    def writer(thread):
+        for i in range(50):
+            journal.commit(journal.put('files', f'{thread}-{i}', i))
+
+    threads = [threading.Thread(target=writer, args=(t,)) for t in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = journal.get_stats()
+    assert stats['durable_sequence'] == stats['sequence'] == 400
+    assert stats['records_synced'] == 400
+    assert stats['fsyncs'] <= stats['commits']
+    assert len(MetadataJournal(directory).items('files')) == 400
+
+
+def test_values_are_copies(directory):
+    journal = MetadataJournal(directory)
+    value = {'chunks': [1, 2]}
+    journal.put('files', 'a', value)
+    value['chunks'].append(3)
+    journal.get('files', 'a')['chunks'].append(4)
+
+    assert journal.get('files', 'a') == {'chunks': [1, 2]}
+
+
+def test_reset_forgets_everything_on_disk_too(directory):
+    journal = MetadataJournal(directory)
+    journal.put('files', 'a', 1)
+    journal.commit()
+
+    journal.reset()
+
+    assert MetadataJournal(directory).items('files') == []
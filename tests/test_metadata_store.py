@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+from utils.metadata_store import MetadataStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MetadataStore(str(tmp_path / 'metadata.db'))
+
+
+def test_empty_file_keeps_its_empty_manifest(store):
+    store.put_file('empty', {'filename': 'empty.bin', 'file_size': 0, 'checksum': 'c',
+                             'chunks': [], 'chunk_distribution': {}})
+
+    record = store.get_file('empty')
+    assert (record['chunks'], record['chunk_distribution']) == ([], {})
+    assert store.get_file('empty', with_chunks=False)['chunks'] == 0
+    assert len(store.get_manifest('empty')) == 0
+
+
+def chunked_record(owner='alice', nodes=('node-01', 'node-02'), size=8):
+    chunks = [{'chunk_id': f'chunk_{i}', 'sequence': i, 'size': 4, 'hash': f'{i:064x}'} for i in range(size // 4)]
+    return {
+        'filename': 'a.bin', 'owner': owner, 'file_size': size, 'upload_time': '2025-01-01T00:00:00',
+        'checksum': 'c', 'hash_algorithm': 'blake2b',
+        'chunks': chunks,
+        'chunk_distribution': {c['chunk_id']: [{'node_id': node_id, 'chunk_file': f"{c['chunk_id']}_{node_id}"}
+                                               for node_id in nodes] for c in chunks}
+    }
+
+
+def rows(store, table):
+    return store._db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+
+def test_put_file_replaces_the_record_and_its_rows(store):
+    store.put_file('f', chunked_record(size=12))
+    store.put_file('f', chunked_record(owner='bob', nodes=('node-03',)))
+
+    record = store.get_file('f')
+    assert record == chunked_record(owner='bob', nodes=('node-03',))
+    assert (rows(store, 'files'), rows(store, 'chunks'), rows(store, 'chunk_locations')) == (1, 2, 2)
+    assert store.list_files(owner='alice') == {}
+    assert store.files_with_digest(f'{1:064x}') == ['f']
+
+
+def test_update_and_increment_leave_chunks_alone(store):
+    store.put_file('f', chunked_record())
+
+    assert store.update_file('f', filename='b.bin', label='x')
+    assert store.increment('f', 'downloads', last_download='now')
+    assert store.increment('f', 'downloads')
+    assert not store.update_file('missing', filename='b.bin')
+
+    record = store.get_file('f')
+    assert (record['filename'], record['label'], record['downloads'], record['last_download']) == \
+        ('b.bin', 'x', 2, 'now')
+    assert record['chunks'] == chunked_record()['chunks']
+    with pytest.raises(ValueError):
+        store.update_file('f', chunks=[])
+
+
+def test_delete_cascades_to_chunks_and_locations(store):
+    store.put_file('f', chunked_record())
+    store.put_file('g', chunked_record())
+    store.add_location('f', 'chunk_0', {'node_id': 'node-03', 'chunk_file': 'copy'})
+
+    assert store.delete_file('f', owner='bob') is None
+    deleted = store.delete_file('f', owner='alice')
+
+    assert deleted['chunk_distribution']['chunk_0'][-1] == {'node_id': 'node-03', 'chunk_file': 'copy'}
+    assert not store.contains('f') and store.get_manifest('f') is None
+    assert (rows(store, 'files'), rows(store, 'chunks'), rows(store, 'chunk_locations')) == (1, 2, 4)
+    assert store.summary() == {'files_count': 1, 'storage_used': 8}
+
+
+def test_import_json_drops_embedded_chunk_bytes(store, tmp_path):
+    legacy = {
+        'flat': {'filename': 'doc.docx', 'file_size': 62734, 'upload_time': '2025-11-09T23:04:40',
+                 'node_id': 'local', 'chunks': 1, 'checksum': '85853c09417ef1229db3f0604c2ddb2a', 'encrypted': False},
+        'chunked': {**chunked_record(), 'chunks': [{**chunk, 'data': 'AAAA'} for chunk in chunked_record()['chunks']]}
+    }
+    path = tmp_path / 'metadata_distributed.json'
+    path.write_text(json.dumps(legacy))
+
+    assert store.import_json(str(path)) == 2
+
+    assert store.get_file('flat') == legacy['flat']
+    assert store.get_file('chunked') == chunked_record()
+    assert b'AAAA' not in store.get_manifest('chunked').encode()
@@ -0,0 +1,147 @@
+import math
+
+import pytest
+
+from utils import node_registry
+from utils.metadata_journal import MetadataJournal
+from utils.node_registry import NodeRegistry, PhiAccrualDetector
+
+NODE_IDS = ['node-01', 'node-02']
+
+
+class Clock:
+    """Stands in for the time module, so heartbeats and checks happen at chosen moments"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(node_registry, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def journal_dir(tmp_path):
+    return str(tmp_path / 'journal')
+
+
+def detector_after(intervals, **options):
+    detector = PhiAccrualDetector(**options)
+    now = 0.0
+    detector.heartbeat(now)
+    for interval in intervals:
+        now += interval
+        detector.heartbeat(now)
+    return detector, now
+
+
+def test_phi_grows_with_silence_past_the_expected_interval():
+    detector, last = detector_after([1.0] * 20)
+
+    phis = [detector.phi(last + silence) for silence in (0, 1, 3, 3.5, 4, 5, 60, 10 ** 6)]
+
+    assert phis == sorted(phis)
+    assert phis[0] < 0.01
+    # The expected interval plus the acceptable pause is a coin toss: 1 + e^0 = 2
+    assert phis[2] == pytest.approx(math.log10(2))
+    assert 3.0 < phis[4] < 8.0 < phis[5]
+    assert math.isfinite(phis[-1])
+
+
+def test_irregular_heartbeats_make_the_detector_more_patient():
+    steady, steady_last = detector_after([1.0] * 50)
+    jittery, jittery_last = detector_after([0.2, 1.8] * 25)
+
+    assert jittery.phi(jittery_last + 4) < steady.phi(steady_last + 4)
+
+
+def test_acceptable_pause_tolerates_short_stalls():
+    strict, last = detector_after([1.0] * 20, acceptable_pause=0.0)
+    lenient, _ = detector_after([1.0] * 20, acceptable_pause=2.0)
+
+    assert strict.phi(last + 2) > 3.0
+    assert lenient.phi(last + 2) < 0.01
+
+
+def test_window_forgets_old_intervals():
+    detector, last = detector_after([10.0] * 5 + [1.0] * 5, window=5)
+
+    assert detector.phi(last + 5) > 8.0
+
+
+def test_no_heartbeat_yet_means_no_suspicion():
+    assert PhiAccrualDetector().phi(10 ** 6) == 0.0
+
+
+def test_silent_node_goes_suspect_then_failed_and_recovers_on_heartbeat(clock, journal_dir):
+    registry = NodeRegistry(MetadataJournal(journal_dir), NODE_IDS)
+    seen = []
+    registry.subscribe(seen.append)
+
+    for silence in (3.5, 4, 5):
+        clock.now = 1000.0 + silence
+        registry.heartbeat('node-02')
+        registry.check()
+    registry.heartbeat('node-01')
+
+    assert [(e['node_id'], e['from'], e['to']) for e in seen] == [
+        ('node-01', 'active', 'suspect'),
+        ('node-01', 'suspect', 'failed'),
+        ('node-01', 'failed', 'active'),
+    ]
+    assert [e['seq'] for e in seen] == [1, 2, 3]
+    assert registry.events(since=1) == seen[1:]
+    assert seen[0]['phi'] >= registry.suspect_phi and seen[1]['phi'] >= registry.failed_phi
+
+
+def test_long_silence_fails_a_node_in_one_step(clock, journal_dir):
+    registry = NodeRegistry(MetadataJournal(journal_dir), NODE_IDS)
+
+    clock.now += 60
+    registry.check()
+    registry.check()
+
+    assert [(e['from'], e['to']) for e in registry.events()] == [('active', 'failed')] * 2
+    assert registry.get_stats()['status'] == {'active': [], 'suspect': [], 'failed': NODE_IDS}
+
+
+def test_status_and_usage_survive_a_restart(clock, journal_dir):
+    registry = NodeRegistry(MetadataJournal(journal_dir), NODE_IDS)
+    registry.record_usage({'node-01': (2, 300), 'node-02': (1, 100), 'node-99': (1, 1)})
+    registry.record_usage({'node-01': (1, 50)})
+    clock.now += 60
+    registry.heartbeat('node-02')
+    registry.check()
+
+    restarted = {n['node_id']: n for n in NodeRegistry(MetadataJournal(journal_dir), NODE_IDS).nodes()}
+
+    assert {node_id: (n['status'], n['files_count'], n['storage_used']) for node_id, n in restarted.items()} == \
+        {'node-01': ('failed', 3, 350), 'node-02': ('active', 1, 100)}
+
+
+def test_failing_subscriber_does_not_starve_the_others(clock, journal_dir):
+    registry = NodeRegistry(MetadataJournal(journal_dir), ['node-01'])
+    seen = []
+
+    def broken(event):
+        raise RuntimeError('repair queue closed')
+
+    registry.subscribe(broken)
+    registry.subscribe(seen.append)
+    clock.now += 60
+    registry.check()
+
+    assert [e['to'] for e in seen] == ['failed']
+    assert registry.errors == 1
+
+
+def test_heartbeat_from_an_unknown_node_is_rejected(clock, journal_dir):
+    registry = NodeRegistry(MetadataJournal(journal_dir), NODE_IDS)
+    with pytest.raises(KeyError):
+        registry.heartbeat('node-99')
@@ -0,0 +1,69 @@
+from collections import Counter
+
+import pytest
+
+from utils.placement import RendezvousPlacement
+
+KEYS = [f'{i:064x}' for i in range(20000)]
+
+
+def nodes(count, capacities=None):
+    capacities = capacities or {}
+    return [{'node_id': f'node-{i:02d}', 'capacity': capacities.get(f'node-{i:02d}', 1.0)}
+            for i in range(1, count + 1)]
+
+
+def owners(placement, members):
+    return {key: placement.select(key, members, 1)[0]['node_id'] for key in KEYS}
+
+
+def test_nodes_win_keys_in_proportion_to_capacity():
+    placement = RendezvousPlacement()
+    members = nodes(4, {'node-02': 2.0, 'node-04': 4.0})
+
+    shares = Counter(owners(placement, members).values())
+
+    expected = {'node-01': 1 / 8, 'node-02': 2 / 8, 'node-03': 1 / 8, 'node-04': 4 / 8}
+    for node_id, share in expected.items():
+        assert shares[node_id] / len(KEYS) == pytest.approx(share, abs=0.015)
+
+
+def test_zero_capacity_node_wins_nothing():
+    placement = RendezvousPlacement()
+    members = nodes(3, {'node-03': 0})
+
+    assert 'node-03' not in set(owners(placement, members).values())
+
+
+def test_removing_a_node_moves_only_its_keys():
+    placement = RendezvousPlacement()
+    members = nodes(10)
+    before = owners(placement, members)
+
+    after = owners(placement, [node for node in members if node['node_id'] != 'node-05'])
+
+    moved = {key for key in KEYS if before[key] != after[key]}
+    assert moved == {key for key in KEYS if before[key] == 'node-05'}
+    assert len(moved) / len(KEYS) == pytest.approx(1 / 10, abs=0.01)
+
+
+def test_adding_a_node_moves_about_one_nth_of_the_keys_to_it():
+    placement = RendezvousPlacement()
+    members = nodes(10)
+    before = owners(placement, members)
+
+    after = owners(placement, nodes(11))
+
+    moved = {key for key in KEYS if before[key] != after[key]}
+    assert {after[key] for key in moved} == {'node-11'}
+    assert len(moved) / len(KEYS) == pytest.approx(1 / 11, abs=0.01)
+
+
+def test_replicas_keep_their_order_when_another_node_leaves():
+    placement = RendezvousPlacement()
+    members = nodes(6)
+
+    for key in KEYS[:500]:
+        ranked = [node['node_id'] for node in placement.rank(key, members)]
+        survivors = [node for node in members if node['node_id'] != ranked[-1]]
+        assert [node['node_id'] for node in placement.select(key, survivors, 3)] == ranked[:3]
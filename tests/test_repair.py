@@ -0,0 +1,182 @@
+import threading
+import time
+
+from utils.repair import RepairScheduler
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+class Cluster:
+    """Chunk health as the availability index would report it, and a log of the repairs run"""
+
+    def __init__(self, health=None):
+        self.chunk_health = health or {}
+        self.repaired = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def health(self, file_id, chunk_id):
+        return self.chunk_health.get(chunk_id)
+
+    def repair(self, file_id, chunk_id):
+        self.gate.wait()
+        self.repaired.append(chunk_id)
+        if chunk_id == 'broken':
+            raise OSError('no node has room')
+        health = self.chunk_health[chunk_id]
+        written = 0 if health['readable'] >= (health['shards'] or 3) else 100
+        health['readable'] = health['shards'] or 3
+        return written
+
+
+def replicated(readable):
+    return {'readable': readable, 'needed': 1, 'shards': None}
+
+
+def erasure_coded(readable):
+    return {'readable': readable, 'needed': 4, 'shards': 6}
+
+
+def scheduler_for(cluster, **options):
+    options.setdefault('bandwidth', 0)
+    return RepairScheduler(cluster.repair, cluster.health, replication_factor=3, workers=1, **options)
+
+
+def test_chunks_closest_to_loss_are_repaired_first():
+    cluster = Cluster({'first': replicated(2),
+                       'two-spare': replicated(2), 'last-copy': replicated(1),
+                       'last-shard': erasure_coded(4), 'one-spare-shard': erasure_coded(5),
+                       'also-last-copy': replicated(1)})
+    scheduler = scheduler_for(cluster)
+    try:
+        # Hold the only worker on one repair while the rest queue up behind it
+        cluster.gate.clear()
+        scheduler.enqueue([('f', 'first')])
+        assert wait_for(lambda: scheduler.get_stats()['in_progress'] == 1)
+        scheduler.enqueue([('f', c) for c in ('two-spare', 'last-copy', 'last-shard', 'one-spare-shard',
+                                               'also-last-copy')])
+        cluster.gate.set()
+
+        assert wait_for(lambda: len(cluster.repaired) == 6)
+    finally:
+        scheduler.close()
+
+    # Margin first (copies it can still lose), then the order they were queued in
+    assert cluster.repaired == ['first', 'last-copy', 'last-shard', 'also-last-copy',
+                                'two-spare', 'one-spare-shard']
+    assert scheduler.get_stats()['repaired'] == 6
+
+
+def test_failed_node_chunks_wait_out_the_grace_period():
+    cluster = Cluster({'a': replicated(2), 'b': replicated(2)})
+    scheduler = scheduler_for(cluster, grace_period=0.3)
+    try:
+        started = time.monotonic()
+        scheduler.node_failed([('f', 'a'), ('f', 'b')])
+        assert scheduler.get_stats()['waiting_grace'] == 2
+        time.sleep(0.1)
+        assert cluster.repaired == []
+
+        assert wait_for(lambda: len(cluster.repaired) == 2)
+        assert time.monotonic() - started >= 0.3
+    finally:
+        scheduler.close()
+
+
+def test_node_back_within_the_grace_period_costs_nothing():
+    cluster = Cluster({'a': replicated(2)})
+    scheduler = scheduler_for(cluster, grace_period=0.1)
+    try:
+        scheduler.node_failed([('f', 'a')])
+        cluster.chunk_health['a'] = replicated(3)
+
+        assert wait_for(lambda: scheduler.get_stats()['skipped'] == 1)
+    finally:
+        scheduler.close()
+
+    assert cluster.repaired == []
+
+
+def test_scan_overtakes_a_pending_grace_period():
+    cluster = Cluster({'a': replicated(1)})
+    scheduler = scheduler_for(cluster, grace_period=60)
+    try:
+        scheduler.node_failed([('f', 'a')])
+        scheduler.enqueue([('f', 'a')], verify=True)
+
+        assert wait_for(lambda: cluster.repaired == ['a'])
+        time.sleep(0.05)
+        stats = scheduler.get_stats()
+    finally:
+        scheduler.close()
+
+    # The stale grace-period entry does not repair it a second time
+    assert (stats['repaired'], stats['waiting_grace'], stats['ready']) == (1, 0, 0)
+    assert cluster.repaired == ['a']
+
+
+def test_only_verified_healthy_chunks_reach_repair():
+    cluster = Cluster({'healthy': replicated(3), 'scanned': replicated(3), 'lost': erasure_coded(3)})
+    scheduler = scheduler_for(cluster)
+    try:
+        scheduler.enqueue([('f', 'healthy'), ('f', 'lost'), ('f', 'deleted')])
+        scheduler.enqueue([('f', 'scanned')], verify=True)
+
+        assert wait_for(lambda: sum(scheduler.get_stats()[k] for k in ('skipped', 'unrepairable')) == 4)
+    finally:
+        scheduler.close()
+
+    # A scan lets the store check the chunk; finding it intact writes nothing
+    assert cluster.repaired == ['scanned']
+    stats = scheduler.get_stats()
+    assert (stats['skipped'], stats['unrepairable'], stats['bytes_copied']) == (3, 1, 0)
+
+
+def test_a_failed_repair_does_not_stop_the_worker():
+    cluster = Cluster({'broken': replicated(1), 'a': replicated(2)})
+    scheduler = scheduler_for(cluster)
+    try:
+        scheduler.enqueue([('f', 'broken'), ('f', 'a')])
+
+        assert wait_for(lambda: scheduler.get_stats()['repaired'] == 1)
+    finally:
+        scheduler.close()
+
+    stats = scheduler.get_stats()
+    assert stats['failed'] == 1
+    assert stats['last_error'] == 'f/broken: no node has room'
+
+
+def test_repairs_are_paced_to_the_bandwidth_cap():
+    cluster = Cluster({c: replicated(2) for c in 'abcd'})
+    scheduler = scheduler_for(cluster, bandwidth=1000)
+    try:
+        started = time.monotonic()
+        scheduler.enqueue([('f', c) for c in 'abcd'])
+
+        # 100 bytes each at 1000 bytes/s
+        assert wait_for(lambda: scheduler.get_stats()['repaired'] == 4)
+        assert wait_for(lambda: scheduler.get_stats()['in_progress'] == 0)
+        assert time.monotonic() - started >= 0.35
+    finally:
+        scheduler.close()
+
+    assert scheduler.get_stats()['bytes_copied'] == 400
+
+
+def test_repairs_defer_to_foreground_traffic_up_to_a_limit():
+    cluster = Cluster({'a': replicated(2)})
+    scheduler = scheduler_for(cluster, busy=lambda: True, max_deferral=0.2)
+    try:
+        scheduler.enqueue([('f', 'a')])
+
+        assert wait_for(lambda: cluster.repaired == ['a'])
+    finally:
+        scheduler.close()
+
+    assert scheduler.get_stats()['deferred_seconds'] >= 0.2
@@ -0,0 +1,78 @@
+import importlib
+import io
+import os
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def server(tmp_path_factory):
+    """The app, run from a scratch directory so its catalogs and stores start empty"""
+    directory = tmp_path_factory.mktemp('server')
+    cwd = os.getcwd()
+    environment = {'NODE_DAEMONS': 'off', 'HEARTBEAT_INTERVAL': '3600', 'METADATA_JOURNAL_DIR': 'metadata_journal'}
+    saved = {name: os.environ.get(name) for name in environment}
+    os.environ.update(environment)
+    os.chdir(directory)
+    try:
+        yield importlib.import_module('unified_server')
+    finally:
+        os.chdir(cwd)
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
+
+
+@pytest.fixture
+def token(server):
+    return server.auth.auth_manager.generate_token({'username': 'admin', 'is_admin': True})
+
+
+def upload(client, path, data, headers=None):
+    response = client.post(path, data={'file': (io.BytesIO(data), 'a.bin')}, headers=headers,
+                           content_type='multipart/form-data')
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()['file_id']
+
+
+@pytest.mark.parametrize('mode', ['simple', 'distributed', 'production'])
+@pytest.mark.parametrize('size', [0, 5000])
+def test_upload_downloads_the_same_bytes(client, mode, size):
+    data = os.urandom(size)
+    file_id = upload(client, f'/{mode}/upload', data)
+
+    response = client.get(f'/{mode}/download/{file_id}')
+
+    assert response.status_code == 200
+    assert response.get_data() == data
+
+
+@pytest.mark.parametrize('size', [0, 5000])
+def test_secure_upload_downloads_the_same_bytes(client, token, size):
+    headers = {'Authorization': f'Bearer {token}'}
+    data = os.urandom(size)
+    file_id = upload(client, '/secure/upload', data, headers)
+
+    response = client.get(f'/secure/download/{file_id}', headers=headers)
+
+    assert response.status_code == 200
+    assert response.get_data() == data
+
+
+@pytest.mark.parametrize('path', ['/distributed/upload', '/distributed/upload/batch'])
+def test_upload_without_active_nodes_is_unavailable(server, client, monkeypatch, path):
+    monkeypatch.setattr(server, 'load_nodes',
+                        lambda: [{**node, 'status': 'failed'} for node in server.node_registry.nodes()])
+
+    response = client.post(path, data={'file': (io.BytesIO(b'x' * 100), 'a.bin')},
+                           content_type='multipart/form-data')
+
+    assert response.status_code == 503
+    assert response.get_json() == {'error': 'No active nodes available for distribution'}
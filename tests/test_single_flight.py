@@ -0,0 +1,126 @@
+import os
+import threading
+
+import pytest
+
+from utils.single_flight import StreamCoalescer
+
+BLOCKS = [os.urandom(1000) for _ in range(8)]
+DATA = b''.join(BLOCKS)
+
+
+class Source:
+    """Opens streams over BLOCKS from any byte offset, recording each open and close"""
+
+    def __init__(self, fail_after=None):
+        self.offsets = []
+        self.closed = 0
+        self.fail_after = fail_after
+
+    def __call__(self, offset):
+        self.offsets.append(offset)
+        return self._blocks(offset)
+
+    def _blocks(self, offset):
+        try:
+            for i in range(offset // 1000, len(BLOCKS)):
+                if self.fail_after is not None and i == self.fail_after:
+                    raise OSError('replica unreachable')
+                yield BLOCKS[i][offset % 1000 if i == offset // 1000 else 0:]
+        finally:
+            self.closed += 1
+
+
+def test_overlapping_streams_share_one_producer():
+    coalescer = StreamCoalescer()
+    source = Source()
+    leader = coalescer.stream('file', source)
+    follower = coalescer.stream('file', source)
+
+    # Both subscribe before either has read past the first block
+    received = {'leader': [next(leader)], 'follower': [next(follower)]}
+    received['leader'].extend(leader)
+    received['follower'].extend(follower)
+
+    assert b''.join(received['leader']) == b''.join(received['follower']) == DATA
+    assert source.offsets == [0]
+    stats = coalescer.get_stats()
+    assert (stats['requests'], stats['coalesced'], stats['active_flights']) == (2, 1, 0)
+    assert (stats['bytes_produced'], stats['bytes_saved']) == (len(DATA), len(DATA))
+
+
+def test_concurrent_readers_each_get_every_byte():
+    coalescer = StreamCoalescer()
+    source = Source()
+    barrier = threading.Barrier(6)
+    results = []
+
+    def read():
+        stream = coalescer.stream('file', source)
+        first = next(stream)
+        barrier.wait()
+        results.append(first + b''.join(stream))
+
+    threads = [threading.Thread(target=read) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [DATA] * 6
+    assert source.offsets == [0]
+    assert coalescer.get_stats()['coalesced'] == 5
+
+
+def test_finished_flight_is_not_joined():
+    coalescer = StreamCoalescer()
+    source = Source()
+
+    assert b''.join(coalescer.stream('file', source)) == DATA
+    assert b''.join(coalescer.stream('file', source)) == DATA
+    assert source.offsets == [0, 0]
+    assert coalescer.get_stats()['coalesced'] == 0
+
+
+def test_lagging_subscriber_detaches_at_its_offset():
+    coalescer = StreamCoalescer(buffer_bytes=2500)
+    source = Source()
+    leader = coalescer.stream('file', source)
+    follower = coalescer.stream('file', source)
+    next(leader)
+    follower_bytes = next(follower)
+
+    # The leader runs ahead until the follower's next block has left the buffer
+    assert next(leader) + b''.join(leader) == DATA[1000:]
+    follower_bytes += b''.join(follower)
+
+    assert follower_bytes == DATA
+    assert source.offsets == [0, 1000]
+    assert coalescer.get_stats()['detached'] == 1
+
+
+def test_producer_error_reaches_every_subscriber():
+    coalescer = StreamCoalescer()
+    source = Source(fail_after=3)
+    leader = coalescer.stream('file', source)
+    follower = coalescer.stream('file', source)
+    next(leader), next(follower)
+
+    for stream in (leader, follower):
+        with pytest.raises(OSError):
+            list(stream)
+
+    assert coalescer.get_stats()['active_flights'] == 0
+    assert b''.join(coalescer.stream('file', Source())) == DATA
+
+
+def test_abandoned_stream_closes_its_producer():
+    coalescer = StreamCoalescer()
+    source = Source()
+    stream = coalescer.stream('file', source)
+    next(stream)
+
+    stream.close()
+
+    assert source.closed == 1
+    assert coalescer.get_stats()['active_flights'] == 0
@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+from utils.storage_node import NodeCluster, NodeClient
+
+
+@pytest.fixture
+def cluster(tmp_path):
+    cluster = NodeCluster(str(tmp_path / 'nodes'))
+    cluster.start(['node-01', 'node-02'])
+    yield cluster
+    cluster.stop()
+
+
+def test_objects_round_trip_over_the_socket(cluster):
+    client = cluster.client('node-01')
+    data = os.urandom(5000)
+
+    client.put('chunk/1 a', data)
+
+    assert client.get('chunk/1 a') == data
+    assert client.has('chunk/1 a') and not client.has('other')
+    assert client.get('other') is None
+    assert cluster.get('node-02', 'chunk/1 a') is None
+    assert client.delete('chunk/1 a') and not client.delete('chunk/1 a')
+    assert not client.has('chunk/1 a')
+    assert client.stats == {'requests': 8, 'connections_opened': 1, 'connections_reused': 7}
+
+
+def test_synced_writes_survive_a_restart(cluster):
+    location = cluster.put('node-01', 'kept', b'kept')
+    cluster.put('node-02', 'gone', b'gone')
+    cluster.delete('node-02', 'gone')
+    cluster.sync()
+
+    cluster.stop()
+    cluster.start(['node-01', 'node-02'])
+
+    assert location == {'node_id': 'node-01', 'chunk_file': 'kept', 'nodes': cluster.root}
+    assert cluster.get('node-01', 'kept') == b'kept'
+    assert not cluster.contains('node-02', 'gone')
+
+
+def test_stale_pooled_connection_is_retried_once(cluster):
+    client = cluster.client('node-01')
+    client.put('a', b'a')
+
+    # The restarted daemon no longer knows the pooled connection
+    cluster.stop()
+    cluster.start(['node-01'])
+
+    assert client.get('a') == b'a'
+    assert client.stats['connections_opened'] == 2
+
+
+def test_fresh_connection_failure_is_not_retried(tmp_path):
+    client = NodeClient(str(tmp_path / 'absent.sock'))
+
+    with pytest.raises(IOError):
+        client.get('a')
+    assert client.stats == {'requests': 1, 'connections_opened': 1, 'connections_reused': 0}
+
+
+def test_start_skips_running_nodes_and_stop_tears_down(cluster):
+    pids = {node_id: node['pid'] for node_id, node in cluster.get_stats()['nodes'].items()}
+    sockets = [cluster.address(node_id) for node_id in pids]
+
+    cluster.start(['node-01', 'node-02'])
+    assert {node_id: node['pid'] for node_id, node in cluster.get_stats()['nodes'].items()} == pids
+
+    processes = list(cluster._processes.values())
+    cluster.stop()
+
+    assert all(process.poll() is not None for process in processes)
+    assert not any(os.path.exists(path) for path in sockets)
+    assert not cluster.contains('node-01', 'a')
+    assert cluster.get_stats()['nodes']['node-01']['status'] == 'unreachable'
@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from utils.upload_sessions import UploadSessionManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return UploadSessionManager(str(tmp_path))
+
+
+def chunk_info(sequence, chunk_hash='h'):
+    return {'chunk_id': f'chunk_{sequence}', 'sequence': sequence, 'size': 4, 'hash': f'{chunk_hash}{sequence}'}
+
+
+def test_chunks_are_appended_and_replayed_after_a_restart(tmp_path, manager):
+    session = manager.create_session('distributed', 'a.bin', 10, 4)
+    upload_id = session['upload_id']
+    for sequence in (2, 0, 1):
+        manager.record_chunk(upload_id, chunk_info(sequence))
+    manager.record_chunk(upload_id, chunk_info(1, 'retried'))
+
+    with open(tmp_path / f'{upload_id}.json') as f:
+        assert 'chunks' not in json.load(f)
+    with open(tmp_path / f'{upload_id}.chunks') as f:
+        assert len(f.readlines()) == 4
+
+    restarted = UploadSessionManager(str(tmp_path))
+    reloaded = restarted.get_session(upload_id)
+    assert [c['hash'] for c in restarted.ordered_chunks(reloaded)] == ['h0', 'retried1', 'h2']
+    assert restarted.missing_chunks(reloaded) == []
+
+
+def test_torn_last_record_is_dropped_and_cut(tmp_path, manager):
+    upload_id = manager.create_session('simple', 'a.bin', 12, 4)['upload_id']
+    manager.record_chunk(upload_id, chunk_info(0))
+    with open(tmp_path / f'{upload_id}.chunks', 'a') as f:
+        f.write('{"chunk_id": "chunk_1", "seq')
+
+    restarted = UploadSessionManager(str(tmp_path))
+    assert restarted.missing_chunks(restarted.get_session(upload_id)) == [1, 2]
+    restarted.record_chunk(upload_id, chunk_info(1))
+
+    again = UploadSessionManager(str(tmp_path))
+    assert again.missing_chunks(again.get_session(upload_id)) == [2]
+
+
+def test_only_one_claim_wins(manager):
+    upload_id = manager.create_session('simple', 'a.bin', 4, 4)['upload_id']
+    barrier = threading.Barrier(8)
+    claims = []
+
+    def claim(state):
+        barrier.wait()
+        claims.append(manager.claim(upload_id, state))
+
+    threads = [threading.Thread(target=claim, args=('committing' if i % 2 else 'aborting',)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(claim is not None for claim in claims) == 1
+
+
+def test_claimed_session_takes_no_chunks_until_reopened(manager):
+    upload_id = manager.create_session('simple', 'a.bin', 8, 4)['upload_id']
+    assert manager.claim(upload_id, 'committing', file_id='f') is not None
+    writes = []
+
+    with pytest.raises(ValueError):
+        manager.record_chunk(upload_id, chunk_info(0), lambda: writes.append(0))
+    assert writes == []
+
+    manager.reopen(upload_id)
+    manager.record_chunk(upload_id, chunk_info(0), lambda: writes.append(0))
+    assert writes == [0]
+    assert manager.get_session(upload_id)['file_id'] == 'f'
+
+
+def test_chunk_writes_run_in_parallel(manager):
+    upload_ids = [manager.create_session('simple', f'{name}.bin', 8, 4)['upload_id'] for name in 'ab']
+    # Each write waits for all the others, so writes made one at a time would break the barrier
+    barrier = threading.Barrier(4, timeout=5)
+    threads = [threading.Thread(target=manager.record_chunk, args=(upload_id, chunk_info(sequence), barrier.wait))
+               for upload_id in upload_ids for sequence in (0, 1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not barrier.broken
+    assert all(manager.missing_chunks(manager.get_session(upload_id)) == [] for upload_id in upload_ids)
+
+
+def test_claim_waits_for_chunks_being_written(manager):
+    upload_id = manager.create_session('simple', 'a.bin', 8, 4)['upload_id']
+    writing, finish = threading.Event(), threading.Event()
+
+    def slow_write():
+        writing.set()
+        finish.wait(5)
+
+    writer = threading.Thread(target=manager.record_chunk, args=(upload_id, chunk_info(0), slow_write))
+    writer.start()
+    writing.wait(5)
+    claims = []
+    claimer = threading.Thread(target=lambda: claims.append(manager.claim(upload_id, 'committing')))
+    claimer.start()
+
+    claimer.join(0.1)
+    assert claimer.is_alive()
+    # Closed to new chunks as soon as it is claimed
+    with pytest.raises(ValueError):
+        manager.record_chunk(upload_id, chunk_info(1))
+
+    finish.set()
+    writer.join()
+    claimer.join()
+    assert manager.missing_chunks(claims[0]) == [1]
+
+
+def test_record_chunk_on_a_deleted_session_raises_key_error(manager):
+    upload_id = manager.create_session('simple', 'a.bin', 4, 4)['upload_id']
+    manager.delete_session(upload_id)
+    with pytest.raises(KeyError):
+        manager.record_chunk(upload_id, chunk_info(0))
+
+
+def test_expire_claims_idle_open_sessions_only(tmp_path, manager):
+    idle = manager.create_session('simple', 'a.bin', 8, 4)['upload_id']
+    manager.record_chunk(idle, chunk_info(0))
+    busy = manager.create_session('simple', 'b.bin', 8, 4)['upload_id']
+    stale = time.time() - 7200
+    for name in (f'{idle}.json', f'{idle}.chunks'):
+        os.utime(tmp_path / name, (stale, stale))
+
+    expired = manager.expire(3600)
+
+    assert [(s['upload_id'], s['state']) for s in expired] == [(idle, 'aborting')]
+    assert manager.claim(idle, 'committing') is None
+    assert manager.claim(busy, 'committing') is not None
+
+
+def test_sweeper_survives_a_failing_handler(manager):
+    upload_id = manager.create_session('simple', 'a.bin', 4, 4)['upload_id']
+    calls = []
+
+    def on_expired(session):
+        calls.append(session['upload_id'])
+        if len(calls) == 1:
+            raise OSError('disk unavailable')
+        manager.delete_session(session['upload_id'])
+
+    manager.start_sweeper(0, on_expired, interval=0.01)
+    try:
+        deadline = time.time() + 5
+        while manager.get_session(upload_id) is not None and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        manager.stop()
+
+    assert calls[:2] == [upload_id, upload_id]
+    assert manager.get_session(upload_id) is None
@@ -1,16 +1,28 @@
-from flask import Flask, request, jsonify, send_file, send_from_directory, render_template
+from flask import Flask, Response, request, jsonify, send_file, send_from_directory, render_template, g
 from flask_cors import CORS
 import uuid
-import hashlib
+import base64
 import os
 import json
 from datetime import datetime
 import random
-import time
+import itertools
+import threading
+import mmap
+import tarfile
+import unicodedata
+from urllib.parse import quote
 
 # Import security modules
 from phase2_security_enhancements import auth, encryption, models
-from utils import chunking_utils, distribution_utils
+from utils import chunking_utils, cdc_chunking_utils, distribution_utils, upload_session_manager, ChunkStore, DistributionError
+from utils import FileDigest, LEGACY_HASH_ALGORITHM, hash_bytes, record_hash_algorithm
+from utils import get_codec, is_erasure_coded, ChunkCompressor, decompress, NO_COMPRESSION
+from utils import open_pack_store, object_exists, delete_object, ChunkCache, download_coalescer
+from utils import open_node_cluster, get_placement, placement_key
+from utils import open_metadata_store, MetadataJournal, AvailabilityIndex, RepairScheduler
+from utils import NodeRegistry
+from utils import parse_ranges, multipart_byteranges
 from utils.logging_utils import secure_logger, error_handler
 
 # Add path for security imports
@@ -20,23 +32,78 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'phase2_security_enhance
 app = Flask(__name__)
 CORS(app)
 
+# Chunking engines: fixed 1MB splits or content-defined (FastCDC-style) boundaries.
+# 'hash' selects the chunk/file digest algorithm ('md5' is kept for legacy records).
+# 'erasure' (e.g. {'data_shards': 6, 'parity_shards': 3}) stores each chunk as
+# Reed-Solomon shards instead of full replicas: 6+3 survives any 3 lost shards
+# at 1.5x storage, versus 1 lost copy at 2x for replication. Shards are spread
+# round-robin, so node-level fault tolerance grows with the number of nodes.
+# 'compression' ('auto', 'zlib', 'zstd' or 'lz4') compresses chunks before they
+# are stored (and before encryption in secure mode); 'auto' prefers zstd.
+# 'pack_files' appends chunk replicas and small uploads to per-node segment
+# files under <dir>/packs instead of creating one file per object.
+# 'node_daemons' stores chunk replicas through storage-node daemons: one local
+# process per node, each with its own data root under <dir>/nodes, reached over
+# keep-alive HTTP on a Unix socket. NODE_DAEMONS=spawn (default) starts the ones
+# that are not running, 'external' only connects to them, and 'off' falls back
+# to in-process pack files.
+# 'placement' chooses the nodes for a chunk: 'random' (default), or 'rendezvous'
+# for capacity-weighted rendezvous hashing of the chunk digest, so a chunk's
+# nodes can be computed from the cluster map and a node joining or leaving only
+# moves the chunks it wins or loses. NODE_CAPACITIES (e.g. 'node-01=2,node-02=1')
+# sets relative node weights. 'load_aware' picks the less loaded of two random
+# nodes per replica, by write latency, queued writes and free space under
+# NODE_STORAGE_LIMIT_MB.
+# 'repair' tunes background re-replication of degraded chunks: worker threads,
+# a bandwidth cap in MB/s, and how long a failed node gets to come back before
+# its chunks are copied elsewhere.
+# Node health comes from heartbeats, probed every HEARTBEAT_INTERVAL seconds
+# (nodes may also push them to /nodes/<node_id>/heartbeat) and scored by a
+# phi-accrual detector: a node is suspect at phi 3, when it takes no new writes
+# but its copies still count, and failed at phi 8, when repair is scheduled.
+# 'chunk_cache_mb' keeps recently downloaded chunks in memory (LRU, keyed by
+# chunk digest); secure mode caches them still encrypted.
+CHUNKERS = {
+    'fixed': chunking_utils,
+    'cdc': cdc_chunking_utils
+}
+
 # Storage configurations for different modes
 STORAGE_CONFIGS = {
     'simple': {
         'dir': 'files_simple',
-        'metadata': 'metadata_simple.json'
+        'metadata': 'metadata_simple.db',
+        'chunker': 'fixed',
+        'hash': 'blake2b',
+        'pack_files': True
     },
     'distributed': {
         'dir': 'files_distributed',
-        'metadata': 'metadata_distributed.json'
+        'metadata': 'metadata_distributed.db',
+        'chunker': 'cdc',
+        'hash': 'blake2b',
+        'dedup': True,
+        'compression': 'auto',
+        'node_daemons': True,
+        'pack_files': True,
+        'placement': 'rendezvous',
+        'chunk_cache_mb': 256,
+        'repair': {'workers': 2, 'bandwidth_mb': 32, 'grace_seconds': 10}
     },
     'production': {
         'dir': 'files_production',
-        'metadata': 'metadata_production.json'
+        'metadata': 'metadata_production.db',
+        'chunker': 'fixed',
+        'hash': 'blake2b',
+        'pack_files': True
     },
     'secure': {
         'dir': 'files_secure',
-        'metadata': 'metadata_secure.json'
+        'metadata': 'metadata_secure.db',
+        'chunker': 'fixed',
+        'hash': 'md5',
+        'compression': 'auto',
+        'chunk_cache_mb': 128
     }
 }
 
@@ -44,11 +111,81 @@ STORAGE_CONFIGS = {
 for config in STORAGE_CONFIGS.values():
     os.makedirs(config['dir'], exist_ok=True)
 
-# Clear metadata files on server restart to reset file counts
-for config in STORAGE_CONFIGS.values():
-    metadata_file = config['metadata']
-    if os.path.exists(metadata_file):
-        os.remove(metadata_file)
+# Content-addressed chunk stores for modes that deduplicate chunks
+CHUNK_STORES = {
+    mode: ChunkStore(config['dir'])
+    for mode, config in STORAGE_CONFIGS.items() if config.get('dedup')
+}
+
+# Compression stages for modes that compress chunks
+CHUNK_COMPRESSORS = {
+    mode: ChunkCompressor(config['compression'])
+    for mode, config in STORAGE_CONFIGS.items() if config.get('compression')
+}
+
+# Pack-file backends for modes that pack small objects
+PACK_STORES = {
+    mode: open_pack_store(os.path.join(config['dir'], 'packs'))
+    for mode, config in STORAGE_CONFIGS.items() if config.get('pack_files')
+}
+
+# Storage-node daemons for modes that keep replicas in node processes
+NODE_IDS = ['node-01', 'node-02', 'node-03']
+NODE_STORAGE_LIMIT = int(os.getenv('NODE_STORAGE_LIMIT_MB', '0')) * 1024 * 1024 or None
+NODE_CAPACITIES = {
+    node_id: float(capacity)
+    for node_id, _, capacity in (entry.partition('=') for entry in os.getenv('NODE_CAPACITIES', '').split(',') if entry)
+}
+NODE_DAEMONS = os.getenv('NODE_DAEMONS', 'spawn')
+NODE_CLUSTERS = {
+    mode: open_node_cluster(os.path.join(config['dir'], 'nodes'))
+    for mode, config in STORAGE_CONFIGS.items() if config.get('node_daemons') and NODE_DAEMONS != 'off'
+}
+if NODE_DAEMONS == 'spawn':
+    for cluster in NODE_CLUSTERS.values():
+        cluster.start(NODE_IDS)
+
+# Download caches for modes that keep hot chunks in memory
+CHUNK_CACHES = {
+    mode: ChunkCache(config['chunk_cache_mb'] * 1024 * 1024)
+    for mode, config in STORAGE_CONFIGS.items() if config.get('chunk_cache_mb')
+}
+
+# How whole files on disk (simple and production mode) are sent:
+#   'sendfile'   - by the worker, through the WSGI server's file wrapper (gunicorn
+#                  uses os.sendfile) or else from a memory map in large blocks
+#   'x-sendfile' - the app only authorizes the download and answers with an
+#                  X-Sendfile header; Apache/lighttpd send the file
+#   'x-accel'    - the same for nginx via X-Accel-Redirect to an internal
+#                  location aliasing the server directory, e.g.
+#                  location /protected/ { internal; alias /srv/sdfbs/; }
+DOWNLOAD_OFFLOAD = os.getenv('DOWNLOAD_OFFLOAD', 'sendfile')
+X_ACCEL_PREFIX = os.getenv('X_ACCEL_PREFIX', '/protected/')
+
+# Node state is kept in an append-only journal (group-committed fsyncs, periodic
+# snapshots), so it survives restarts along with the SQLite file catalogs.
+metadata_journal = MetadataJournal(os.getenv('METADATA_JOURNAL_DIR', 'metadata_journal'))
+
+# RESET_METADATA=1 starts every run with empty catalogs and node counters
+if os.getenv('RESET_METADATA', '0') == '1':
+    for config in STORAGE_CONFIGS.values():
+        open_metadata_store(config['metadata']).clear()
+    metadata_journal.reset()
+
+# Node membership and health, journaled; status changes are published as events
+node_registry = NodeRegistry(
+    metadata_journal, NODE_IDS,
+    attributes={node_id: {'capacity': NODE_CAPACITIES.get(node_id, 1.0), 'storage_limit': NODE_STORAGE_LIMIT}
+                for node_id in NODE_IDS},
+    heartbeat_interval=float(os.getenv('HEARTBEAT_INTERVAL', '1.0'))
+)
+
+def probe_node(node_id):
+    """Heartbeat a node daemon over its socket; in-process nodes are always up"""
+    cluster = NODE_CLUSTERS.get('distributed')
+    return cluster is None or cluster.client(node_id).ping()
+
+node_registry.start_monitor(probe_node)
 
 # Mock users for secure mode
 USERS_FILE = 'users.json'
@@ -97,17 +234,105 @@ if not os.path.exists(NODES_FILE):
     with open(NODES_FILE, 'w') as f:
         json.dump(mock_nodes, f)
 
-def load_metadata(mode):
-    config = STORAGE_CONFIGS[mode]
-    if os.path.exists(config['metadata']):
-        with open(config['metadata'], 'r') as f:
-            return json.load(f)
-    return {}
+def get_chunker(mode):
+    """Chunking engine configured for a mode"""
+    return CHUNKERS[STORAGE_CONFIGS[mode].get('chunker', 'fixed')]
 
-def save_metadata(mode, metadata):
-    config = STORAGE_CONFIGS[mode]
-    with open(config['metadata'], 'w') as f:
-        json.dump(metadata, f, default=str)
+def get_hash_algorithm(mode):
+    """Digest algorithm new uploads in a mode are hashed with"""
+    return STORAGE_CONFIGS[mode].get('hash', LEGACY_HASH_ALGORITHM)
+
+def get_erasure_codec(mode):
+    """Reed-Solomon codec for a mode, or None if chunks are replicated"""
+    erasure = STORAGE_CONFIGS[mode].get('erasure')
+    if not erasure:
+        return None
+    return get_codec(erasure['data_shards'], erasure['parity_shards'])
+
+def compress_chunks(mode, chunks):
+    """Run chunks through the mode's compression stage, if it has one"""
+    compressor = CHUNK_COMPRESSORS.get(mode)
+    if compressor is None:
+        return chunks
+    return compressor.compress_chunks(chunks)
+
+def describe_redundancy(mode):
+    """Redundancy settings recorded with each distributed file"""
+    codec = get_erasure_codec(mode)
+    if codec is None:
+        return {'replication_factor': distribution_utils.replication_factor}
+    return {'erasure': {'data_shards': codec.k, 'parity_shards': codec.m}}
+
+def get_pack_store(mode):
+    """Pack-file backend for a mode, or None if every object is its own file"""
+    return PACK_STORES.get(mode)
+
+def get_placement_policy(mode):
+    """How a mode picks the nodes for each chunk"""
+    return get_placement(STORAGE_CONFIGS[mode].get('placement', 'random'))
+
+def get_object_store(mode):
+    """Where a mode writes chunk replicas: its node daemons, else its pack store (None: one file each)"""
+    return NODE_CLUSTERS.get(mode) or get_pack_store(mode)
+
+def sync_object_stores(mode):
+    """Make a mode's new objects durable before metadata starts pointing at them"""
+    for store in (NODE_CLUSTERS.get(mode), get_pack_store(mode)):
+        if store is not None:
+            store.sync()
+
+def get_chunk_cache(mode):
+    """Download chunk cache for a mode, or None if it does not cache chunks"""
+    return CHUNK_CACHES.get(mode)
+
+def chunk_cache_keys(file_info, scope=None):
+    """Cache key of each of a file's chunks: its digest, qualified by scope (e.g. the file id)"""
+    algorithm = record_hash_algorithm(file_info)
+    suffix = f'@{scope}' if scope else ''
+    return {c['chunk_id']: f"{algorithm}:{c['hash']}{suffix}" for c in file_info['chunks'] if 'hash' in c}
+
+def pinned_chunk_cache(mode, cache_keys, chunk_distribution):
+    """A mode's chunk cache, holding on to the cached chunks of chunk_distribution for one download"""
+    cache = get_chunk_cache(mode)
+    if cache is None:
+        return None
+    return cache.pin(cache_keys[chunk_id] for chunk_id in chunk_distribution if chunk_id in cache_keys)
+
+def get_chunk_store(mode):
+    """Deduplicating chunk store for a mode, or None if it stores every replica"""
+    return CHUNK_STORES.get(mode)
+
+def release_chunks(mode, file_info):
+    """Drop a file's references to its stored chunks, deleting replicas nobody else uses"""
+    chunk_store = get_chunk_store(mode)
+    chunks = file_info.get('chunks')
+    chunks_by_id = {c['chunk_id']: c for c in chunks} if isinstance(chunks, list) else {}
+
+    for chunk_id, locations in file_info.get('chunk_distribution', {}).items():
+        digest = chunks_by_id.get(chunk_id, {}).get('digest')
+        if chunk_store is not None and digest:
+            chunk_store.release(digest)
+            continue
+
+        for location in locations:
+            delete_object(location)
+
+def delete_file_data(mode, file_id, file_info):
+    """Give back everything a file record stores: chunk references, a packed object or a flat file"""
+    if 'chunk_distribution' in file_info:
+        release_chunks(mode, file_info)
+    elif file_info.get('packed'):
+        get_pack_store(mode).delete(file_id)
+    else:
+        file_path = os.path.join(STORAGE_CONFIGS[mode]['dir'], file_id)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+    # Deleted objects leave the pack indexes in one commit per file
+    sync_object_stores(mode)
+
+def get_metadata_store(mode):
+    """File catalog of a mode (SQLite); import legacy JSON with python -m utils.metadata_store"""
+    return open_metadata_store(STORAGE_CONFIGS[mode]['metadata'])
 
 def load_users():
     if os.path.exists(USERS_FILE):
@@ -120,34 +345,183 @@ def save_users(users):
         json.dump(users, f, default=str)
 
 def load_nodes():
-    # Always return fresh nodes on server restart for distributed mode
-    return [
-        {
-            'node_id': 'node-01',
-            'status': 'active',
-            'files_count': 0,
-            'storage_used': 0,
-            'last_heartbeat': datetime.now().isoformat()
-        },
-        {
-            'node_id': 'node-02',
-            'status': 'active',
-            'files_count': 0,
-            'storage_used': 0,
-            'last_heartbeat': datetime.now().isoformat()
-        },
-        {
-            'node_id': 'node-03',
-            'status': 'active',
-            'files_count': 0,
-            'storage_used': 0,
-            'last_heartbeat': datetime.now().isoformat()
-        }
-    ]
+    """Copies of the registry's nodes, for the distribution layer to place on and count into"""
+    return node_registry.nodes()
+
+def record_node_usage(nodes):
+    """Add what was written through nodes from load_nodes() to the registry's counters"""
+    node_registry.record_usage(distribution_utils.usage(nodes))
+
+def on_node_event(event):
+    """Failed nodes stop counting towards availability and get their chunks queued for repair"""
+    node_id, up = event['node_id'], event['to'] != 'failed'
+    icon = {'active': '✅', 'suspect': '⚠️', 'failed': '🚨'}[event['to']]
+    print(f"{icon} Node {node_id} {event['from']} -> {event['to']} (phi {event['phi']})")
+    for mode, index in list(AVAILABILITY_INDEXES.items()):
+        if index.set_node_active(node_id, up) and not up:
+            get_repair_scheduler(mode).node_failed(index.chunks_on_node(node_id))
+
+node_registry.subscribe(on_node_event)
+
+# Chunk availability of distributed files, kept current by uploads, deletes, node
+# state changes and repairs so listings do not stat every replica
+AVAILABILITY_MODES = {'distributed'}
+AVAILABILITY_INDEXES = {}
+availability_lock = threading.Lock()
+
+# Background repair per indexed mode, fed by node failures and missing objects
+REPAIR_SCHEDULERS = {}
+
+# Uploads and downloads in flight (until their response body is sent); repair holds off while any run
+FOREGROUND_ENDPOINTS = {'upload_file', 'upload_batch', 'upload_session_chunk', 'commit_upload_session',
+                        'download_file', 'secure_upload', 'secure_download'}
+foreground_transfers = 0
+foreground_lock = threading.Lock()
+
+def end_foreground_transfer():
+    global foreground_transfers
+    with foreground_lock:
+        foreground_transfers -= 1
+
+@app.before_request
+def begin_foreground_transfer():
+    global foreground_transfers
+    if request.endpoint in FOREGROUND_ENDPOINTS:
+        with foreground_lock:
+            foreground_transfers += 1
+        g.foreground_transfer = True
+
+@app.after_request
+def track_foreground_response(response):
+    # Streamed downloads keep counting until the server closes the response
+    if g.pop('foreground_transfer', False):
+        if response.is_streamed:
+            response.call_on_close(end_foreground_transfer)
+        else:
+            end_foreground_transfer()
+    return response
+
+@app.teardown_request
+def abort_foreground_transfer(exc):
+    # Only still set when the request failed before a response was made
+    if g.pop('foreground_transfer', False):
+        end_foreground_transfer()
+
+def get_availability_index(mode):
+    """Availability index of a mode, built from its catalog on first use; None if it keeps none"""
+    if mode not in AVAILABILITY_MODES:
+        return None
+    with availability_lock:
+        index = AVAILABILITY_INDEXES.get(mode)
+        if index is None:
+            index = AvailabilityIndex()
+            for node in node_registry.nodes():
+                index.set_node_active(node['node_id'], node['status'] != 'failed')
+            for file_id, file_info in get_metadata_store(mode).iter_files():
+                if 'chunk_distribution' in file_info:
+                    index.add_file(file_id, file_info['chunk_distribution'])
+            AVAILABILITY_INDEXES[mode] = index
+        return index
+
+def get_repair_scheduler(mode):
+    """Background repair of a mode's degraded chunks, started on first use; None for modes without an index"""
+    if mode not in AVAILABILITY_MODES:
+        return None
+    with availability_lock:
+        scheduler = REPAIR_SCHEDULERS.get(mode)
+        if scheduler is not None:
+            return scheduler
+    index = get_availability_index(mode)
+    settings = STORAGE_CONFIGS[mode].get('repair', {})
+    with availability_lock:
+        if mode not in REPAIR_SCHEDULERS:
+            REPAIR_SCHEDULERS[mode] = RepairScheduler(
+                lambda file_id, chunk_id: repair_chunk(mode, file_id, chunk_id), index.chunk_health,
+                distribution_utils.replication_factor,
+                workers=settings.get('workers', 2),
+                bandwidth=settings.get('bandwidth_mb', 32) * 1024 * 1024,
+                grace_period=settings.get('grace_seconds', 10),
+                busy=lambda: foreground_transfers > 0
+            )
+            # Pick up whatever was left degraded before this process started
+            REPAIR_SCHEDULERS[mode].enqueue(index.under_replicated(distribution_utils.replication_factor))
+        return REPAIR_SCHEDULERS[mode]
+
+def repair_chunk(mode, file_id, chunk_id):
+    """Bring one chunk of a file back to full redundancy from its readable copies; returns bytes written"""
+    metadata_store = get_metadata_store(mode)
+    file_info = metadata_store.get_file(file_id)
+    locations = (file_info or {}).get('chunk_distribution', {}).get(chunk_id)
+    if not locations:
+        return 0
+
+    availability = get_availability_index(mode)
+    chunk_store = get_chunk_store(mode)
+    chunk = next((c for c in file_info.get('chunks', []) if c['chunk_id'] == chunk_id), {'chunk_id': chunk_id})
+    digest = chunk.get('digest')
 
-def save_nodes(nodes):
-    with open(NODES_FILE, 'w') as f:
-        json.dump(nodes, f, default=str)
+    nodes = load_nodes()
+    active_nodes = [n for n in nodes if n['status'] == 'active']
+    active_ids = {n['node_id'] for n in active_nodes}
+    # Copies on suspect nodes are neither read from nor given up on: they count towards full
+    # redundancy, or a scan would add copies that are surplus once those nodes are active again
+    suspect_ids = {n['node_id'] for n in nodes if n['status'] == 'suspect'}
+
+    if is_erasure_coded(locations):
+        # Lost shards are decoded from the survivors and written again
+        new_locations = distribution_utils.repair_shards(
+            chunk_id, locations, active_nodes, STORAGE_CONFIGS[mode]['dir'], chunk_store, digest,
+            get_object_store(mode), suspect_ids
+        )
+        written = sum(get_codec(l['data_shards'], l['parity_shards']).shard_size(l['chunk_size']) for l in new_locations)
+    else:
+        surviving = []
+        suspect_copies = sum(1 for location in locations if location['node_id'] in suspect_ids)
+        for location in locations:
+            if location['node_id'] not in active_ids:
+                continue
+            if object_exists(location):
+                surviving.append(location)
+            else:
+                availability.mark_missing(location)
+
+        new_locations = []
+        written = 0
+        candidates = [n for n in active_nodes if n['node_id'] not in {l['node_id'] for l in surviving}]
+        while (surviving and candidates and
+               len(surviving) + suspect_copies + len(new_locations) < distribution_utils.replication_factor):
+            # The policy's next choice, so deterministic placement stays computable
+            new_node = get_placement_policy(mode).select(placement_key(chunk), candidates, 1)[0]
+            candidates.remove(new_node)
+            for source in surviving:
+                new_location = distribution_utils.copy_replica(
+                    chunk_id, source, new_node, STORAGE_CONFIGS[mode]['dir'], chunk_store, digest,
+                    get_object_store(mode)
+                )
+                if new_location:
+                    new_locations.append(new_location)
+                    written += chunk.get('stored_size', chunk.get('size', 0))
+                    break
+
+    if not new_locations:
+        return 0
+
+    # Durable before any metadata points at the new copies
+    sync_object_stores(mode)
+    for new_location in new_locations:
+        metadata_store.add_location(file_id, chunk_id, new_location)
+        availability.add_replica(file_id, chunk_id, new_location)
+        if chunk_store is not None and digest:
+            chunk_store.add_location(digest, new_location)
+        print(f"🔄 Repaired {chunk_id} of {file_id} onto {new_location['node_id']}")
+    record_node_usage(nodes)
+    return written
+
+def index_file_availability(mode, file_id, file_record):
+    """Start tracking the chunk availability of a newly stored file"""
+    index = get_availability_index(mode)
+    if index is not None and 'chunk_distribution' in file_record:
+        index.add_file(file_id, file_record['chunk_distribution'])
 
 # Routes
 @app.route('/')
@@ -170,29 +544,154 @@ def distribute_chunks_across_nodes(chunks, nodes, replication_factor=2):
     """Distribute chunks across nodes with redundancy - now using shared utils"""
     return distribution_utils.distribute_chunks_across_nodes(chunks, nodes, 'files_distributed')
 
-def simulate_node_failure():
-    """Randomly simulate node failures for fault tolerance testing"""
-    nodes = load_nodes()
-    # 20% chance of a node failing
-    for node in nodes:
-        if random.random() < 0.2 and node['status'] == 'active':
-            node['status'] = 'failed'
-            print(f"🚨 Node {node['node_id']} failed!")
-    save_nodes(nodes)
-    return nodes
-
-def reconstruct_file_from_chunks(file_id, mode):
-    """Reconstruct file from surviving chunks - now using shared utils"""
-    metadata = load_metadata(mode)
-    if file_id not in metadata or 'chunk_distribution' not in metadata[file_id]:
-        return None
+def stream_download(chunks, filename, file_size):
+    """Attachment response that sends chunks as they are read instead of buffering the file"""
+    response = Response(chunks, mimetype='application/octet-stream')
+    try:
+        filename.encode('ascii')
+        names = {'filename': filename}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        names = {'filename': simple, 'filename*': f"UTF-8''{quote(filename, safe='!#$&+-.^_`|~')}"}
+    response.headers.set('Content-Disposition', 'attachment', **names)
+    if file_size is not None:
+        response.content_length = file_size
+    return response
+
+def requested_ranges(file_size, etag):
+    """Byte ranges [start, stop) asked for by Range, [] if none is satisfiable, or None for the whole file"""
+    return parse_ranges(request.headers.get('Range'), request.headers.get('If-Range'), file_size, etag)
+
+def ranged_download(ranges, read_range, filename, file_size, etag, full=None):
+    """Serve the requested ranges of a file; read_range(start, stop) yields the bytes of [start, stop)"""
+    if ranges is None:
+        response = stream_download(full if full is not None else read_range(0, file_size), filename, file_size)
+    elif not ranges:
+        response = Response(status=416)
+        response.headers['Content-Range'] = f'bytes */{file_size}'
+    elif len(ranges) == 1:
+        start, stop = ranges[0]
+        response = stream_download(read_range(start, stop), filename, stop - start)
+        response.status_code = 206
+        response.headers['Content-Range'] = f'bytes {start}-{stop - 1}/{file_size}'
+    else:
+        body, length, content_type = multipart_byteranges(ranges, read_range, file_size)
+        response = stream_download(body, filename, length)
+        response.status_code = 206
+        response.headers['Content-Type'] = content_type
+
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.set_etag(etag)
+    return response
+
+def read_file_range(path, start, stop, block_size=4 * 1024 * 1024):
+    """Yield bytes [start, stop) of a file in large blocks copied straight out of a memory map"""
+    if start >= stop:
+        return
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if hasattr(mapped, 'madvise'):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        for offset in range(start, stop, block_size):
+            yield mapped[offset:min(offset + block_size, stop)]
+
+def send_stored_file(path, filename, checksum, ranges):
+    """Send a whole file from disk, or hand it to the front proxy, per DOWNLOAD_OFFLOAD"""
+    if DOWNLOAD_OFFLOAD in ('x-sendfile', 'x-accel'):
+        # The proxy sends the body and answers Range itself
+        response = stream_download(iter(()), filename, None)
+        if DOWNLOAD_OFFLOAD == 'x-sendfile':
+            response.headers['X-Sendfile'] = os.path.abspath(path)
+        else:
+            response.headers['X-Accel-Redirect'] = X_ACCEL_PREFIX + quote(path.replace(os.sep, '/'))
+        response.set_etag(checksum)
+        return response
+
+    if ranges is None and 'wsgi.file_wrapper' in request.environ:
+        # send_file hands the open file to the server's wrapper, which can copy it in the kernel
+        return send_file(path, as_attachment=True, download_name=filename, etag=checksum)
+
+    return ranged_download(ranges, lambda start, stop: read_file_range(path, start, stop),
+                           filename, os.path.getsize(path), checksum)
+
+def coalesced(key, read_range):
+    """read_range shared by concurrent downloads of the same bytes of the same file"""
+    def read_shared(start, stop):
+        return download_coalescer.stream((*key, start, stop), lambda offset: read_range(start + offset, stop))
+    return read_shared
+
+def verified_chunks(chunks, file_info):
+    """Yield a whole file from its (chunk_id, data) pairs, holding the last chunk back until the file
+    checksum matches, so a corrupt download never arrives complete"""
+    chunk_hashes = {c['chunk_id']: c.get('hash') for c in file_info['chunks']}
+    file_digest = FileDigest(record_hash_algorithm(file_info))
+    held_back = None
+    for chunk_id, chunk_data in chunks:
+        file_digest.update_chunk({'data': chunk_data, 'hash': chunk_hashes[chunk_id], 'size': len(chunk_data)})
+        if held_back is not None:
+            yield held_back
+        held_back = chunk_data
+
+    if not file_digest.matches(file_info):
+        raise ValueError("File integrity check failed")
+    if held_back is not None:
+        yield held_back
+
+def range_distribution(file_info, ranges):
+    """The part of a file's chunk distribution needed to serve ranges (all of it for a whole download)"""
+    chunk_distribution = file_info.get('chunk_distribution') or {}
+    if not ranges:
+        return chunk_distribution
+
+    needed = {chunk_id for start, stop in ranges
+              for chunk_id, _, _ in distribution_utils.chunks_for_range(file_info['chunks'], start, stop)}
+    return {chunk_id: locations for chunk_id, locations in chunk_distribution.items() if chunk_id in needed}
+
+def get_upload_stream():
+    """Return (filename, stream) for the request body without reading it into memory"""
+    file = request.files.get('file')
+    if file:
+        return file.filename, file.stream
 
-    file_info = metadata[file_id]
-    chunk_distribution = file_info['chunk_distribution']
-    nodes = load_nodes()
-    active_nodes = [n for n in nodes if n['status'] == 'active']
+    # Raw uploads (Content-Type: application/octet-stream) are read straight off the socket
+    filename = request.headers.get('X-Filename') or request.args.get('filename')
+    if filename and request.content_length != 0:
+        return filename, request.stream
+
+    return None, None
 
-    return distribution_utils.reconstruct_from_distribution(file_id, chunk_distribution, active_nodes)
+def write_stream_to_file(mode, file_id, stream):
+    """Store an upload chunk by chunk, packing small files; returns (file digest, packed)"""
+    file_digest = FileDigest(get_hash_algorithm(mode))
+    chunks = digest_chunks(chunking_utils.iter_chunks_from_stream(stream, file_digest.algorithm), file_digest)
+    pack_store = get_pack_store(mode)
+
+    head = []
+    if pack_store is not None:
+        for chunk in chunks:
+            head.append(chunk)
+            if file_digest.size > pack_store.max_object_size:
+                break
+        else:
+            # Made durable by the caller's sync_object_stores, once per request
+            pack_store.put('local', file_id, b''.join(chunk['data'] for chunk in head))
+            return file_digest, True
+
+    file_path = os.path.join(STORAGE_CONFIGS[mode]['dir'], file_id)
+    try:
+        with open(file_path, 'wb') as f:
+            for chunk in itertools.chain(head, chunks):
+                f.write(chunk['data'])
+    except Exception:
+        # A stream that broke off midway must not leave a partial file behind
+        os.remove(file_path)
+        raise
+    return file_digest, False
+
+def digest_chunks(chunks, file_digest):
+    """Fold each chunk into the whole-file digest as it passes through the pipeline"""
+    for chunk in chunks:
+        file_digest.update_chunk(chunk)
+        yield chunk
 
 # API Routes for different modes
 @app.route('/<mode>/upload', methods=['POST'])
@@ -200,66 +699,44 @@ def upload_file(mode):
     if mode not in STORAGE_CONFIGS:
         return jsonify({'error': 'Invalid mode'}), 400
 
-    file = request.files.get('file')
-    if not file:
+    filename, stream = get_upload_stream()
+    if stream is None:
         return jsonify({'error': 'No file provided'}), 400
 
-    file_data = file.read()
     file_id = str(uuid.uuid4())
-    config = STORAGE_CONFIGS[mode]
-
-    # Simulate node failure before processing
-    if mode == 'distributed':
-        simulate_node_failure()
 
     if mode == 'distributed':
-        # Split file into chunks for fault tolerance
-        chunks = split_file_into_chunks(file_data)
         nodes = load_nodes()
-        chunk_distribution = distribute_chunks_across_nodes(chunks, nodes)
+        if not any(n['status'] == 'active' for n in nodes):
+            return jsonify({'error': 'No active nodes available for distribution'}), 503
+        try:
+            file_record = store_distributed_upload(mode, filename, stream, nodes)
+        except DistributionError as e:
+            error_response = error_handler.handle_file_operation_error("upload", filename, e)
+            error_response['failed_writes'] = e.errors
+            return jsonify(error_response), 503
+        sync_object_stores(mode)
 
         # Save metadata with chunk information
-        metadata = load_metadata(mode)
-        metadata[file_id] = {
-            'filename': file.filename,
-            'file_size': len(file_data),
-            'upload_time': datetime.now().isoformat(),
-            'node_id': 'distributed',
-            'chunks': chunks,
-            'chunk_distribution': chunk_distribution,
-            'replication_factor': 2,
-            'checksum': hashlib.md5(file_data).hexdigest(),
-            'encrypted': mode == 'secure'
-        }
-        save_metadata(mode, metadata)
-        save_nodes(nodes)
+        get_metadata_store(mode).put_file(file_id, file_record)
+        index_file_availability(mode, file_id, file_record)
+        record_node_usage(nodes)
 
         return jsonify({
             'message': 'File uploaded with fault tolerance',
             'file_id': file_id,
-            'chunks': len(chunks),
-            'replication_factor': 2,
-            'distributed_across': len(set([loc['node_id'] for dist in chunk_distribution.values() for loc in dist]))
+            'chunks': len(file_record['chunks']),
+            **describe_redundancy(mode),
+            'distributed_across': len(set([loc['node_id'] for dist in file_record['chunk_distribution'].values() for loc in dist]))
         })
 
     else:
-        # Simple mode - save as single file
-        file_path = os.path.join(config['dir'], file_id)
-        with open(file_path, 'wb') as f:
-            f.write(file_data)
+        # Simple mode - save as single file (small files go to a pack segment)
+        file_record = store_flat_upload(mode, file_id, filename, stream)
+        sync_object_stores(mode)
 
         # Save metadata
-        metadata = load_metadata(mode)
-        metadata[file_id] = {
-            'filename': file.filename,
-            'file_size': len(file_data),
-            'upload_time': datetime.now().isoformat(),
-            'node_id': 'local',
-            'chunks': 1,
-            'checksum': hashlib.md5(file_data).hexdigest(),
-            'encrypted': mode == 'secure'
-        }
-        save_metadata(mode, metadata)
+        get_metadata_store(mode).put_file(file_id, file_record)
 
         return jsonify({
             'message': 'File uploaded successfully',
@@ -268,81 +745,413 @@ def upload_file(mode):
             'chunks': 1
         })
 
+def store_distributed_upload(mode, filename, stream, nodes):
+    """Stream an upload through chunking, compression and distribution; returns its metadata record"""
+    file_digest = FileDigest(get_hash_algorithm(mode))
+    chunks = digest_chunks(get_chunker(mode).iter_chunks_from_stream(stream, file_digest.algorithm), file_digest)
+    chunks = compress_chunks(mode, chunks)
+    chunk_distribution, chunk_infos = distribution_utils.distribute_chunk_stream(
+        chunks, nodes, STORAGE_CONFIGS[mode]['dir'], get_chunk_store(mode), get_erasure_codec(mode),
+        get_object_store(mode), get_placement_policy(mode)
+    )
+
+    return {
+        'filename': filename,
+        'file_size': sum(c['size'] for c in chunk_infos),
+        'upload_time': datetime.now().isoformat(),
+        'node_id': 'distributed',
+        'chunks': chunk_infos,
+        'chunk_distribution': chunk_distribution,
+        'chunker': STORAGE_CONFIGS[mode]['chunker'],
+        **describe_redundancy(mode),
+        **file_digest.record_fields(),
+        'encrypted': mode == 'secure'
+    }
+
+def store_flat_upload(mode, file_id, filename, stream):
+    """Store an upload as a single object; returns its metadata record"""
+    file_digest, packed = write_stream_to_file(mode, file_id, stream)
+    return {
+        'filename': filename,
+        'file_size': file_digest.size,
+        'upload_time': datetime.now().isoformat(),
+        'node_id': 'local',
+        'chunks': 1,
+        **file_digest.record_fields(),
+        'packed': packed,
+        'encrypted': mode == 'secure'
+    }
+
+# Tar bodies, plain or compressed with any codec tarfile's 'r|*' detects (gzip, bzip2, xz)
+TAR_CONTENT_TYPES = {'application/x-tar', 'application/tar', 'application/x-gtar',
+                     'application/gzip', 'application/x-gzip',
+                     'application/x-bzip2', 'application/x-bzip',
+                     'application/x-xz', 'application/xz'}
+
+def iter_batch_uploads():
+    """Yield (filename, stream) for every file in a multipart form or a (compressed) tar body"""
+    if request.mimetype in TAR_CONTENT_TYPES:
+        # Streamed: each member must be consumed before moving to the next
+        with tarfile.open(fileobj=request.stream, mode='r|*') as archive:
+            for member in archive:
+                if member.isfile():
+                    yield member.name, archive.extractfile(member)
+        return
+
+    for _, file in request.files.items(multi=True):
+        if file.filename:
+            yield file.filename, file.stream
+
+@app.route('/<mode>/upload/batch', methods=['POST'])
+def upload_batch(mode):
+    """Store many files in one request and commit their metadata together"""
+    if mode not in STORAGE_CONFIGS or mode == 'secure':
+        return jsonify({'error': 'Batch uploads are not available for this mode'}), 400
+
+    nodes = load_nodes() if mode == 'distributed' else None
+    if nodes is not None and not any(n['status'] == 'active' for n in nodes):
+        return jsonify({'error': 'No active nodes available for distribution'}), 503
+
+    file_records = {}
+    results = []
+    try:
+        for filename, stream in iter_batch_uploads():
+            file_id = str(uuid.uuid4())
+            try:
+                if mode == 'distributed':
+                    file_records[file_id] = store_distributed_upload(mode, filename, stream, nodes)
+                else:
+                    file_records[file_id] = store_flat_upload(mode, file_id, filename, stream)
+            except DistributionError as e:
+                error_handler.handle_file_operation_error("upload", filename, e)
+                results.append({'filename': filename, 'status': 'failed', 'error': str(e), 'failed_writes': e.errors})
+                continue
+            results.append({'filename': filename, 'file_id': file_id, 'status': 'stored',
+                            'file_size': file_records[file_id]['file_size']})
+    except tarfile.TarError as e:
+        results.append({'status': 'failed', 'error': f'Invalid tar stream: {e}'})
+    except Exception:
+        # Nothing of the batch is committed, so the files stored so far give their data back
+        for file_id, file_record in file_records.items():
+            delete_file_data(mode, file_id, file_record)
+        raise
+
+    if not results:
+        return jsonify({'error': 'No files provided'}), 400
+
+    # One fsync of the pack segments and one metadata write for the whole batch
+    sync_object_stores(mode)
+    if file_records:
+        get_metadata_store(mode).put_files(file_records)
+        for file_id, file_record in file_records.items():
+            index_file_availability(mode, file_id, file_record)
+    if nodes is not None:
+        record_node_usage(nodes)
+
+    return jsonify({
+        'message': f'Stored {len(file_records)} of {len(results)} files',
+        'stored': len(file_records),
+        'failed': len(results) - len(file_records),
+        'files': results
+    })
+
+# Resumable upload sessions
+def get_session_or_404(mode, upload_id):
+    session = upload_session_manager.get_session(upload_id)
+    if not session or session['mode'] != mode:
+        return None
+    return session
+
+def session_part_path(mode, upload_id):
+    """Staging file that flat (single-file) modes assemble chunks into"""
+    return os.path.join(STORAGE_CONFIGS[mode]['dir'], f"{upload_id}.part")
+
+def release_session_chunks(mode, chunk_infos):
+    """Drop the references session chunks stored in distributed mode hold"""
+    stored = [c for c in chunk_infos if 'locations' in c]
+    release_chunks(mode, {'chunks': stored, 'chunk_distribution': {c['chunk_id']: c['locations'] for c in stored}})
+
+def discard_upload_session(session):
+    """Delete a claimed session, then give back its chunks or staging file"""
+    mode, upload_id = session['mode'], session['upload_id']
+    # Forgotten first: a crash in between leaks the chunks rather than releasing them twice
+    upload_session_manager.delete_session(upload_id)
+    release_session_chunks(mode, list(session['chunks'].values()))
+    staged = [session_part_path(mode, upload_id)]
+    if session.get('file_id'):
+        # Where a commit that did not get to store the file record moved the staging file
+        staged.append(os.path.join(STORAGE_CONFIGS[mode]['dir'], session['file_id']))
+    for path in staged:
+        if os.path.exists(path):
+            os.remove(path)
+
+def expire_upload_session(session):
+    """Abort a session left idle for UPLOAD_SESSION_TTL, unless its commit got as far as the file record"""
+    if session['state'] == 'committing' and session.get('file_id') \
+            and get_metadata_store(session['mode']).get_file(session['file_id']) is not None:
+        # The process stopped between storing the file and deleting its session: the chunks are the file's
+        upload_session_manager.delete_session(session['upload_id'])
+        return
+    discard_upload_session(session)
+
+# Sessions nobody has touched for UPLOAD_SESSION_TTL seconds (default a day) are aborted
+UPLOAD_SESSION_TTL = float(os.getenv('UPLOAD_SESSION_TTL', str(24 * 3600)))
+upload_session_manager.start_sweeper(UPLOAD_SESSION_TTL, expire_upload_session,
+                                     interval=min(300.0, UPLOAD_SESSION_TTL))
+
+@app.route('/<mode>/uploads', methods=['POST'])
+def init_upload_session(mode):
+    if mode not in STORAGE_CONFIGS or mode == 'secure':
+        return jsonify({'error': 'Resumable uploads are not available for this mode'}), 400
+
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename')
+    file_size = data.get('file_size')
+    if not filename or not isinstance(file_size, int) or file_size < 0:
+        return jsonify({'error': 'filename and file_size are required'}), 400
+
+    session = upload_session_manager.create_session(mode, filename, file_size, chunking_utils.chunk_size,
+                                                    get_hash_algorithm(mode))
+
+    if mode != 'distributed':
+        with open(session_part_path(mode, session['upload_id']), 'wb') as f:
+            f.truncate(file_size)
+
+    return jsonify({
+        'upload_id': session['upload_id'],
+        'chunk_size': session['chunk_size'],
+        'total_chunks': session['total_chunks'],
+        'hash_algorithm': session['hash_algorithm']
+    }), 201
+
+@app.route('/<mode>/uploads/<upload_id>/chunks/<int:sequence>', methods=['PUT'])
+def upload_session_chunk(mode, upload_id, sequence):
+    session = get_session_or_404(mode, upload_id)
+    if not session:
+        return jsonify({'error': 'Upload session not found'}), 404
+
+    try:
+        expected_size = upload_session_manager.expected_chunk_size(session, sequence)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    expected_hash = request.headers.get('X-Chunk-Hash')
+    if not expected_hash:
+        return jsonify({'error': 'X-Chunk-Hash header is required'}), 400
+
+    # Retried chunks that were already acknowledged are not written again
+    if upload_session_manager.has_chunk(upload_id, sequence, expected_hash):
+        return jsonify({'upload_id': upload_id, 'sequence': sequence, 'status': 'already_received'})
+
+    chunk_data = chunking_utils.read_exactly(request.stream, expected_size + 1)
+    if len(chunk_data) != expected_size:
+        return jsonify({'error': f'Chunk {sequence} must be {expected_size} bytes, got {len(chunk_data)}'}), 400
+
+    chunk = chunking_utils.build_chunk(chunk_data, sequence, session['hash_algorithm'])
+    if chunk['hash'] != expected_hash.lower():
+        return jsonify({'error': 'Chunk hash mismatch', 'expected': expected_hash, 'actual': chunk['hash']}), 422
+
+    if mode in CHUNK_COMPRESSORS:
+        chunk = CHUNK_COMPRESSORS[mode].compress_chunk(chunk)
+    chunk_info = {k: v for k, v in chunk.items() if k != 'data'}
+    if mode == 'distributed':
+        nodes = load_nodes()
+        active_nodes = [n for n in nodes if n['status'] == 'active']
+        if not active_nodes:
+            return jsonify({'error': 'No active nodes available for distribution'}), 503
+        try:
+            chunk_info['locations'] = distribution_utils.distribute_chunk(
+                chunk, active_nodes, STORAGE_CONFIGS[mode]['dir'], get_chunk_store(mode),
+                get_erasure_codec(mode), get_object_store(mode), get_placement_policy(mode)
+            )
+        except DistributionError as e:
+            return jsonify({'error': str(e), 'failed_writes': e.errors}), 503
+        sync_object_stores(mode)
+        if 'digest' in chunk:
+            chunk_info['digest'] = chunk['digest']
+        record_node_usage(nodes)
+        write = None
+    else:
+        def write():
+            # Written only while the session is open, so a commit reading the staging file sees no changes
+            fd = os.open(session_part_path(mode, upload_id), os.O_WRONLY)
+            try:
+                os.pwrite(fd, chunk_data, sequence * session['chunk_size'])
+            finally:
+                os.close(fd)
+
+    try:
+        previous = upload_session_manager.record_chunk(upload_id, chunk_info, write)
+    except (KeyError, ValueError):
+        # Committed, aborted or expired while this chunk was being stored
+        release_session_chunks(mode, [chunk_info])
+        return jsonify({'error': 'Upload session is no longer open'}), 409
+    if previous:
+        release_session_chunks(mode, [previous])
+
+    return jsonify({'upload_id': upload_id, 'sequence': sequence, 'status': 'received', 'hash': chunk['hash']})
+
+@app.route('/<mode>/uploads/<upload_id>')
+def upload_session_status(mode, upload_id):
+    session = get_session_or_404(mode, upload_id)
+    if not session:
+        return jsonify({'error': 'Upload session not found'}), 404
+
+    missing = upload_session_manager.missing_chunks(session)
+    return jsonify({
+        'upload_id': upload_id,
+        'filename': session['filename'],
+        'file_size': session['file_size'],
+        'chunk_size': session['chunk_size'],
+        'total_chunks': session['total_chunks'],
+        'received_chunks': session['total_chunks'] - len(missing),
+        'missing_chunks': missing,
+        'state': session['state']
+    })
+
+@app.route('/<mode>/uploads/<upload_id>', methods=['DELETE'])
+def abort_upload_session(mode, upload_id):
+    session = get_session_or_404(mode, upload_id)
+    if not session:
+        return jsonify({'error': 'Upload session not found'}), 404
+
+    if upload_session_manager.claim(upload_id, 'aborting') is None:
+        return jsonify({'error': f"Upload session is {session['state']}"}), 409
+    discard_upload_session(session)
+
+    return jsonify({'message': 'Upload aborted', 'upload_id': upload_id, 'released_chunks': len(session['chunks'])})
+
+@app.route('/<mode>/uploads/<upload_id>/commit', methods=['POST'])
+def commit_upload_session(mode, upload_id):
+    session = get_session_or_404(mode, upload_id)
+    if not session:
+        return jsonify({'error': 'Upload session not found'}), 404
+
+    # Claimed before its chunks are read: they stop changing, and a second commit
+    # or an abort of the same upload is turned away instead of acting on them too
+    file_id = str(uuid.uuid4())
+    if upload_session_manager.claim(upload_id, 'committing', file_id=file_id) is None:
+        return jsonify({'error': f"Upload session is {session['state']}"}), 409
+
+    try:
+        body, status = store_session_upload(mode, session, file_id)
+    except Exception:
+        upload_session_manager.reopen(upload_id)
+        raise
+
+    if status == 200:
+        upload_session_manager.delete_session(upload_id)
+    else:
+        # Handed back, so the client can upload what is missing and commit again
+        upload_session_manager.reopen(upload_id)
+    return body, status
+
+def store_session_upload(mode, session, file_id):
+    """Store a claimed session's chunks as file_id; returns (response body, status)"""
+    missing = upload_session_manager.missing_chunks(session)
+    if missing:
+        return jsonify({'error': 'Upload is incomplete', 'missing_chunks': missing}), 409
+
+    config = STORAGE_CONFIGS[mode]
+    file_digest = FileDigest(session['hash_algorithm'])
+
+    if mode == 'distributed':
+        chunk_infos = []
+        chunk_distribution = {}
+        for stored in upload_session_manager.ordered_chunks(session):
+            # Chunks arrive in any order, so the file bytes are hashed by reading them back in order
+            chunk_data = distribution_utils.read_chunk(stored['locations'])
+            if chunk_data is None:
+                return jsonify({'error': f"Chunk {stored['sequence']} was lost, upload it again"}), 409
+            file_digest.update_chunk({**stored, 'data': chunk_data})
+            chunk_distribution[stored['chunk_id']] = stored['locations']
+            chunk_infos.append({k: v for k, v in stored.items() if k != 'locations'})
+
+        for chunk_info in chunk_infos:
+            chunk_info['total_chunks'] = len(chunk_infos)
+
+        get_metadata_store(mode).put_file(file_id, {
+            'filename': session['filename'],
+            'file_size': session['file_size'],
+            'upload_time': datetime.now().isoformat(),
+            'node_id': 'distributed',
+            'chunks': chunk_infos,
+            'chunk_distribution': chunk_distribution,
+            **describe_redundancy(mode),
+            **file_digest.record_fields(),
+            'encrypted': False
+        })
+        index_file_availability(mode, file_id, {'chunk_distribution': chunk_distribution})
+    else:
+        part_path = session_part_path(mode, session['upload_id'])
+        with open(part_path, 'rb') as f:
+            for stored in upload_session_manager.ordered_chunks(session):
+                file_digest.update_chunk({**stored, 'data': chunking_utils.read_exactly(f, stored['size'])})
+        os.replace(part_path, os.path.join(config['dir'], file_id))
+
+        get_metadata_store(mode).put_file(file_id, {
+            'filename': session['filename'],
+            'file_size': session['file_size'],
+            'upload_time': datetime.now().isoformat(),
+            'node_id': 'local',
+            'chunks': 1,
+            **file_digest.record_fields(),
+            'encrypted': False
+        })
+
+    return jsonify({
+        'message': 'File uploaded successfully',
+        'file_id': file_id,
+        'chunks': session['total_chunks'],
+        'checksum': file_digest.hexdigest()
+    }), 200
+
 @app.route('/<mode>/files')
 def get_files(mode):
     if mode not in STORAGE_CONFIGS:
         return jsonify({'error': 'Invalid mode'}), 400
 
-    metadata = load_metadata(mode)
-    # Convert to list and add file_id
-    files = []
-    for file_id, info in metadata.items():
-        info_copy = info.copy()
-        info_copy['file_id'] = file_id
-
-        # Add fault tolerance status for distributed mode
-        if mode == 'distributed' and 'chunk_distribution' in info_copy:
-            nodes = load_nodes()
-            active_nodes = {n['node_id']: n for n in nodes if n['status'] == 'active'}
-            chunk_distribution = info_copy['chunk_distribution']
-
-            available_chunks = 0
-            total_chunks = len(chunk_distribution)
-            failed_nodes = []
-
-            for chunk_id, locations in chunk_distribution.items():
-                chunk_available = False
-                for location in locations:
-                    if location['node_id'] in active_nodes and os.path.exists(location['path']):
-                        chunk_available = True
-                        break
-                if chunk_available:
-                    available_chunks += 1
-                else:
-                    # Check which nodes failed for this chunk
-                    for location in locations:
-                        if location['node_id'] not in active_nodes:
-                            failed_nodes.append(location['node_id'])
-
-            info_copy['fault_tolerance'] = {
-                'available_chunks': available_chunks,
-                'total_chunks': total_chunks,
-                'reconstructable': available_chunks == total_chunks,
-                'failed_nodes': list(set(failed_nodes))
-            }
+    availability = get_availability_index(mode)
+    metadata_store = get_metadata_store(mode)
 
-        files.append(info_copy)
+    # Records without their chunk manifests (chunk counts only): listing costs O(files), not O(chunks)
+    files = []
+    for file_id, info in metadata_store.iter_files(with_chunks=False):
+        info['file_id'] = file_id
+
+        # Add fault tolerance status from the availability index
+        if availability is not None and 'chunks' in info:
+            fault_tolerance = availability.fault_tolerance(file_id)
+            if fault_tolerance is None:
+                # Stored after the index was built but not yet indexed
+                chunk_distribution = (metadata_store.get_file(file_id) or {}).get('chunk_distribution')
+                if chunk_distribution is not None:
+                    availability.add_file(file_id, chunk_distribution)
+                    fault_tolerance = availability.fault_tolerance(file_id)
+            if fault_tolerance is not None:
+                info['fault_tolerance'] = fault_tolerance
+
+        files.append(info)
 
     return jsonify(files)
 
 @app.route('/<mode>/nodes')
 def get_nodes(mode):
     if mode == 'distributed':
-        nodes = load_nodes()
-        # Simulate varying heartbeat times and occasional failures
-        for node in nodes:
-            if random.random() < 0.1:  # 10% chance to update heartbeat
-                node['last_heartbeat'] = datetime.now().isoformat()
-            # Occassionally recover failed nodes (5% chance)
-            if node['status'] == 'failed' and random.random() < 0.05:
-                node['status'] = 'active'
-                print(f"✅ Node {node['node_id']} recovered!")
-        save_nodes(nodes)
-        return jsonify(nodes)
+        return jsonify(load_nodes())
     elif mode == 'simple':
         # Simple mode has one local node
         return jsonify([{
             'node_id': 'local',
             'status': 'active',
-            'files_count': len(load_metadata('simple')),
-            'storage_used': sum(f['file_size'] for f in load_metadata('simple').values()),
+            **get_metadata_store('simple').summary(),
             'last_heartbeat': datetime.now().isoformat()
         }])
     elif mode == 'production':
         # Production mode has master-slave setup
-        production_metadata = load_metadata('production')
-        files_count = len(production_metadata)
-        storage_used = sum(f['file_size'] for f in production_metadata.values())
+        summary = get_metadata_store('production').summary()
+        files_count = summary['files_count']
+        storage_used = summary['storage_used']
         return jsonify([
             {
                 'node_id': 'master',
@@ -374,29 +1183,55 @@ def download_file(mode, file_id):
     if mode not in STORAGE_CONFIGS:
         return jsonify({'error': 'Invalid mode'}), 400
 
-    metadata = load_metadata(mode)
-    if file_id not in metadata:
+    file_info = get_metadata_store(mode).get_file(file_id)
+    if file_info is None:
         return jsonify({'error': 'File not found'}), 404
 
-    file_info = metadata[file_id]
+    ranges = requested_ranges(file_info['file_size'], file_info['checksum'])
 
     if mode == 'distributed':
         # Reconstruct file from chunks with fault tolerance
-        file_data, missing_chunks = reconstruct_file_from_chunks(file_id, mode)
+        chunk_distribution = file_info.get('chunk_distribution', {})
+        # Suspect nodes are read from too (last), as the availability index counts their copies
+        nodes = load_nodes()
 
-        if file_data is None:
+        # Check up front: once streaming starts the status code is already sent.
+        # A range only needs the chunks it overlaps.
+        # Chunks found in the cache are pinned, so they are still there when streaming reaches them.
+        needed = range_distribution(file_info, ranges)
+        cache_keys = chunk_cache_keys(file_info)
+        cache = pinned_chunk_cache(mode, cache_keys, needed)
+        missing_chunks = distribution_utils.missing_chunks(needed, nodes, cache, cache_keys)
+        if missing_chunks:
             return jsonify({
                 'error': 'File cannot be reconstructed',
                 'missing_chunks': missing_chunks,
                 'message': 'Some chunks are unavailable due to node failures'
             }), 500
 
-        from io import BytesIO
-        file_stream = BytesIO(file_data)
-        file_stream.seek(0)
+        def read_range(start, stop):
+            return distribution_utils.iter_range(chunk_distribution, file_info['chunks'], start, stop, nodes,
+                                                 cache=cache, cache_keys=cache_keys)
 
-        return send_file(file_stream, as_attachment=True,
-                        download_name=file_info['filename'])
+        def whole_file():
+            return verified_chunks(distribution_utils.iter_chunks(chunk_distribution, nodes, cache=cache,
+                                                                  cache_keys=cache_keys), file_info)
+
+        # Whole downloads share the checksum-verified stream; a subscriber that falls
+        # behind it finishes with per-chunk reads only
+        full = download_coalescer.stream(
+            (mode, file_id), lambda offset: whole_file() if offset == 0 else read_range(offset, file_info['file_size'])
+        )
+        return ranged_download(ranges, coalesced((mode, file_id), read_range), file_info['filename'],
+                               file_info['file_size'], file_info['checksum'], full=full)
+
+    elif file_info.get('packed'):
+        file_data = get_pack_store(mode).get(file_id)
+        if file_data is None:
+            return jsonify({'error': 'File not found on disk'}), 404
+
+        return ranged_download(ranges, lambda start, stop: [file_data[start:stop]], file_info['filename'],
+                               len(file_data), file_info['checksum'])
 
     else:
         # Simple mode - direct file access
@@ -405,8 +1240,126 @@ def download_file(mode, file_id):
         if not os.path.exists(file_path):
             return jsonify({'error': 'File not found on disk'}), 404
 
-        return send_file(file_path, as_attachment=True,
-                        download_name=file_info['filename'])
+        return send_stored_file(file_path, file_info['filename'], file_info['checksum'], ranges)
+
+@app.route('/<mode>/delete/<file_id>', methods=['DELETE'])
+def delete_file(mode, file_id):
+    if mode not in STORAGE_CONFIGS:
+        return jsonify({'error': 'Invalid mode'}), 400
+
+    file_info = get_metadata_store(mode).delete_file(file_id)
+    if file_info is None:
+        return jsonify({'error': 'File not found'}), 404
+    availability = get_availability_index(mode)
+    if availability is not None:
+        availability.remove_file(file_id)
+    delete_file_data(mode, file_id, file_info)
+
+    return jsonify({'message': 'File deleted successfully', 'file_id': file_id})
+
+@app.route('/<mode>/chunk-store')
+def chunk_store_stats(mode):
+    chunk_store = get_chunk_store(mode)
+    if chunk_store is None:
+        return jsonify({'error': 'Deduplication is not enabled for this mode'}), 400
+    return jsonify(chunk_store.get_stats())
+
+@app.route('/<mode>/packs')
+def pack_store_stats(mode):
+    pack_store = get_pack_store(mode)
+    if pack_store is None:
+        return jsonify({'error': 'Pack files are not enabled for this mode'}), 400
+    return jsonify(pack_store.get_stats())
+
+@app.route('/<mode>/packs/compact', methods=['POST'])
+def compact_pack_store(mode):
+    """Rewrite pack segments that are mostly deleted objects"""
+    pack_store = get_pack_store(mode)
+    if pack_store is None:
+        return jsonify({'error': 'Pack files are not enabled for this mode'}), 400
+    garbage_ratio = float(request.args.get('garbage_ratio', 0.5))
+    return jsonify(pack_store.compact(garbage_ratio))
+
+@app.route('/<mode>/placement/<key>')
+def chunk_placement(mode, key):
+    """Nodes a chunk with this digest is placed on, computed from the cluster map alone"""
+    policy = get_placement_policy(mode)
+    if not policy.deterministic:
+        return jsonify({'error': f'{policy.name} placement is not computable; chunk locations are only in metadata'}), 400
+    active_nodes = [n for n in load_nodes() if n['status'] == 'active']
+    codec = get_erasure_codec(mode)
+    if codec is not None:
+        nodes = policy.spread(key, active_nodes, codec.k + codec.m)
+    else:
+        nodes = policy.select(key, active_nodes, min(distribution_utils.replication_factor, len(active_nodes)))
+    return jsonify({'policy': policy.name, 'key': key, 'nodes': [n['node_id'] for n in nodes]})
+
+@app.route('/<mode>/node-daemons')
+def node_daemon_stats(mode):
+    cluster = NODE_CLUSTERS.get(mode)
+    if cluster is None:
+        return jsonify({'error': 'Storage-node daemons are not enabled for this mode'}), 400
+    return jsonify(cluster.get_stats())
+
+@app.route('/<mode>/chunk-cache')
+def chunk_cache_stats(mode):
+    cache = get_chunk_cache(mode)
+    if cache is None:
+        return jsonify({'error': 'Chunk caching is not enabled for this mode'}), 400
+    return jsonify(cache.get_stats())
+
+@app.route('/<mode>/availability')
+def availability_stats(mode):
+    availability = get_availability_index(mode)
+    if availability is None:
+        return jsonify({'error': 'Availability is not indexed for this mode'}), 400
+    return jsonify(availability.get_stats())
+
+@app.route('/<mode>/compression')
+def compression_stats(mode):
+    compressor = CHUNK_COMPRESSORS.get(mode)
+    if compressor is None:
+        return jsonify({'error': 'Compression is not enabled for this mode'}), 400
+    return jsonify(compressor.get_stats())
+
+@app.route('/downloads/coalescing')
+def download_coalescing_stats():
+    """How many downloads shared another's reconstruction, and the bytes that saved"""
+    return jsonify(download_coalescer.get_stats())
+
+@app.route('/metadata/journal')
+def metadata_journal_stats():
+    """Journal appends, fsyncs shared by group commit, snapshots and the last recovery time"""
+    return jsonify(metadata_journal.get_stats())
+
+@app.route('/nodes/latency')
+def node_read_latency():
+    """Read latency per node, as used to pick replicas and time hedged reads"""
+    return jsonify(distribution_utils.read_latency.get_stats())
+
+@app.route('/nodes/load')
+def node_write_load():
+    """Queued writes and write latency per node, as used by load-aware placement"""
+    return jsonify(distribution_utils.node_load.get_stats())
+
+@app.route('/nodes/health')
+def node_health():
+    """Status and phi of every node, and the thresholds they are judged by"""
+    return jsonify(node_registry.get_stats())
+
+@app.route('/nodes/events')
+def node_events():
+    """Node status transitions after sequence number ?since=, oldest first"""
+    return jsonify(node_registry.events(request.args.get('since', 0, type=int)))
+
+@app.route('/nodes/<node_id>/heartbeat', methods=['POST'])
+def node_heartbeat(node_id):
+    """A node reporting in by itself, alongside the monitor's probes"""
+    try:
+        node_registry.heartbeat(node_id)
+    except KeyError:
+        return jsonify({'error': f'Unknown node: {node_id}'}), 404
+    return jsonify({'node_id': node_id, 'status': 'ok'})
 
 # Secure mode authentication routes
 @app.route('/secure/login')
@@ -479,9 +1432,8 @@ def secure_register():
 @app.route('/production/cluster')
 def get_cluster_status():
     # Dynamic cluster data based on actual file counts
-    production_files = load_metadata('production')
-    total_files = len(production_files)
-    total_chunks = sum(3 for _ in production_files)  # 3 chunks per file
+    total_files = get_metadata_store('production').summary()['files_count']
+    total_chunks = 3 * total_files  # 3 chunks per file
 
     return jsonify({
         'master': {
@@ -520,13 +1472,13 @@ def get_cluster_status():
 def get_replication_logs():
     # Dynamic replication logs based on files
     logs = []
-    production_files = load_metadata('production')
+    recent_files = get_metadata_store('production').recent_files(5, with_chunks=False)
     actions = ['replicated', 'synced', 'chunked', 'verified']
     nodes = ['master', 'slave-01', 'slave-02', 'slave-03']
 
     # Generate logs based on actual files
-    if production_files:
-        for i, (file_id, file_info) in enumerate(list(production_files.items())[-5:]):  # Last 5 files
+    if recent_files:
+        for i, (file_id, file_info) in enumerate(recent_files):  # Last 5 files
             timestamp = datetime.fromisoformat(file_info['upload_time'])
             action = random.choice(actions)
             node = random.choice(nodes)
@@ -565,78 +1517,26 @@ def get_replication_logs():
 
 @app.route('/<mode>/redistribute')
 def redistribute_chunks(mode):
-    """Redistribute chunks from failed nodes to active nodes"""
-    if mode != 'distributed':
+    """Queue every under-replicated chunk for background repair; progress is at /<mode>/repair"""
+    scheduler = get_repair_scheduler(mode)
+    if scheduler is None:
         return jsonify({'error': 'Redistribution only available for distributed mode'}), 400
 
-    metadata = load_metadata(mode)
-    nodes = load_nodes()
-    active_nodes = [n for n in nodes if n['status'] == 'active']
-
-    if len(active_nodes) < 2:
-        return jsonify({'error': 'Need at least 2 active nodes for redistribution'}), 400
-
-    redistributed_count = 0
-
-    for file_id, file_info in metadata.items():
-        if 'chunk_distribution' in file_info:
-            chunk_distribution = file_info['chunk_distribution']
-            needs_redistribution = False
-
-            for chunk_id, locations in chunk_distribution.items():
-                surviving_locations = []
-                failed_locations = []
-
-                for location in locations:
-                    if any(n['node_id'] == location['node_id'] and n['status'] == 'active' for n in nodes):
-                        if os.path.exists(location['path']):
-                            surviving_locations.append(location)
-                        else:
-                            failed_locations.append(location)
-
-                # If we have failed locations and enough active nodes, redistribute
-                if failed_locations and len(active_nodes) >= 2:
-                    needs_redistribution = True
-                    # Find a new active node not already holding this chunk
-                    current_node_ids = {loc['node_id'] for loc in surviving_locations}
-                    available_nodes = [n for n in active_nodes if n['node_id'] not in current_node_ids]
-
-                    if available_nodes:
-                        new_node = random.choice(available_nodes)
-                        # Reconstruct chunk data from surviving copy
-                        chunk_data = None
-                        for surviving_loc in surviving_locations:
-                            if os.path.exists(surviving_loc['path']):
-                                with open(surviving_loc['path'], 'rb') as f:
-                                    chunk_data = f.read()
-                                break
-
-                        if chunk_data:
-                            # Save to new node
-                            chunk_file = f"{chunk_id}_{new_node['node_id']}_{uuid.uuid4().hex[:8]}"
-                            chunk_path = os.path.join('files_distributed', chunk_file)
-
-                            with open(chunk_path, 'wb') as f:
-                                f.write(chunk_data)
-
-                            # Update distribution
-                            chunk_distribution[chunk_id].append({
-                                'node_id': new_node['node_id'],
-                                'chunk_file': chunk_file,
-                                'path': chunk_path
-                            })
-
-                            redistributed_count += 1
-                            print(f"🔄 Redistributed {chunk_id} to {new_node['node_id']}")
-
-    # Save updated metadata and nodes
-    save_metadata(mode, metadata)
-    save_nodes(nodes)
-
+    chunks = get_availability_index(mode).all_chunks()
+    scheduler.enqueue(chunks, verify=True)
     return jsonify({
-        'message': f'Redistributed {redistributed_count} chunks',
+        'message': f'Queued {len(chunks)} chunks to check and repair',
+        'repair': scheduler.get_stats(),
         'timestamp': datetime.now().isoformat()
-    })
+    }), 202
+
+@app.route('/<mode>/repair')
+def repair_progress(mode):
+    """Background repair queue, outcomes, rate and ETA"""
+    scheduler = get_repair_scheduler(mode)
+    if scheduler is None:
+        return jsonify({'error': 'Repair is not available for this mode'}), 400
+    return jsonify(scheduler.get_stats())
 
 # Secure mode protected routes
 def token_required(f):
@@ -671,70 +1571,72 @@ def admin_required(f):
 @app.route('/secure/upload', methods=['POST'])
 @token_required
 def secure_upload():
+    filename, username = None, None
     try:
-        file = request.files.get('file')
-        if not file:
+        filename, stream = get_upload_stream()
+        if stream is None:
             return jsonify({'error': 'No file provided'}), 400
 
         username = request.current_user['username']
-        file_data = file.read()
         file_id = str(uuid.uuid4())
 
         # Generate encryption key
         encryption_key = encryption.encryption_manager.generate_key()
-        key_b64 = encryption.encryption_manager.key_from_b64(encryption_key.hex())
-
-        # Split file into chunks
-        chunks = chunking_utils.split_file_into_chunks(file_data)
-
-        # Encrypt chunks
-        encrypted_chunks = []
-        for chunk in chunks:
-            encrypted_data = encryption.encryption_manager.encrypt_chunk(chunk['data'], encryption_key)
-            encrypted_chunks.append({
-                **chunk,
-                'data': encrypted_data,
-                'size': len(encrypted_data)
-            })
+        key_b64 = base64.b64encode(encryption_key).decode('utf-8')
+
+        # Hash plaintext, then encrypt each chunk as it is read from the stream
+        file_digest = FileDigest(get_hash_algorithm('secure'))
+
+        def encrypted_chunks():
+            chunks = get_chunker('secure').iter_chunks_from_stream(stream, file_digest.algorithm)
+            # Compress first: ciphertext does not compress
+            for chunk in compress_chunks('secure', digest_chunks(chunks, file_digest)):
+                encrypted_data = encryption.encryption_manager.encrypt_chunk(chunk['data'], encryption_key)
+                # 'size' stays the plaintext size, which byte ranges are mapped with
+                yield {
+                    **chunk,
+                    'data': encrypted_data,
+                    'stored_size': len(encrypted_data),
+                    'encrypted': True
+                }
 
         # Distribute encrypted chunks
         nodes = load_nodes()
-        chunk_distribution = distribution_utils.distribute_chunks_across_nodes(
-            encrypted_chunks, nodes, 'files_secure'
+        chunk_distribution, chunk_infos = distribution_utils.distribute_chunk_stream(
+            encrypted_chunks(), nodes, 'files_secure'
         )
+        file_size = file_digest.size
 
         # Save file metadata
         file_record = models.file_model.create_file_record(
             file_id=file_id,
-            filename=file.filename,
+            filename=filename,
             owner=username,
-            file_size=len(file_data),
+            file_size=file_size,
             encryption_key=key_b64,
-            chunks_info=[{k: v for k, v in c.items() if k != 'data'} for c in encrypted_chunks],
-            checksum=encryption.encryption_manager.calculate_checksum(file_data)
+            chunks_info=chunk_infos,
+            checksum=file_digest.hexdigest(),
+            chunk_distribution=chunk_distribution
         )
 
         # Update user stats
-        models.user_model.update_user_stats(
-            username,
-            models.file_model.get_user_files(username).__len__(),
-            sum(f['file_size'] for f in models.file_model.get_user_files(username))
-        )
+        summary = models.file_model.get_user_summary(username)
+        models.user_model.update_user_stats(username, summary['files_count'], summary['storage_used'])
 
         # Log successful upload
-        secure_logger.log_file_operation("upload", file.filename, username, len(file_data), True)
-        secure_logger.log_encryption_event("encrypt", file.filename, "AES-256", True)
+        secure_logger.log_file_operation("upload", filename, username, file_size, True)
+        secure_logger.log_encryption_event("encrypt", filename, "AES-256", True)
 
         return jsonify({
             'message': 'File encrypted and uploaded securely',
             'file_id': file_id,
-            'chunks': len(chunks),
+            'chunks': len(chunk_infos),
             'encrypted': True,
             'checksum': file_record['checksum']
         })
 
     except Exception as e:
-        error_response = error_handler.handle_file_operation_error("upload", file.filename, e, username)
+        error_response = error_handler.handle_file_operation_error("upload", filename, e, username)
         return jsonify(error_response), 500
 
 @app.route('/secure/files')
@@ -761,44 +1663,66 @@ def secure_download(file_id):
         if not file_record or file_record['owner'] != username:
             return jsonify({'error': 'File not found or access denied'}), 404
 
-        # Reconstruct encrypted file
-        chunk_distribution = {}  # This would need to be stored in metadata
-        nodes = load_nodes()
-        active_nodes = [n for n in nodes if n['status'] == 'active']
-
-        # For secure mode, we need to store chunk_distribution in file_record
-        # This is a simplified version - in production, chunk_distribution should be persisted
-        encrypted_data, missing_chunks = distribution_utils.reconstruct_from_distribution(
-            file_id, chunk_distribution, active_nodes
-        )
+        chunk_distribution = file_record.get('chunk_distribution')
+        if chunk_distribution is None:
+            # Records from before chunk locations were persisted cannot be rebuilt
+            return jsonify({'error': 'File cannot be reconstructed', 'missing_chunks': []}), 500
 
-        if encrypted_data is None:
+        ranges = requested_ranges(file_record['file_size'], file_record['checksum'])
+        nodes = load_nodes()
+        # Chunks are encrypted with a per-file key, so equal plaintext digests do not mean equal ciphertext
+        cache_keys = chunk_cache_keys(file_record, scope=file_id)
+        needed = range_distribution(file_record, ranges)
+        cache = pinned_chunk_cache('secure', cache_keys, needed)
+        missing_chunks = distribution_utils.missing_chunks(needed, nodes, cache, cache_keys)
+        if missing_chunks:
             return jsonify({
                 'error': 'File cannot be reconstructed',
                 'missing_chunks': missing_chunks
             }), 500
 
-        # Decrypt file
         encryption_key = encryption.encryption_manager.key_from_b64(file_record['encryption_key'])
-        file_data = encryption.encryption_manager.decrypt_file(encrypted_data, encryption_key)
-
-        # Verify checksum
-        if not encryption.encryption_manager.verify_checksum(file_data, file_record['checksum']):
-            secure_logger.log_encryption_event("decrypt", file_record['filename'], success=False)
-            return jsonify({'error': 'File integrity check failed'}), 500
+        algorithm = record_hash_algorithm(file_record)
+        chunk_infos = {c['chunk_id']: c for c in file_record['chunks']}
+
+        def decrypt(chunk_id, encrypted_data):
+            # Runs on the reader threads, so decryption overlaps with sending
+            chunk_info = chunk_infos[chunk_id]
+            chunk_data = decompress(encryption.encryption_manager.decrypt_chunk(encrypted_data, encryption_key),
+                                    chunk_info.get('compression', NO_COMPRESSION))
+            if hash_bytes(chunk_data, algorithm) != chunk_info['hash']:
+                raise ValueError(f"Chunk {chunk_id} failed its integrity check")
+            return chunk_data
+
+        def decrypted_chunks():
+            try:
+                yield from verified_chunks(distribution_utils.iter_chunks(chunk_distribution, nodes, decrypt,
+                                                                          cache=cache, cache_keys=cache_keys),
+                                           file_record)
+            except Exception as e:
+                secure_logger.log_encryption_event("decrypt", file_record['filename'], success=False)
+                error_handler.handle_file_operation_error("download", file_record['filename'], e, username)
+                raise
+
+            secure_logger.log_file_operation("download", file_record['filename'], username, file_record['file_size'], True)
+            secure_logger.log_encryption_event("decrypt", file_record['filename'], "AES-256", True)
+
+        def read_range(start, stop):
+            # Each chunk is still checked against its hash; the whole-file checksum needs every byte
+            return distribution_utils.iter_range(chunk_distribution, file_record['chunks'], start, stop,
+                                                 nodes, decrypt, cache=cache, cache_keys=cache_keys)
 
         # Update download stats
         models.file_model.update_download_stats(file_id)
 
-        # Log successful download
-        secure_logger.log_file_operation("download", file_record['filename'], username, len(file_data), True)
-        secure_logger.log_encryption_event("decrypt", file_record['filename'], "AES-256", True)
-
-        from io import BytesIO
-        file_stream = BytesIO(file_data)
-        file_stream.seek(0)
-
-        return send_file(file_stream, as_attachment=True, download_name=file_record['filename'])
+        # Whole downloads share the checksum-verified stream; a subscriber that falls
+        # behind it finishes with per-chunk verification only
+        full = download_coalescer.stream(
+            ('secure', file_id),
+            lambda offset: decrypted_chunks() if offset == 0 else read_range(offset, file_record['file_size'])
+        )
+        return ranged_download(ranges, coalesced(('secure', file_id), read_range), file_record['filename'],
+                               file_record['file_size'], file_record['checksum'], full=full)
 
     except Exception as e:
         error_response = error_handler.handle_file_operation_error("download", "unknown", e, username)
@@ -812,11 +1736,8 @@ def secure_delete(file_id):
 
         if models.file_model.delete_file_record(file_id, username):
             # Update user stats
-            models.user_model.update_user_stats(
-                username,
-                models.file_model.get_user_files(username).__len__(),
-                sum(f['file_size'] for f in models.file_model.get_user_files(username))
-            )
+            summary = models.file_model.get_user_summary(username)
+            models.user_model.update_user_stats(username, summary['files_count'], summary['storage_used'])
 
             secure_logger.log_file_operation("delete", "unknown", username, success=True)
             return jsonify({'message': 'File deleted successfully'})
@@ -832,7 +1753,7 @@ def secure_delete(file_id):
 def secure_stats():
     try:
         username = request.current_user['username']
-        user_files = models.file_model.get_user_files(username)
+        user_files = models.file_model.get_user_files(username, with_chunks=False)
 
         total_size = sum(f['file_size'] for f in user_files)
         last_activity = max((f.get('last_download') for f in user_files if f.get('last_download')), default='Never')
@@ -1,2 +1,22 @@
-from .chunking import chunking_utils, distribution_utils
-from .logging_utils import secure_logger, error_handler
\ No newline at end of file
+from .chunking import chunking_utils, distribution_utils, DistributionError, ReconstructionError, is_erasure_coded
+from .cdc import cdc_chunking_utils
+from .chunk_store import ChunkStore
+from .erasure import get_codec
+from .compression import ChunkCompressor, decompress, NO_COMPRESSION
+from .read_latency import NodeLatencyTracker
+from .chunk_cache import ChunkCache, PinnedChunks
+from .single_flight import StreamCoalescer, download_coalescer
+from .manifest import ChunkManifest
+from .metadata_store import MetadataStore, open_metadata_store
+from .metadata_journal import MetadataJournal
+from .availability import AvailabilityIndex
+from .repair import RepairScheduler
+from .node_registry import NodeRegistry, PhiAccrualDetector
+from .pack_store import PackStore, open_pack_store, object_exists, read_object, delete_object
+from .storage_node import NodeClient, NodeCluster, NodeUnavailable, open_node_cluster
+from .placement import RandomPlacement, RendezvousPlacement, LoadAwarePlacement, get_placement, placement_key
+from .node_load import NodeLoadTracker, node_load
+from .logging_utils import secure_logger, error_handler
+from .upload_sessions import upload_session_manager
+from .byte_ranges import parse_ranges, multipart_byteranges
+from .hashing import FileDigest, LEGACY_HASH_ALGORITHM, hash_bytes, record_hash_algorithm
@@ -0,0 +1,249 @@
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+def _object_key(location: Dict[str, Any]) -> tuple:
+    return location['node_id'], location.get('chunk_file') or location.get('path')
+
+class _FileAvailability:
+    """Per-chunk counts of readable pieces for one file"""
+
+    __slots__ = ('chunk_index', 'chunk_ids', 'needed', 'shards', 'pieces', 'live', 'replicas', 'available')
+
+    def __init__(self):
+        self.chunk_index = {}   # chunk_id -> position
+        self.chunk_ids = []     # position -> chunk_id
+        self.needed = []        # pieces needed to read each chunk: 1 replica, or data_shards shards
+        self.shards = []        # data + parity shards of erasure-coded chunks, None for replicated ones
+        self.pieces = []        # per chunk: piece (0, or shard number) -> readable copies
+        self.live = []          # per chunk: distinct pieces with a readable copy
+        self.replicas = []      # per chunk: object keys of its stored copies
+        self.available = 0      # chunks with live >= needed
+
+class _StoredObject:
+    """One stored replica or shard, and the file chunks it serves (several when deduplicated)"""
+
+    __slots__ = ('node_id', 'missing', 'refs')
+
+    def __init__(self, node_id: str):
+        self.node_id = node_id
+        self.missing = False
+        self.refs = []          # (file_id, chunk position, piece)
+
+class AvailabilityIndex:
+    """Incrementally maintained availability of every file's chunks.
+
+    Each stored object is counted against the chunks it serves while its
+    node is up and it has not been found missing. Node state changes, new
+    files, deletes and repairs adjust only the counters they touch, so
+    asking whether a file is reconstructable costs O(1) instead of a stat
+    of every replica.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files = {}        # file_id -> _FileAvailability
+        self._objects = {}      # object key -> _StoredObject
+        self._nodes = {}        # node_id -> object keys stored on it
+        self._down = set()      # node ids that are not active
+        self._unavailable = 0   # chunks across all files that cannot be read
+
+    def add_file(self, file_id: str, chunk_distribution: Dict[str, List[Dict[str, Any]]]):
+        """Index a file's chunk locations (replacing what was known about it)"""
+        with self._lock:
+            if file_id in self._files:
+                self._remove_file(file_id)
+
+            availability = _FileAvailability()
+            self._files[file_id] = availability
+            for chunk_id, locations in chunk_distribution.items():
+                position = len(availability.needed)
+                availability.chunk_index[chunk_id] = position
+                availability.chunk_ids.append(chunk_id)
+                if locations and 'shard' in locations[0]:
+                    availability.needed.append(locations[0]['data_shards'])
+                    availability.shards.append(locations[0]['data_shards'] + locations[0]['parity_shards'])
+                else:
+                    availability.needed.append(1)
+                    availability.shards.append(None)
+                availability.pieces.append({})
+                availability.live.append(0)
+                availability.replicas.append([])
+                self._unavailable += 1
+                for location in locations:
+                    self._add_replica(file_id, availability, position, location)
+
+    def remove_file(self, file_id: str):
+        with self._lock:
+            if file_id in self._files:
+                self._remove_file(file_id)
+
+    def add_replica(self, file_id: str, chunk_id: str, location: Dict[str, Any]):
+        """A new copy of a file's chunk was written (e.g. by repair)"""
+        with self._lock:
+            availability = self._files.get(file_id)
+            if availability is None or chunk_id not in availability.chunk_index:
+                return
+            self._add_replica(file_id, availability, availability.chunk_index[chunk_id], location)
+
+    def mark_missing(self, location: Dict[str, Any]):
+        """A stored object turned out to be gone; stop counting it"""
+        with self._lock:
+            stored = self._objects.get(_object_key(location))
+            if stored is None or stored.missing:
+                return
+            stored.missing = True
+            if stored.node_id not in self._down:
+                for file_id, position, piece in stored.refs:
+                    self._adjust(file_id, position, piece, -1)
+
+    def set_node_active(self, node_id: str, active: bool) -> bool:
+        """Count or stop counting everything stored on a node; returns whether its state changed"""
+        with self._lock:
+            if active == (node_id not in self._down):
+                return False
+            if active:
+                self._down.discard(node_id)
+            else:
+                self._down.add(node_id)
+
+            delta = 1 if active else -1
+            for key in self._nodes.get(node_id, ()):
+                stored = self._objects[key]
+                if stored.missing:
+                    continue
+                for file_id, position, piece in stored.refs:
+                    self._adjust(file_id, position, piece, delta)
+            return True
+
+    def down_nodes(self) -> set:
+        with self._lock:
+            return set(self._down)
+
+    def chunk_health(self, file_id: str, chunk_id: str) -> Optional[Dict[str, Any]]:
+        """Readable copies (or distinct shards) of a chunk, how many it needs, and its shard count if erasure-coded"""
+        with self._lock:
+            availability = self._files.get(file_id)
+            if availability is None or chunk_id not in availability.chunk_index:
+                return None
+            position = availability.chunk_index[chunk_id]
+            shards = availability.shards[position]
+            return {
+                'readable': availability.live[position] if shards else availability.pieces[position].get(0, 0),
+                'needed': availability.needed[position],
+                'shards': shards
+            }
+
+    def chunks_on_node(self, node_id: str) -> List[Tuple[str, str]]:
+        """(file_id, chunk_id) of every chunk with a copy or shard on a node"""
+        with self._lock:
+            chunks = set()
+            for key in self._nodes.get(node_id, ()):
+                for file_id, position, _ in self._objects[key].refs:
+                    chunks.add((file_id, self._files[file_id].chunk_ids[position]))
+            return list(chunks)
+
+    def all_chunks(self) -> List[Tuple[str, str]]:
+        with self._lock:
+            return [(file_id, chunk_id) for file_id, availability in self._files.items()
+                    for chunk_id in availability.chunk_ids]
+
+    def under_replicated(self, replication_factor: int) -> List[Tuple[str, str]]:
+        """(file_id, chunk_id) of every chunk with fewer readable copies (or shards) than full redundancy"""
+        with self._lock:
+            chunks = []
+            for file_id, availability in self._files.items():
+                for position, shards in enumerate(availability.shards):
+                    if shards:
+                        readable, full = availability.live[position], shards
+                    else:
+                        readable, full = availability.pieces[position].get(0, 0), replication_factor
+                    if readable < full:
+                        chunks.append((file_id, availability.chunk_ids[position]))
+            return chunks
+
+    def fault_tolerance(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Readable chunk count of a file and the down nodes holding the ones that are not readable"""
+        with self._lock:
+            availability = self._files.get(file_id)
+            if availability is None:
+                return None
+
+            total_chunks = len(availability.needed)
+            failed_nodes = set()
+            if availability.available < total_chunks:
+                for position, needed in enumerate(availability.needed):
+                    if availability.live[position] >= needed:
+                        continue
+                    for key in availability.replicas[position]:
+                        if key[0] in self._down:
+                            failed_nodes.add(key[0])
+
+            return {
+                'available_chunks': availability.available,
+                'total_chunks': total_chunks,
+                'reconstructable': availability.available == total_chunks,
+                'failed_nodes': sorted(failed_nodes)
+            }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'files': len(self._files),
+                'objects': len(self._objects),
+                'missing_objects': sum(1 for stored in self._objects.values() if stored.missing),
+                'nodes_down': sorted(self._down),
+                'unavailable_chunks': self._unavailable
+            }
+
+    def _add_replica(self, file_id: str, availability: _FileAvailability, position: int, location: Dict[str, Any]):
+        key = _object_key(location)
+        piece = location.get('shard', 0)
+        stored = self._objects.get(key)
+        if stored is None:
+            stored = self._objects[key] = _StoredObject(location['node_id'])
+            self._nodes.setdefault(stored.node_id, set()).add(key)
+        elif stored.missing:
+            # Written again where it had gone missing
+            stored.missing = False
+            if stored.node_id not in self._down:
+                for ref in stored.refs:
+                    self._adjust(*ref, 1)
+
+        stored.refs.append((file_id, position, piece))
+        availability.replicas[position].append(key)
+        if stored.node_id not in self._down:
+            self._adjust(file_id, position, piece, 1)
+
+    def _remove_file(self, file_id: str):
+        availability = self._files.pop(file_id)
+        self._unavailable -= len(availability.needed) - availability.available
+        for keys in availability.replicas:
+            for key in keys:
+                stored = self._objects.get(key)
+                if stored is None:
+                    continue
+                stored.refs = [ref for ref in stored.refs if ref[0] != file_id]
+                if not stored.refs:
+                    del self._objects[key]
+                    self._nodes[stored.node_id].discard(key)
+
+    def _adjust(self, file_id: str, position: int, piece: int, delta: int):
+        """Add delta readable copies of a piece, updating the chunk and file counters"""
+        availability = self._files[file_id]
+        pieces = availability.pieces[position]
+        before = pieces.get(piece, 0)
+        pieces[piece] = before + delta
+        if before == 0 and delta > 0:
+            availability.live[position] += 1
+        elif before + delta == 0 and delta < 0:
+            availability.live[position] -= 1
+        else:
+            return
+
+        needed = availability.needed[position]
+        if delta > 0 and availability.live[position] == needed:
+            availability.available += 1
+            self._unavailable -= 1
+        elif delta < 0 and availability.live[position] == needed - 1:
+            availability.available -= 1
+            self._unavailable += 1
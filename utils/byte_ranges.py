@@ -0,0 +1,44 @@
+import uuid
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from werkzeug.http import parse_if_range_header, parse_range_header
+
+def parse_ranges(range_header: Optional[str], if_range_header: Optional[str], file_size: int,
+                 etag: str) -> Optional[List[Tuple[int, int]]]:
+    """Byte ranges [start, stop) asked for by a Range header, [] if none is satisfiable,
+    or None for the whole file"""
+    byte_range = parse_range_header(range_header)
+    if byte_range is None or byte_range.units != 'bytes':
+        return None
+    # If-Range: a resumed download of a file that has since changed gets all of it again
+    if if_range_header and parse_if_range_header(if_range_header).etag != etag:
+        return None
+
+    ranges = []
+    for start, stop in byte_range.ranges:
+        if start < 0:
+            start, stop = max(file_size + start, 0), file_size
+        else:
+            stop = file_size if stop is None else min(stop, file_size)
+        if start < stop:
+            ranges.append((start, stop))
+    return ranges
+
+def multipart_byteranges(ranges: List[Tuple[int, int]], read_range: Callable[[int, int], Iterable[bytes]],
+                         file_size: int, boundary: str = None) -> Tuple[Iterator[bytes], int, str]:
+    """A multipart/byteranges body for ranges, as (body, content length, content type);
+    read_range(start, stop) is only called as the body is iterated"""
+    boundary = boundary or uuid.uuid4().hex
+    parts = [(f"\r\n--{boundary}\r\nContent-Type: application/octet-stream\r\n"
+              f"Content-Range: bytes {start}-{stop - 1}/{file_size}\r\n\r\n".encode('ascii'), start, stop)
+             for start, stop in ranges]
+    closing = f"\r\n--{boundary}--\r\n".encode('ascii')
+
+    def body():
+        for head, start, stop in parts:
+            yield head
+            yield from read_range(start, stop)
+        yield closing
+
+    length = sum(len(head) + stop - start for head, start, stop in parts) + len(closing)
+    return body(), length, f'multipart/byteranges; boundary={boundary}'
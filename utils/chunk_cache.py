@@ -0,0 +1,134 @@
+import weakref
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Optional, Set
+
+class ChunkCache:
+    """In-memory LRU cache of chunk contents, keyed by chunk digest and bounded in bytes.
+
+    Chunks pinned by a download stay cached, and count against the budget,
+    until every view pinning them is released; eviction passes over them.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, max_item_bytes: int = None):
+        self.max_bytes = max_bytes
+        # One huge chunk should not flush everything else
+        self.max_item_bytes = max_item_bytes or max_bytes // 8
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._pins = {}     # key -> number of views pinning it
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'insertions': 0, 'evictions': 0}
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Cached chunk data, or None on a miss"""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return data
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key: str, data: bytes):
+        """Cache chunk data, evicting the least recently used chunks to stay within budget"""
+        if len(data) > self.max_item_bytes:
+            return
+
+        with self._lock:
+            if key in self._pins:
+                # A pinned entry has the same content; replacing it would hold both copies
+                self._entries.move_to_end(key)
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = data
+            self._bytes += len(data)
+            self.stats['insertions'] += 1
+            self._evict()
+
+    def pin(self, keys: Iterable[str]) -> 'PinnedChunks':
+        """A view of the cache holding on to the current entries of keys, until it is released or dropped"""
+        with self._lock:
+            pinned = {key for key in keys if key in self._entries}
+            for key in pinned:
+                self._pins[key] = self._pins.get(key, 0) + 1
+        return PinnedChunks(self, pinned)
+
+    def clear(self):
+        """Forget every chunk that is not pinned"""
+        with self._lock:
+            self._entries = OrderedDict((key, data) for key, data in self._entries.items() if key in self._pins)
+            self._bytes = sum(len(data) for data in self._entries.values())
+
+    def _unpin(self, keys: Iterable[str]):
+        with self._lock:
+            for key in keys:
+                if self._pins[key] == 1:
+                    del self._pins[key]
+                else:
+                    self._pins[key] -= 1
+            self._evict()
+
+    def _evict(self):
+        """Drop the least recently used unpinned chunks until within budget; caller holds the lock"""
+        excess = self._bytes - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for key, data in self._entries.items():
+            if excess <= 0:
+                break
+            if key not in self._pins:
+                victims.append(key)
+                excess -= len(data)
+        for key in victims:
+            self._bytes -= len(self._entries.pop(key))
+            self.stats['evictions'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache counters since startup plus current occupancy"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+            stats['pinned_entries'] = len(self._pins)
+            stats['pinned_bytes'] = sum(len(self._entries[key]) for key in self._pins)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        stats['max_bytes'] = self.max_bytes
+        return stats
+
+class PinnedChunks:
+    """A cache view for one download: chunks that were cached when it was checked stay readable.
+
+    Without it, the LRU could evict a chunk between the availability check
+    and the read, and a download counted as complete would fail midway.
+    The pinned chunks stay in the cache itself, so concurrent downloads of
+    a chunk share one copy within the cache budget; they become evictable
+    once the download releases the view or lets go of it. Other lookups
+    and insertions go to the cache.
+    """
+
+    def __init__(self, cache: ChunkCache, keys: Set[str]):
+        self.cache = cache
+        self._release = weakref.finalize(self, cache._unpin, list(keys))
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.cache.get(key)
+
+    def contains(self, key: str) -> bool:
+        return self.cache.contains(key)
+
+    def put(self, key: str, data: bytes):
+        self.cache.put(key, data)
+
+    def release(self):
+        """Unpin the chunks now rather than when the view is dropped"""
+        self._release()
@@ -0,0 +1,200 @@
+import os
+import json
+import math
+import sqlite3
+import threading
+from typing import List, Dict, Any, Callable, Optional
+
+from .hashing import hash_bytes, CRYPTOGRAPHIC_ALGORITHMS
+from .pack_store import delete_object
+
+def _location_key(location: Dict[str, Any]) -> tuple:
+    """Identifies a stored copy: the node plus the shard index for erasure-coded chunks"""
+    return location['node_id'], location.get('shard')
+
+class BloomFilter:
+    """Fixed-size Bloom filter over hex digests"""
+
+    def __init__(self, expected_items: int = 1000000, false_positive_rate: float = 0.01):
+        self.num_bits = max(8, int(-expected_items * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / expected_items * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, digest: str):
+        """Derive bit positions from the digest itself (double hashing)"""
+        value = int(digest[:32], 16)
+        h1 = value & 0xFFFFFFFFFFFFFFFF
+        h2 = (value >> 64) | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, digest: str):
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, digest: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+class ChunkStore:
+    """Content-addressed, deduplicated chunk store with reference counting"""
+
+    def __init__(self, storage_dir: str, index_file: str = 'chunk_index.db',
+                 expected_chunks: int = 1000000, algorithm: str = 'blake2b'):
+        self.storage_dir = storage_dir
+        os.makedirs(storage_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._db = sqlite3.connect(os.path.join(storage_dir, index_file), check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS chunks (
+            digest TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            refcount INTEGER NOT NULL,
+            locations TEXT NOT NULL
+        )''')
+        self._db.execute('CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self._db.commit()
+        self.algorithm = self._load_algorithm(algorithm)
+
+        # Only the Bloom filter lives in memory; the table stays on disk
+        self.bloom = BloomFilter(expected_chunks)
+        for (digest,) in self._db.execute('SELECT digest FROM chunks'):
+            self.bloom.add(digest)
+
+        self.stats = {'hits': 0, 'misses': 0, 'bytes_deduplicated': 0}
+
+    def digest(self, data: bytes) -> str:
+        """Strong digest that identifies a chunk by its content"""
+        return hash_bytes(data, self.algorithm)
+
+    def chunk_path(self, digest: str, node_id: str, shard: Optional[int] = None) -> str:
+        """Where a node's replica (or erasure-coded shard) of a chunk is stored"""
+        suffix = f"_s{shard}" if shard is not None else ''
+        return os.path.join(self.storage_dir, digest[:2], f"{digest}{suffix}_{node_id}")
+
+    def lookup(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Get the index entry for a digest, or None if the chunk is not stored"""
+        if digest not in self.bloom:
+            return None
+
+        with self._lock:
+            return self._lookup(digest)
+
+    def put(self, digest: str, size: int, write_replicas: Callable[[], List[Dict[str, Any]]],
+            active_node_ids: Optional[set] = None) -> List[Dict[str, Any]]:
+        """Reference a chunk, calling write_replicas only if it is not stored yet"""
+        while True:
+            with self._lock:
+                entry = self._lookup(digest) if digest in self.bloom else None
+                if entry and self._is_available(entry, active_node_ids):
+                    self._db.execute('UPDATE chunks SET refcount = refcount + 1 WHERE digest = ?', (digest,))
+                    self._db.commit()
+                    self.stats['hits'] += 1
+                    self.stats['bytes_deduplicated'] += size
+                    return entry['locations']
+
+                pending = self._pending.get(digest)
+                if pending is None:
+                    pending = self._pending[digest] = threading.Event()
+                    break
+
+            # Another upload is writing the same chunk right now
+            pending.wait()
+
+        try:
+            locations = write_replicas()
+            with self._lock:
+                refcount = entry['refcount'] + 1 if entry else 1
+                if entry:
+                    # Keep replicas on currently failed nodes, they may come back
+                    written = {_location_key(location) for location in locations}
+                    locations = locations + [location for location in entry['locations']
+                                             if _location_key(location) not in written]
+                self._db.execute('''INSERT INTO chunks (digest, size, refcount, locations) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(digest) DO UPDATE SET refcount = excluded.refcount, locations = excluded.locations''',
+                                 (digest, size, refcount, json.dumps(locations)))
+                self._db.commit()
+                self.bloom.add(digest)
+                self.stats['misses'] += 1
+            return locations
+        finally:
+            with self._lock:
+                self._pending.pop(digest).set()
+
+    def add_location(self, digest: str, location: Dict[str, Any]):
+        """Record an extra replica written by redistribution or repair"""
+        with self._lock:
+            entry = self._lookup(digest)
+            if entry is None:
+                return
+
+            locations = [l for l in entry['locations'] if _location_key(l) != _location_key(location)]
+            locations.append(location)
+            self._db.execute('UPDATE chunks SET locations = ? WHERE digest = ?', (json.dumps(locations), digest))
+            self._db.commit()
+
+    def release(self, digest: str) -> bool:
+        """Drop one reference, deleting the replicas when none remain; returns True if deleted"""
+        with self._lock:
+            entry = self._lookup(digest)
+            if entry is None:
+                return False
+
+            if entry['refcount'] > 1:
+                self._db.execute('UPDATE chunks SET refcount = refcount - 1 WHERE digest = ?', (digest,))
+                self._db.commit()
+                return False
+
+            self._db.execute('DELETE FROM chunks WHERE digest = ?', (digest,))
+            self._db.commit()
+
+        for location in entry['locations']:
+            delete_object(location)
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Index size and deduplication counters"""
+        with self._lock:
+            count, stored_bytes, references = self._db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(refcount), 0) FROM chunks'
+            ).fetchone()
+        return {
+            **self.stats,
+            'unique_chunks': count,
+            'stored_bytes': stored_bytes,
+            'references': references
+        }
+
+    def _load_algorithm(self, algorithm: str) -> str:
+        """Keep using the algorithm an existing index was keyed with"""
+        row = self._db.execute("SELECT value FROM settings WHERE key = 'algorithm'").fetchone()
+        if row is not None:
+            return row[0]
+
+        if algorithm not in CRYPTOGRAPHIC_ALGORITHMS:
+            raise ValueError(f"{algorithm} is not collision resistant enough to address chunks")
+
+        self._db.execute("INSERT INTO settings (key, value) VALUES ('algorithm', ?)", (algorithm,))
+        self._db.commit()
+        return algorithm
+
+    def _lookup(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Read an index row, caller must hold the lock"""
+        row = self._db.execute('SELECT size, refcount, locations FROM chunks WHERE digest = ?',
+                               (digest,)).fetchone()
+        if row is None:
+            return None
+        return {'digest': digest, 'size': row[0], 'refcount': row[1], 'locations': json.loads(row[2])}
+
+    def _is_available(self, entry: Dict[str, Any], active_node_ids: Optional[set]) -> bool:
+        """A stored chunk is reusable while it can be read back from the active nodes"""
+        if active_node_ids is None:
+            return True
+
+        locations = entry['locations']
+        active = [location for location in locations if location['node_id'] in active_node_ids]
+        if locations and 'shard' in locations[0]:
+            # Erasure-coded chunks need data_shards distinct shards
+            return len({location['shard'] for location in active}) >= locations[0]['data_shards']
+        return bool(active)
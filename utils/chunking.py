@@ -1,15 +1,31 @@
 import os
-import hashlib
+import time
 import uuid
-from typing import List, Dict, Any
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, BinaryIO, Callable, Collection, Iterable, Iterator, Optional, Tuple
+
+from .logging_utils import error_handler
+from .hashing import hash_bytes, LEGACY_HASH_ALGORITHM
+from .erasure import ReedSolomonCodec, get_codec
+from .compression import decompress, NO_COMPRESSION
+from .pack_store import object_exists, read_object, delete_object
+from .read_latency import NodeLatencyTracker
+from .chunk_cache import ChunkCache
+from .placement import RandomPlacement, placement_key
+from .node_load import node_load
 
 class ChunkingUtils:
     """Shared utilities for file chunking across all modes"""
 
-    def __init__(self, chunk_size: int = 1024 * 1024):  # 1MB default
+    def __init__(self, chunk_size: int = 1024 * 1024,  # 1MB default
+                 hash_algorithm: str = LEGACY_HASH_ALGORITHM):
         self.chunk_size = chunk_size
+        self.hash_algorithm = hash_algorithm
 
-    def split_file_into_chunks(self, file_data: bytes, mode: str = 'simple') -> List[Dict[str, Any]]:
+    def split_file_into_chunks(self, file_data: bytes, mode: str = 'simple',
+                               hash_algorithm: str = None) -> List[Dict[str, Any]]:
         """Split file data into chunks for fault tolerance"""
         chunks = []
         total_size = len(file_data)
@@ -18,22 +34,55 @@ class ChunkingUtils:
         for i in range(num_chunks):
             start = i * self.chunk_size
             end = min(start + self.chunk_size, total_size)
-            chunk_data = file_data[start:end]
-            chunk_hash = hashlib.md5(chunk_data).hexdigest()
-
-            chunk_info = {
-                'chunk_id': f'chunk_{i}',
-                'data': chunk_data,
-                'size': len(chunk_data),
-                'hash': chunk_hash,
-                'sequence': i,
-                'total_chunks': num_chunks
-            }
+            chunk_info = self.build_chunk(file_data[start:end], i, hash_algorithm)
+            chunk_info['total_chunks'] = num_chunks
 
             chunks.append(chunk_info)
 
         return chunks
 
+    def iter_chunks_from_stream(self, stream: BinaryIO, hash_algorithm: str = None) -> Iterator[Dict[str, Any]]:
+        """Yield chunks read from a file-like stream without buffering the whole file"""
+        sequence = 0
+        while True:
+            chunk_data = self.read_exactly(stream, self.chunk_size)
+            if not chunk_data:
+                break
+
+            yield self.build_chunk(chunk_data, sequence, hash_algorithm)
+            sequence += 1
+
+            if len(chunk_data) < self.chunk_size:
+                break
+
+    def build_chunk(self, chunk_data: bytes, sequence: int, hash_algorithm: str = None) -> Dict[str, Any]:
+        """Build the chunk record for a piece of data at the given sequence number"""
+        hash_algorithm = hash_algorithm or self.hash_algorithm
+        return {
+            'chunk_id': f'chunk_{sequence}',
+            'data': chunk_data,
+            'size': len(chunk_data),
+            'hash': hash_bytes(chunk_data, hash_algorithm),
+            'hash_algorithm': hash_algorithm,
+            'sequence': sequence
+        }
+
+    def read_exactly(self, stream: BinaryIO, size: int) -> bytes:
+        """Read up to size bytes, retrying short reads until EOF"""
+        data = stream.read(size)
+        if not data or len(data) == size:
+            return data
+
+        parts = [data]
+        remaining = size - len(data)
+        while remaining > 0:
+            part = stream.read(remaining)
+            if not part:
+                break
+            parts.append(part)
+            remaining -= len(part)
+        return b''.join(parts)
+
     def reconstruct_file_from_chunks(self, chunks: List[Dict[str, Any]]) -> bytes:
         """Reconstruct file from ordered chunks"""
         # Sort chunks by sequence
@@ -49,20 +98,54 @@ class ChunkingUtils:
         if 'data' not in chunk or 'hash' not in chunk:
             return False
 
-        calculated_hash = hashlib.md5(chunk['data']).hexdigest()
+        calculated_hash = hash_bytes(chunk['data'], chunk.get('hash_algorithm', LEGACY_HASH_ALGORITHM))
         return calculated_hash == chunk['hash']
 
+def is_erasure_coded(locations: List[Dict[str, Any]]) -> bool:
+    """Whether a chunk's locations are erasure-coded shards rather than full replicas"""
+    return bool(locations) and 'shard' in locations[0]
+
+class DistributionError(Exception):
+    """Raised when chunks could not be stored on any node"""
+
+    def __init__(self, message: str, errors: List[Dict[str, Any]]):
+        super().__init__(message)
+        self.errors = errors
+
+class ReconstructionError(Exception):
+    """Raised when a chunk of a file can no longer be read from any node"""
+
+    def __init__(self, message: str, missing_chunks: List[str]):
+        super().__init__(message)
+        self.missing_chunks = missing_chunks
+
 class DistributionUtils:
     """Utilities for distributing chunks across nodes"""
 
-    def __init__(self, replication_factor: int = 2):
+    def __init__(self, replication_factor: int = 2, max_workers: int = 16,
+                 max_pending_per_node: int = 4, max_in_flight_chunks: int = 4):
         self.replication_factor = replication_factor
+        self.max_pending_per_node = max_pending_per_node
+        self.max_in_flight_chunks = max_in_flight_chunks
+
+        # Chunk tasks wait on replica tasks, so they run in separate pools
+        self._chunk_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='chunk-writer')
+        self._replica_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='replica-writer')
+        self._read_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='chunk-reader')
+        # Chunk readers wait on the replica and shard reads they start
+        self._node_read_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='node-reader')
+        self.read_latency = NodeLatencyTracker()
+        self.placement = RandomPlacement()
+        self.node_load = node_load
+        self._node_slots = {}
+        self._lock = threading.Lock()
 
     def distribute_chunks_across_nodes(self, chunks: List[Dict[str, Any]],
                                      nodes: List[Dict[str, Any]],
-                                     storage_dir: str) -> Dict[str, List[Dict[str, Any]]]:
+                                     storage_dir: str, chunk_store=None,
+                                     codec: ReedSolomonCodec = None, pack_store=None,
+                                     placement=None) -> Dict[str, List[Dict[str, Any]]]:
         """Distribute chunks across available nodes with redundancy"""
-        chunk_distribution = {}
         active_nodes = [n for n in nodes if n.get('status') == 'active']
 
         if len(active_nodes) < self.replication_factor:
@@ -71,85 +154,544 @@ class DistributionUtils:
         if len(active_nodes) == 0:
             raise ValueError("No active nodes available for distribution")
 
-        for chunk in chunks:
-            # Select nodes for this chunk (with redundancy)
-            selected_nodes = self._select_nodes_for_chunk(active_nodes, self.replication_factor)
-            chunk_distribution[chunk['chunk_id']] = []
+        chunk_distribution, _ = self._distribute(chunks, active_nodes, storage_dir, chunk_store, codec, pack_store,
+                                                 placement)
+        return chunk_distribution
 
-            for node in selected_nodes:
-                chunk_file = f"{chunk['chunk_id']}_{node['node_id']}_{uuid.uuid4().hex[:8]}"
-                chunk_path = os.path.join(storage_dir, chunk_file)
+    def distribute_chunk_stream(self, chunks: Iterable[Dict[str, Any]],
+                                nodes: List[Dict[str, Any]],
+                                storage_dir: str, chunk_store=None,
+                                codec: ReedSolomonCodec = None, pack_store=None,
+                                placement=None) -> Tuple[Dict[str, List[Dict[str, Any]]], List[Dict[str, Any]]]:
+        """Distribute chunks as they are produced, keeping only their metadata in memory"""
+        active_nodes = [n for n in nodes if n.get('status') == 'active']
 
-                # Save chunk to file
-                with open(chunk_path, 'wb') as f:
-                    f.write(chunk['data'])
+        if len(active_nodes) == 0:
+            raise ValueError("No active nodes available for distribution")
 
-                chunk_distribution[chunk['chunk_id']].append({
-                    'node_id': node['node_id'],
-                    'chunk_file': chunk_file,
-                    'path': chunk_path
-                })
+        chunk_distribution, chunk_infos = self._distribute(chunks, active_nodes, storage_dir, chunk_store, codec,
+                                                           pack_store, placement)
 
-                # Update node stats
-                node['files_count'] = node.get('files_count', 0) + 1
-                node['storage_used'] = node.get('storage_used', 0) + chunk['size']
-                node['last_heartbeat'] = self._get_current_timestamp()
+        for chunk_info in chunk_infos:
+            chunk_info['total_chunks'] = len(chunk_infos)
 
-        return chunk_distribution
+        return chunk_distribution, chunk_infos
 
-    def _select_nodes_for_chunk(self, active_nodes: List[Dict[str, Any]],
-                               replication_factor: int) -> List[Dict[str, Any]]:
-        """Select nodes for chunk distribution using round-robin or random selection"""
-        import random
-        return random.sample(active_nodes, replication_factor)
+    def _distribute(self, chunks: Iterable[Dict[str, Any]], active_nodes: List[Dict[str, Any]],
+                    storage_dir: str, chunk_store=None,
+                    codec: ReedSolomonCodec = None, pack_store=None,
+                    placement=None) -> Tuple[Dict[str, List[Dict[str, Any]]], List[Dict[str, Any]]]:
+        """Store several chunks at once, with at most max_in_flight_chunks held in memory.
 
-    def reconstruct_from_distribution(self, file_id: str, chunk_distribution: Dict[str, List[Dict[str, Any]]],
-                                    active_nodes: List[Dict[str, Any]]) -> tuple:
-        """Reconstruct file from distributed chunks, handling node failures"""
-        active_node_ids = {n['node_id'] for n in active_nodes if n.get('status') == 'active'}
-        reconstructed_chunks = []
-        missing_chunks = []
+        All or nothing: if a chunk cannot be stored or the chunk source raises,
+        the chunks stored so far are given back before the error is re-raised.
+        """
+        in_flight = threading.BoundedSemaphore(self.max_in_flight_chunks)
+        futures = []
+        failure = None
 
-        for chunk_id, locations in chunk_distribution.items():
-            chunk_found = False
+        try:
+            for chunk in chunks:
+                in_flight.acquire()
+                future = self._chunk_pool.submit(self._store_chunk, chunk, active_nodes, storage_dir,
+                                                chunk_store, codec, pack_store, placement)
+                future.add_done_callback(lambda _: in_flight.release())
+                futures.append((chunk['chunk_id'], future))
+        except Exception as e:
+            # The chunks already submitted still finish, and are rolled back below
+            failure = e
+
+        chunk_distribution = {}
+        chunk_infos = []
+        stored = []
+        errors = []
+        for chunk_id, future in futures:
+            try:
+                chunk_info, locations = future.result()
+            except DistributionError as e:
+                errors.extend(e.errors)
+                continue
+            except Exception as e:
+                failure = failure or e
+                continue
+            stored.append((chunk_info, locations))
+            chunk_distribution[chunk_id] = locations
+            chunk_infos.append(chunk_info)
+
+        if failure is not None or errors:
+            self.discard(stored, chunk_store)
+            if failure is not None:
+                raise failure
+            failed = sorted({error['chunk_id'] for error in errors})
+            raise DistributionError(f"Failed to store {len(failed)} chunk(s): {', '.join(failed)}", errors)
+
+        return chunk_distribution, chunk_infos
+
+    def discard(self, stored: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]], chunk_store=None):
+        """Undo storing (chunk info, locations) pairs: drop their chunk store references, or delete their copies"""
+        for chunk_info, locations in stored:
+            if chunk_store is not None:
+                chunk_store.release(chunk_info['digest'])
+                continue
             for location in locations:
-                if location['node_id'] in active_node_ids:
-                    chunk_path = location['path']
-                    if os.path.exists(chunk_path):
-                        with open(chunk_path, 'rb') as f:
-                            chunk_data = f.read()
-
-                        # Find the original chunk info to get sequence
-                        # This assumes chunk metadata is stored elsewhere
-                        chunk_info = self._find_chunk_info(chunk_id, chunk_data)
-                        if chunk_info:
-                            reconstructed_chunks.append((chunk_info['sequence'], chunk_data))
-                            chunk_found = True
-                            break
-
-            if not chunk_found:
-                missing_chunks.append(chunk_id)
+                delete_object(location)
+
+    def _store_chunk(self, chunk: Dict[str, Any], active_nodes: List[Dict[str, Any]],
+                     storage_dir: str, chunk_store=None,
+                     codec: ReedSolomonCodec = None, pack_store=None,
+                     placement=None) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Store one chunk and return its metadata (without data) and replica locations"""
+        locations = self.distribute_chunk(chunk, active_nodes, storage_dir, chunk_store, codec, pack_store, placement)
+        return {k: v for k, v in chunk.items() if k != 'data'}, locations
+
+    def distribute_chunk(self, chunk: Dict[str, Any], active_nodes: List[Dict[str, Any]],
+                         storage_dir: str, chunk_store=None,
+                         codec: ReedSolomonCodec = None, pack_store=None,
+                         placement=None) -> List[Dict[str, Any]]:
+        """Store a single chunk, skipping the writes if a chunk store already holds it"""
+        write = self._write_shards if codec is not None else self._write_replicas
+        if chunk_store is None:
+            return write(chunk, active_nodes, storage_dir, codec=codec, pack_store=pack_store, placement=placement)
+
+        # Reuse the chunk hash as the content address when it is the store's algorithm
+        if chunk.get('hash_algorithm') == chunk_store.algorithm:
+            chunk['digest'] = chunk['hash']
+        else:
+            chunk['digest'] = chunk_store.digest(decompress(chunk['data'], chunk.get('compression', NO_COMPRESSION)))
+        return chunk_store.put(
+            chunk['digest'], chunk['size'],
+            lambda: write(chunk, active_nodes, storage_dir, chunk_store, codec, pack_store, placement),
+            {n['node_id'] for n in active_nodes}
+        )
+
+    def _write_replicas(self, chunk: Dict[str, Any], active_nodes: List[Dict[str, Any]],
+                        storage_dir: str, chunk_store=None, codec: ReedSolomonCodec = None,
+                      pack_store=None, placement=None) -> List[Dict[str, Any]]:
+        """Write all replicas of a chunk concurrently, tolerating individual node failures"""
+        replication_factor = min(self.replication_factor, len(active_nodes))
+        selected_nodes = self._select_nodes_for_chunk(active_nodes, replication_factor, chunk, placement)
+        pieces = [(node, None, chunk['data']) for node in selected_nodes]
+
+        locations, errors = self._write_pieces(chunk, pieces, storage_dir, chunk_store, pack_store)
+        if not locations:
+            raise DistributionError(f"No replica of {chunk['chunk_id']} could be written", errors)
+
+        return locations
+
+    def _write_shards(self, chunk: Dict[str, Any], active_nodes: List[Dict[str, Any]],
+                      storage_dir: str, chunk_store=None, codec: ReedSolomonCodec = None,
+                      pack_store=None, placement=None) -> List[Dict[str, Any]]:
+        """Erasure-code a chunk and write its shards, tolerating up to m failed shard writes"""
+        shards = codec.encode(chunk['data'])
+        selected_nodes = self._select_nodes_for_shards(active_nodes, len(shards), chunk, placement)
+        pieces = [(node, index, shard) for index, (node, shard) in enumerate(zip(selected_nodes, shards))]
+
+        locations, errors = self._write_pieces(chunk, pieces, storage_dir, chunk_store, pack_store)
+        if len(locations) < codec.k:
+            # Too few shards to decode the chunk from, so the ones written are useless
+            self._delete_unreferenced(chunk, locations, chunk_store)
+            raise DistributionError(
+                f"Only {len(locations)} of {len(shards)} shards of {chunk['chunk_id']} could be written", errors
+            )
+
+        return self._tag_shards(locations, codec, len(chunk['data']))
+
+    def _delete_unreferenced(self, chunk: Dict[str, Any], locations: List[Dict[str, Any]], chunk_store=None):
+        """Delete copies a failed write left behind, sparing those a chunk store entry already points at"""
+        entry = chunk_store.lookup(chunk['digest']) if chunk_store is not None else None
+        # Content-addressed copies are named by digest and node, so a rewrite can land on a referenced one
+        referenced = {(l['node_id'], l.get('shard')) for l in entry['locations']} if entry else set()
+        for location in locations:
+            if (location['node_id'], location.get('shard')) not in referenced:
+                delete_object(location)
+
+    def repair_shards(self, chunk_id: str, locations: List[Dict[str, Any]], active_nodes: List[Dict[str, Any]],
+                      storage_dir: str, chunk_store=None, digest: str = None,
+                      pack_store=None, suspect_node_ids: Collection[str] = ()) -> List[Dict[str, Any]]:
+        """Re-create the lost shards of an erasure-coded chunk and return their new locations.
+
+        Shards on suspect_node_ids are not read, but not re-created either, since their nodes may still be up.
+        """
+        active_node_ids = {n['node_id'] for n in active_nodes}
+        readable = {l['shard'] for l in locations if l['node_id'] in active_node_ids and object_exists(l)}
+        waiting = {l['shard'] for l in locations if l['node_id'] in suspect_node_ids}
+        codec = get_codec(locations[0]['data_shards'], locations[0]['parity_shards'])
+        lost = [shard for shard in range(codec.k + codec.m) if shard not in readable and shard not in waiting]
+        if not lost:
+            return []
+
+        chunk_data = self._decode_shards(locations, active_node_ids)
+        if chunk_data is None:
+            return []
+        shards = codec.encode(chunk_data)
+
+        # Each lost shard goes to the active node holding the fewest shards of this chunk
+        held = {n['node_id']: 0 for n in active_nodes}
+        for location in locations:
+            if location['shard'] in readable and location['node_id'] in held:
+                held[location['node_id']] += 1
+        nodes_by_id = {n['node_id']: n for n in active_nodes}
+        pieces = []
+        for shard in lost:
+            node_id = min(held, key=held.get)
+            held[node_id] += 1
+            pieces.append((nodes_by_id[node_id], shard, shards[shard]))
+
+        chunk = {'chunk_id': chunk_id, 'digest': digest}
+        new_locations, _ = self._write_pieces(chunk, pieces, storage_dir, chunk_store if digest else None, pack_store)
+        for location in new_locations:
+            if 'compression' in locations[0]:
+                location['compression'] = locations[0]['compression']
+        return self._tag_shards(new_locations, codec, len(chunk_data))
+
+    def copy_replica(self, chunk_id: str, source: Dict[str, Any], node: Dict[str, Any], storage_dir: str,
+                     chunk_store=None, digest: str = None, pack_store=None) -> Dict[str, Any]:
+        """Copy a stored replica to another node as is, returning the new location or None"""
+        stored = read_object(source)
+        if stored is None:
+            return None
+
+        chunk = {'chunk_id': chunk_id, 'digest': digest}
+        location = self._write_replica(chunk, node, storage_dir, chunk_store if digest else None,
+                                       data=stored, pack_store=pack_store)
+        if 'compression' in source:
+            location['compression'] = source['compression']
+        return location
+
+    def _tag_shards(self, locations: List[Dict[str, Any]], codec: ReedSolomonCodec,
+                    chunk_size: int) -> List[Dict[str, Any]]:
+        """Make shard locations self-describing so they can be decoded without other metadata"""
+        for location in locations:
+            location.update({
+                'data_shards': codec.k,
+                'parity_shards': codec.m,
+                'chunk_size': chunk_size
+            })
+        return locations
+
+    def _write_pieces(self, chunk: Dict[str, Any], pieces: List[Tuple[Dict[str, Any], int, bytes]],
+                      storage_dir: str, chunk_store=None,
+                      pack_store=None) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Write (node, shard, data) pieces concurrently and collect locations and errors"""
+        futures = []
+        for node, shard, data in pieces:
+            # Blocks while this node already has max_pending_per_node writes queued
+            slot = self._node_slot(node['node_id'])
+            slot.acquire()
+            self.node_load.begin_write(node['node_id'])
+            future = self._replica_pool.submit(self._timed_write, chunk, node, storage_dir,
+                                               chunk_store, shard, data, pack_store)
+            future.add_done_callback(lambda _, slot=slot, node_id=node['node_id']: (
+                slot.release(), self.node_load.end_write(node_id)))
+            futures.append((node, future))
+
+        locations = []
+        errors = []
+        for node, future in futures:
+            try:
+                locations.append(future.result())
+            except Exception as e:
+                errors.append({'chunk_id': chunk['chunk_id'], 'node_id': node['node_id'], 'error': str(e)})
+                error_handler.handle_node_error(node['node_id'], f"Failed to write {chunk['chunk_id']}: {e}")
+
+        return locations, errors
+
+    def _timed_write(self, chunk: Dict[str, Any], node: Dict[str, Any], storage_dir: str,
+                     chunk_store=None, shard: int = None, data: bytes = None,
+                     pack_store=None) -> Dict[str, Any]:
+        """Write one piece and record how long its node took, for load-aware placement"""
+        start = time.perf_counter()
+        failed = True
+        try:
+            location = self._write_replica(chunk, node, storage_dir, chunk_store, shard, data, pack_store)
+            failed = False
+            return location
+        finally:
+            self.node_load.record(node['node_id'], time.perf_counter() - start, failed)
+
+    def _write_replica(self, chunk: Dict[str, Any], node: Dict[str, Any], storage_dir: str,
+                       chunk_store=None, shard: int = None, data: bytes = None,
+                       pack_store=None) -> Dict[str, Any]:
+        """Write one replica of a chunk, or one of its erasure-coded shards, to a node"""
+        data = chunk['data'] if data is None else data
+        suffix = f"_s{shard}" if shard is not None else ''
+        if chunk_store is not None:
+            # Content-addressed replicas are named by digest
+            chunk_path = chunk_store.chunk_path(chunk['digest'], node['node_id'], shard)
+            chunk_file = os.path.relpath(chunk_path, storage_dir)
+        else:
+            chunk_file = f"{chunk['chunk_id']}{suffix}_{node['node_id']}_{uuid.uuid4().hex[:8]}"
+            chunk_path = os.path.join(storage_dir, chunk_file)
+
+        if pack_store is not None:
+            # Appended to the node's pack segment, the file name becomes the object id
+            location = pack_store.put(node['node_id'], chunk_file, data)
+        else:
+            os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
+            with open(chunk_path, 'wb') as f:
+                f.write(data)
+            location = {
+                'node_id': node['node_id'],
+                'chunk_file': chunk_file,
+                'path': chunk_path
+            }
 
+        # Tally what this request wrote to the node; several replicas may finish at the same time
+        with self._lock:
+            node['files_written'] = node.get('files_written', 0) + 1
+            node['bytes_written'] = node.get('bytes_written', 0) + len(data)
+
+        if shard is not None:
+            location['shard'] = shard
+        # Encrypted chunks were compressed before encryption, the owner decompresses them
+        if chunk.get('compression', NO_COMPRESSION) != NO_COMPRESSION and not chunk.get('encrypted'):
+            location['compression'] = chunk['compression']
+        return location
+
+    def usage(self, nodes: List[Dict[str, Any]]) -> Dict[str, Tuple[int, int]]:
+        """(files, bytes) written to each node through these node dicts, to be added to its counters"""
+        with self._lock:
+            return {n['node_id']: (n.get('files_written', 0), n.get('bytes_written', 0))
+                    for n in nodes if n.get('files_written')}
+
+    def _node_slot(self, node_id: str) -> threading.BoundedSemaphore:
+        """Semaphore limiting the writes queued for one node"""
+        with self._lock:
+            if node_id not in self._node_slots:
+                self._node_slots[node_id] = threading.BoundedSemaphore(self.max_pending_per_node)
+            return self._node_slots[node_id]
+
+    def _select_nodes_for_chunk(self, active_nodes: List[Dict[str, Any]], replication_factor: int,
+                                chunk: Dict[str, Any], placement=None) -> List[Dict[str, Any]]:
+        """Select nodes for a chunk's replicas with the placement policy (random by default)"""
+        return (placement or self.placement).select(placement_key(chunk), active_nodes, replication_factor)
+
+    def _select_nodes_for_shards(self, active_nodes: List[Dict[str, Any]], shard_count: int,
+                                 chunk: Dict[str, Any], placement=None) -> List[Dict[str, Any]]:
+        """Spread shards over the nodes, so each node holds as few as possible"""
+        return (placement or self.placement).spread(placement_key(chunk), active_nodes, shard_count)
+
+    def reconstruct_from_distribution(self, file_id: str, chunk_distribution: Dict[str, List[Dict[str, Any]]],
+                                    nodes: List[Dict[str, Any]], cache: ChunkCache = None,
+                                    cache_keys: Dict[str, str] = None) -> tuple:
+        """Reconstruct file from distributed chunks, handling node failures"""
+        missing_chunks = self.missing_chunks(chunk_distribution, nodes, cache, cache_keys)
         if missing_chunks:
             return None, missing_chunks  # Cannot reconstruct
 
-        # Sort by sequence and reconstruct
-        reconstructed_chunks.sort(key=lambda x: x[0])
-        file_data = b''.join([chunk[1] for chunk in reconstructed_chunks])
+        try:
+            return b''.join(self.iter_reconstruct(chunk_distribution, nodes,
+                                                  cache=cache, cache_keys=cache_keys)), None
+        except ReconstructionError as e:
+            return None, e.missing_chunks
+
+    def iter_reconstruct(self, chunk_distribution: Dict[str, List[Dict[str, Any]]],
+                         nodes: List[Dict[str, Any]], read_ahead: int = None,
+                         cache: ChunkCache = None, cache_keys: Dict[str, str] = None) -> Iterator[bytes]:
+        """Yield a file's bytes chunk by chunk, for streaming it to a client"""
+        for _, chunk_data in self.iter_chunks(chunk_distribution, nodes, read_ahead=read_ahead,
+                                              cache=cache, cache_keys=cache_keys):
+            yield chunk_data
+
+    def iter_chunks(self, chunk_distribution: Dict[str, List[Dict[str, Any]]], nodes: List[Dict[str, Any]],
+                    transform: Callable[[str, bytes], bytes] = None, read_ahead: int = None,
+                    cache: ChunkCache = None, cache_keys: Dict[str, str] = None) -> Iterator[Tuple[str, bytes]]:
+        """Yield (chunk_id, data) in sequence order, reading at most read_ahead chunks ahead of the consumer.
+
+        transform(chunk_id, data), e.g. decryption, runs on the reader threads
+        too. With a cache, chunks are looked up by cache_keys[chunk_id] first
+        and cached as read, before transform: encrypted chunks stay encrypted.
+        Nodes that have not failed are read from, suspect ones last.
+        Raises ReconstructionError when a chunk cannot be read.
+        """
+        readable = self.readable_nodes(nodes)
+        read_ahead = read_ahead or self.max_in_flight_chunks
+        unordered = [chunk_id for chunk_id in chunk_distribution if self._chunk_sequence(chunk_id) is None]
+        if unordered:
+            raise ReconstructionError(f"Cannot order {len(unordered)} chunk(s)", unordered)
+        chunk_ids = iter(sorted(chunk_distribution, key=self._chunk_sequence))
+        pending = deque()
+
+        def read(chunk_id):
+            key = cache_keys.get(chunk_id) if cache is not None and cache_keys else None
+            chunk_data = cache.get(key) if key else None
+            if chunk_data is None:
+                chunk_data = self.read_chunk(chunk_distribution[chunk_id], readable)
+                if chunk_data is not None and key:
+                    cache.put(key, chunk_data)
+            if chunk_data is not None and transform is not None:
+                chunk_data = transform(chunk_id, chunk_data)
+            return chunk_data
+
+        def read_next():
+            chunk_id = next(chunk_ids, None)
+            if chunk_id is not None:
+                pending.append((chunk_id, self._read_pool.submit(read, chunk_id)))
 
-        return file_data, None
+        try:
+            for _ in range(read_ahead):
+                read_next()
+
+            while pending:
+                chunk_id, future = pending.popleft()
+                chunk_data = future.result()
+                if chunk_data is None:
+                    raise ReconstructionError(f"Chunk {chunk_id} is unavailable", [chunk_id])
+                # Keep the window full while the consumer sends this chunk
+                read_next()
+                yield chunk_id, chunk_data
+        finally:
+            # The client may have gone away; do not read the rest for nothing
+            for _, future in pending:
+                future.cancel()
+
+    def iter_range(self, chunk_distribution: Dict[str, List[Dict[str, Any]]], chunk_infos: List[Dict[str, Any]],
+                   start: int, stop: int, nodes: List[Dict[str, Any]],
+                   transform: Callable[[str, bytes], bytes] = None, read_ahead: int = None,
+                   cache: ChunkCache = None, cache_keys: Dict[str, str] = None) -> Iterator[bytes]:
+        """Yield bytes [start, stop) of a file, reading only the chunks that overlap them"""
+        spans = {chunk_id: (begin, end) for chunk_id, begin, end in self.chunks_for_range(chunk_infos, start, stop)}
+        needed = {chunk_id: chunk_distribution[chunk_id] for chunk_id in spans}
+
+        for chunk_id, chunk_data in self.iter_chunks(needed, nodes, transform, read_ahead, cache, cache_keys):
+            begin, end = spans[chunk_id]
+            yield chunk_data if begin == 0 and end == len(chunk_data) else chunk_data[begin:end]
+
+    def chunks_for_range(self, chunk_infos: List[Dict[str, Any]], start: int, stop: int) -> List[Tuple[str, int, int]]:
+        """(chunk_id, begin, end) for each chunk overlapping bytes [start, stop), with the slice of it that is needed"""
+        spans = []
+        offset = 0
+        for chunk_info in sorted(chunk_infos, key=lambda c: c['sequence']):
+            if offset >= stop:
+                break
+            chunk_stop = offset + chunk_info['size']
+            if chunk_stop > start:
+                spans.append((chunk_info['chunk_id'], max(start - offset, 0), min(stop, chunk_stop) - offset))
+            offset = chunk_stop
+        return spans
+
+    def missing_chunks(self, chunk_distribution: Dict[str, List[Dict[str, Any]]],
+                       nodes: List[Dict[str, Any]], cache: ChunkCache = None,
+                       cache_keys: Dict[str, str] = None) -> List[str]:
+        """Chunks that cannot be read from the nodes that have not failed or the cache, checked before streaming starts"""
+        readable = self.readable_nodes(nodes)
+
+        def available(chunk_id, locations):
+            key = cache_keys.get(chunk_id) if cache is not None and cache_keys else None
+            return (key is not None and cache.contains(key)) or self.is_chunk_available(locations, readable)
+
+        return [chunk_id for chunk_id, locations in chunk_distribution.items()
+                if self._chunk_sequence(chunk_id) is None or not available(chunk_id, locations)]
+
+    def readable_nodes(self, nodes: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Ids of the nodes that have not failed, mapped to their read priority: active 0, suspect 1"""
+        return {n['node_id']: 0 if n.get('status') == 'active' else 1
+                for n in nodes if n.get('status') != 'failed'}
+
+    def read_chunk(self, locations: List[Dict[str, Any]], readable: Dict[str, int] = None) -> bytes:
+        """Read a chunk from its fastest replica on the readable nodes (from readable_nodes), decoding shards if erasure-coded"""
+        if is_erasure_coded(locations):
+            chunk_data = self._decode_shards(locations, readable)
+            if chunk_data is None:
+                return None
+            return decompress(chunk_data, locations[0].get('compression', NO_COMPRESSION))
+
+        candidates = [l for l in locations if readable is None or l['node_id'] in readable]
+        for location, stored in self._hedged_reads(candidates, 1, key=self._read_priority(readable)):
+            return decompress(stored, location.get('compression', NO_COMPRESSION))
+        return None
+
+    def _hedged_reads(self, candidates: List[Dict[str, Any]], needed: int,
+                      valid: Callable[[bytes], bool] = None, key: Callable[[Dict[str, Any]], Any] = None) -> List[Tuple[Dict[str, Any], bytes]]:
+        """Read `needed` of the candidate locations at once, fastest nodes first.
+
+        A read that takes longer than the hedge delay (a high percentile of
+        recent reads) gets a second request to the next candidate, and a
+        missing or invalid piece is replaced by the next candidate; whichever
+        answers first is used.
+        """
+        ranked = iter(self.read_latency.rank(candidates, key))
+        pending = set()
+        results = []
+
+        def launch() -> bool:
+            location = next(ranked, None)
+            if location is None:
+                return False
+            pending.add(self._node_read_pool.submit(self._timed_read, location))
+            return True
+
+        for _ in range(needed):
+            launch()
+
+        exhausted = False
+        while pending and len(results) < needed:
+            delay = None if exhausted else self.read_latency.hedge_delay()
+            done, pending = wait(pending, timeout=delay, return_when=FIRST_COMPLETED)
+            if not done:
+                exhausted = not launch()
+            for future in done:
+                location, stored = future.result()
+                if stored is not None and (valid is None or valid(stored)):
+                    results.append((location, stored))
+                elif not exhausted:
+                    exhausted = not launch()
+
+        # Slower duplicates finish in the background and still count towards the latency figures
+        for future in pending:
+            future.cancel()
+        return results[:needed]
+
+    def _timed_read(self, location: Dict[str, Any]) -> Tuple[Dict[str, Any], bytes]:
+        """Read a stored replica or shard and record how long its node took"""
+        start = time.perf_counter()
+        try:
+            stored = read_object(location)
+        except OSError as e:
+            error_handler.handle_node_error(location['node_id'], f"Failed to read {location.get('chunk_file')}: {e}")
+            return location, None
+        if stored is not None:
+            self.read_latency.record(location['node_id'], time.perf_counter() - start)
+        return location, stored
+
+    def is_chunk_available(self, locations: List[Dict[str, Any]], node_ids: Collection[str]) -> bool:
+        """Whether a chunk can still be read from the given nodes"""
+        readable = [l for l in locations if l['node_id'] in node_ids and object_exists(l)]
+        if is_erasure_coded(locations):
+            return len({l['shard'] for l in readable}) >= locations[0]['data_shards']
+        return bool(readable)
+
+    def _decode_shards(self, locations: List[Dict[str, Any]], readable: Collection[str] = None) -> bytes:
+        """Rebuild an erasure-coded chunk from any data_shards of its surviving shards"""
+        codec = get_codec(locations[0]['data_shards'], locations[0]['parity_shards'])
+        chunk_size = locations[0]['chunk_size']
+        shard_size = codec.shard_size(chunk_size)
+        priority = self._read_priority(readable)
+
+        # One location per shard, suspect nodes and then parity shards last: when the data shards can be
+        # read from active nodes no decoding is needed
+        candidates = {}
+        for location in self.read_latency.rank(locations, priority):
+            if readable is not None and location['node_id'] not in readable:
+                continue
+            candidates.setdefault(location['shard'], location)
+
+        pieces = self._hedged_reads(list(candidates.values()), codec.k,
+                                    valid=lambda shard: len(shard) == shard_size,
+                                    key=lambda location: (priority(location), location['shard'] >= codec.k))
+        if len(pieces) < codec.k:
+            return None
+        return codec.decode({location['shard']: shard for location, shard in pieces}, chunk_size)
+
+    def _read_priority(self, readable: Collection[str] = None) -> Callable[[Dict[str, Any]], int]:
+        """Sort key putting locations on suspect nodes after the others"""
+        priorities = readable if isinstance(readable, dict) else {}
+        return lambda location: priorities.get(location['node_id'], 0)
 
-    def _find_chunk_info(self, chunk_id: str, chunk_data: bytes) -> Dict[str, Any]:
-        """Find chunk information - this should be enhanced with proper metadata storage"""
-        # For now, return basic info based on chunk_id
+    def _chunk_sequence(self, chunk_id: str) -> Optional[int]:
+        """Position of a chunk in its file, parsed from its id (chunk_<sequence>)"""
         try:
-            sequence = int(chunk_id.split('_')[1])
-            return {
-                'chunk_id': chunk_id,
-                'sequence': sequence,
-                'size': len(chunk_data),
-                'hash': hashlib.md5(chunk_data).hexdigest()
-            }
+            return int(chunk_id.split('_')[1])
         except (IndexError, ValueError):
             return None
 
@@ -0,0 +1,124 @@
+import math
+import zlib
+import threading
+from collections import Counter
+from typing import List, Dict, Any, Iterable, Iterator
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+# Chunks stored as is, and every chunk written before compression existed
+NO_COMPRESSION = 'none'
+
+def _zlib_compress(data: bytes) -> bytes:
+    return zlib.compress(data, 3)
+
+def _zstd_compress(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+def _zstd_decompress(data: bytes) -> bytes:
+    return zstandard.ZstdDecompressor().decompress(data)
+
+COMPRESSION_CODECS = {
+    'zlib': (_zlib_compress, zlib.decompress)
+}
+if zstandard is not None:
+    COMPRESSION_CODECS['zstd'] = (_zstd_compress, _zstd_decompress)
+if lz4_frame is not None:
+    COMPRESSION_CODECS['lz4'] = (lz4_frame.compress, lz4_frame.decompress)
+
+# 'auto' picks the first of these that is installed
+PREFERRED_CODECS = ['zstd', 'lz4', 'zlib']
+
+def resolve_codec(codec: str) -> str:
+    """Concrete codec name for a configured codec ('auto', 'none' or a codec name)"""
+    if not codec or codec == NO_COMPRESSION:
+        return NO_COMPRESSION
+    if codec == 'auto':
+        return next(name for name in PREFERRED_CODECS if name in COMPRESSION_CODECS)
+    if codec not in COMPRESSION_CODECS:
+        raise ValueError(f"Unsupported compression codec: {codec}")
+    return codec
+
+def decompress(data: bytes, codec: str) -> bytes:
+    """Undo compress_chunk for data stored with codec"""
+    if codec == NO_COMPRESSION:
+        return data
+    if codec not in COMPRESSION_CODECS:
+        raise ValueError(f"Chunk was compressed with {codec}, which is not installed")
+    return COMPRESSION_CODECS[codec][1](data)
+
+def byte_entropy(data: bytes) -> float:
+    """Shannon entropy of data in bits per byte"""
+    if not data:
+        return 0.0
+
+    total = len(data)
+    return -sum(count / total * math.log2(count / total) for count in Counter(data).values())
+
+def sample_windows(data: bytes, sample_size: int = 1024, samples: int = 16) -> List[bytes]:
+    """A few evenly spaced windows of data, or all of it if it is small"""
+    if len(data) <= sample_size * samples:
+        return [data[i:i + sample_size] for i in range(0, len(data), sample_size)]
+
+    step = (len(data) - sample_size) // (samples - 1)
+    return [data[i * step:i * step + sample_size] for i in range(samples)]
+
+class ChunkCompressor:
+    """Compresses chunks on their way to storage, skipping data that will not shrink"""
+
+    def __init__(self, codec: str = 'auto', entropy_threshold: float = 7.2, min_savings: float = 0.05):
+        self.codec = resolve_codec(codec)
+        self.entropy_threshold = entropy_threshold
+        self.min_savings = min_savings
+        self.stats = {'chunks_compressed': 0, 'chunks_skipped': 0, 'bytes_in': 0, 'bytes_out': 0}
+        self._lock = threading.Lock()
+
+    def compress_chunk(self, chunk: Dict[str, Any]) -> Dict[str, Any]:
+        """Replace a chunk's data with its compressed form if that pays off.
+
+        'size' and 'hash' keep describing the original bytes; 'compression' and
+        'stored_size' describe what is written to the nodes.
+        """
+        data = chunk['data']
+        stored = None
+
+        # Already-compressed media, archives and ciphertext look random (close to
+        # 8 bits per byte) in every window; mixed data is still worth a try
+        if self.codec != NO_COMPRESSION and self.looks_compressible(data):
+            compressed = COMPRESSION_CODECS[self.codec][0](data)
+            if len(compressed) <= len(data) * (1 - self.min_savings):
+                stored = compressed
+
+        with self._lock:
+            self.stats['bytes_in'] += len(data)
+            self.stats['bytes_out'] += len(stored if stored is not None else data)
+            self.stats['chunks_skipped' if stored is None else 'chunks_compressed'] += 1
+
+        if stored is None:
+            return {**chunk, 'compression': NO_COMPRESSION, 'stored_size': len(data)}
+        return {**chunk, 'data': stored, 'compression': self.codec, 'stored_size': len(stored)}
+
+    def looks_compressible(self, data: bytes) -> bool:
+        """Whether any sampled window of data is below the entropy threshold"""
+        return any(byte_entropy(window) < self.entropy_threshold for window in sample_windows(data))
+
+    def compress_chunks(self, chunks: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Compress chunks as they stream past"""
+        for chunk in chunks:
+            yield self.compress_chunk(chunk)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Compression counters since startup"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats['ratio'] = stats['bytes_out'] / stats['bytes_in'] if stats['bytes_in'] else 1.0
+        stats['codec'] = self.codec
+        return stats
@@ -0,0 +1,127 @@
+from functools import lru_cache
+from typing import List, Dict
+
+# GF(256) arithmetic over the primitive polynomial x^8 + x^4 + x^3 + x^2 + 1
+GF_EXP = [0] * 512
+GF_LOG = [0] * 256
+
+def _build_tables():
+    x = 1
+    for i in range(255):
+        GF_EXP[i] = x
+        GF_LOG[x] = i
+        x <<= 1
+        if x & 0x100:
+            x ^= 0x11d
+    for i in range(255, 512):
+        GF_EXP[i] = GF_EXP[i - 255]
+
+_build_tables()
+
+def gf_mul(a: int, b: int) -> int:
+    if a == 0 or b == 0:
+        return 0
+    return GF_EXP[GF_LOG[a] + GF_LOG[b]]
+
+def gf_inv(a: int) -> int:
+    if a == 0:
+        raise ZeroDivisionError("0 has no inverse in GF(256)")
+    return GF_EXP[255 - GF_LOG[a]]
+
+# One 256-byte translation table per coefficient, so multiplying a whole
+# shard by a constant is a single bytes.translate call
+MUL_TABLES = [bytes(gf_mul(c, v) for v in range(256)) for c in range(256)]
+
+class ReedSolomonCodec:
+    """Systematic Reed-Solomon code with k data and m parity shards (Cauchy matrix)"""
+
+    def __init__(self, k: int = 6, m: int = 3):
+        if k < 1 or m < 0 or k + m > 256:
+            raise ValueError("Erasure coding needs k >= 1, m >= 0 and k + m <= 256")
+
+        self.k = k
+        self.m = m
+        # Any k rows of [identity; cauchy] form an invertible matrix
+        self.parity_matrix = [[gf_inv((k + i) ^ j) for j in range(k)] for i in range(m)]
+
+    def shard_size(self, data_size: int) -> int:
+        """Length of every shard for a chunk of data_size bytes"""
+        return max(1, (data_size + self.k - 1) // self.k)
+
+    def encode(self, data: bytes) -> List[bytes]:
+        """Split data into k padded data shards followed by m parity shards"""
+        size = self.shard_size(len(data))
+        padded = data.ljust(size * self.k, b'\0')
+        shards = [padded[i * size:(i + 1) * size] for i in range(self.k)]
+
+        for row in self.parity_matrix:
+            shards.append(self._combine(row, shards[:self.k], size))
+
+        return shards
+
+    def decode(self, shards: Dict[int, bytes], data_size: int) -> bytes:
+        """Rebuild the original data from any k shards, keyed by shard index"""
+        if len(shards) < self.k:
+            raise ValueError(f"Need {self.k} shards to decode, only {len(shards)} available")
+
+        size = self.shard_size(data_size)
+        if all(i in shards for i in range(self.k)):
+            return b''.join(shards[i] for i in range(self.k))[:data_size]
+
+        # Prefer data shards, they correspond to identity rows
+        indices = sorted(shards)[:self.k]
+        matrix = [self._encoding_row(i) for i in indices]
+        inverse = self._invert(matrix)
+        available = [shards[i] for i in indices]
+
+        data_shards = []
+        for j in range(self.k):
+            if j in shards:
+                data_shards.append(shards[j])
+            else:
+                data_shards.append(self._combine(inverse[j], available, size))
+
+        return b''.join(data_shards)[:data_size]
+
+    def _encoding_row(self, index: int) -> List[int]:
+        """Row of the full (k + m) x k encoding matrix for a shard"""
+        if index < self.k:
+            return [1 if j == index else 0 for j in range(self.k)]
+        return self.parity_matrix[index - self.k]
+
+    def _combine(self, coefficients: List[int], shards: List[bytes], size: int) -> bytes:
+        """Sum of coefficient * shard over GF(256), vectorized via translate and big-int XOR"""
+        accumulator = 0
+        for coefficient, shard in zip(coefficients, shards):
+            if coefficient == 0:
+                continue
+            if coefficient != 1:
+                shard = shard.translate(MUL_TABLES[coefficient])
+            accumulator ^= int.from_bytes(shard, 'little')
+        return accumulator.to_bytes(size, 'little')
+
+    def _invert(self, matrix: List[List[int]]) -> List[List[int]]:
+        """Gauss-Jordan inversion of a k x k matrix over GF(256)"""
+        n = len(matrix)
+        rows = [list(row) + [1 if i == j else 0 for j in range(n)] for i, row in enumerate(matrix)]
+
+        for col in range(n):
+            pivot = next((r for r in range(col, n) if rows[r][col]), None)
+            if pivot is None:
+                raise ValueError("Shard matrix is singular")
+            rows[col], rows[pivot] = rows[pivot], rows[col]
+
+            scale = gf_inv(rows[col][col])
+            rows[col] = [gf_mul(scale, v) for v in rows[col]]
+
+            for r in range(n):
+                factor = rows[r][col]
+                if r != col and factor:
+                    rows[r] = [v ^ gf_mul(factor, p) for v, p in zip(rows[r], rows[col])]
+
+        return [row[n:] for row in rows]
+
+@lru_cache(maxsize=None)
+def get_codec(k: int, m: int) -> ReedSolomonCodec:
+    """Shared codec for a k + m layout"""
+    return ReedSolomonCodec(k, m)
@@ -0,0 +1,87 @@
+import hashlib
+from typing import Dict, Any, Optional
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# Records written before the algorithm was stored in metadata use MD5
+LEGACY_HASH_ALGORITHM = 'md5'
+
+def _blake2b():
+    return hashlib.blake2b(digest_size=32)
+
+HASH_ALGORITHMS = {
+    'md5': hashlib.md5,
+    'sha256': hashlib.sha256,
+    'blake2b': _blake2b
+}
+if blake3 is not None:
+    HASH_ALGORITHMS['blake3'] = blake3.blake3
+if xxhash is not None:
+    HASH_ALGORITHMS['xxh3'] = xxhash.xxh3_128
+
+# Digests that are safe to use as content addresses for deduplication
+CRYPTOGRAPHIC_ALGORITHMS = {'sha256', 'blake2b', 'blake3'}
+
+def new_hasher(algorithm: str):
+    """Create an incremental hasher for a supported algorithm"""
+    if algorithm not in HASH_ALGORITHMS:
+        raise ValueError(f"Unsupported hash algorithm: {algorithm}")
+    return HASH_ALGORITHMS[algorithm]()
+
+def hash_bytes(data: bytes, algorithm: str = LEGACY_HASH_ALGORITHM) -> str:
+    """Hex digest of data"""
+    hasher = new_hasher(algorithm)
+    hasher.update(data)
+    return hasher.hexdigest()
+
+def record_hash_algorithm(record: Dict[str, Any]) -> str:
+    """Algorithm a metadata record was hashed with"""
+    return record.get('hash_algorithm', LEGACY_HASH_ALGORITHM)
+
+class FileDigest:
+    """Whole-file digest built while chunks pass through the upload pipeline.
+
+    hexdigest() is the digest of the file bytes, so a client can check it
+    with the usual tools (b2sum -l 256, sha256sum, md5sum). Except with
+    legacy MD5, the digest of the sequence of chunk digests is kept as
+    well, as chunk_root(): it vouches for a file's chunk list without its
+    bytes, but depends on where the chunker cut the file.
+    """
+
+    def __init__(self, algorithm: str = LEGACY_HASH_ALGORITHM):
+        self.algorithm = algorithm
+        self._hasher = new_hasher(algorithm)
+        self._root = None if algorithm == LEGACY_HASH_ALGORITHM else new_hasher(algorithm)
+        self.size = 0
+
+    def update_chunk(self, chunk: Dict[str, Any]):
+        """Fold a chunk (its bytes, and its digest with the same algorithm) into the file digest"""
+        self._hasher.update(chunk['data'])
+        if self._root is not None:
+            self._root.update(bytes.fromhex(chunk['hash']))
+        self.size += chunk['size']
+
+    def hexdigest(self) -> str:
+        return self._hasher.hexdigest()
+
+    def chunk_root(self) -> Optional[str]:
+        return self._root.hexdigest() if self._root is not None else None
+
+    def record_fields(self) -> Dict[str, Any]:
+        """Checksum fields of a file's metadata record"""
+        fields = {'checksum': self.hexdigest(), 'hash_algorithm': self.algorithm}
+        if self._root is not None:
+            fields['chunk_root'] = self.chunk_root()
+        return fields
+
+    def matches(self, record: Dict[str, Any]) -> bool:
+        """Whether the chunks folded in so far make up the file a metadata record describes"""
+        return self.hexdigest() == record['checksum']
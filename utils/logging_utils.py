@@ -87,6 +87,10 @@ class SecureLogger:
 
         self.system_logger.info(message)
 
+    def log_warning(self, warning: str, component: str = "system"):
+        """Log conditions an operator should know about (shown on the console)"""
+        self.system_logger.warning(f"WARNING: {warning} | Component: {component}")
+
     def log_error(self, error: str, component: str = "unknown",
                  exception: Optional[Exception] = None, user: Optional[str] = None):
         """Log errors"""
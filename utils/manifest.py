@@ -0,0 +1,285 @@
+import json
+import struct
+import zlib
+from typing import List, Dict, Any, Optional, Iterator
+
+MAGIC = b'CMF1'
+
+# Manifest flags: which of the record's two views were present
+HAS_CHUNKS = 1
+HAS_DISTRIBUTION = 2
+
+# Chunk record flags
+LISTED = 1          # appears in the record's 'chunks' list
+LOCATED = 2         # has an entry in 'chunk_distribution'
+
+_HEADER = struct.Struct('<BII')                  # flags, records, strings
+_STRING = struct.Struct('<BI')                   # kind, length
+_CHUNK = struct.Struct('<BHqqqIIIIIIH')          # flags, fields, sequence, size, stored_size,
+                                                 # chunk_id, hash, digest, hash_algorithm, compression, extra, replicas
+_REPLICA = struct.Struct('<BIIIIiI')             # fields, node_id, chunk_file, pack, path, shard, extra
+
+# Strings are interned once per manifest; hex digests are kept as raw bytes
+_TEXT = 0
+_HEX = 1
+_HEX_DIGITS = set('0123456789abcdef')
+
+class Replica:
+    """One stored copy (or erasure-coded shard) of a chunk"""
+
+    __slots__ = ('node_id', 'chunk_file', 'pack', 'path', 'shard', 'extra')
+
+    STRINGS = ('node_id', 'chunk_file', 'pack', 'path')
+
+    def __init__(self, node_id=None, chunk_file=None, pack=None, path=None, shard=None, extra=None):
+        self.node_id = node_id
+        self.chunk_file = chunk_file
+        self.pack = pack
+        self.path = path
+        self.shard = shard
+        self.extra = extra
+
+    @classmethod
+    def from_location(cls, location: Dict[str, Any]) -> 'Replica':
+        replica = cls()
+        replica.extra = _split_fields(replica, location, cls.STRINGS, ('shard',))
+        return replica
+
+    def to_location(self) -> Dict[str, Any]:
+        return _join_fields(self, ('node_id', 'chunk_file', 'pack', 'path', 'shard'))
+
+class ChunkRecord:
+    """One chunk of a file: its position, sizes, digests, codec and replicas"""
+
+    __slots__ = ('flags', 'chunk_id', 'sequence', 'size', 'stored_size', 'hash', 'digest',
+                 'hash_algorithm', 'compression', 'extra', 'replicas')
+
+    STRINGS = ('chunk_id', 'hash', 'digest', 'hash_algorithm', 'compression')
+    INTEGERS = ('sequence', 'size', 'stored_size')
+
+    def __init__(self, flags: int = 0):
+        self.flags = flags
+        self.chunk_id = self.sequence = self.size = self.stored_size = None
+        self.hash = self.digest = self.hash_algorithm = self.compression = None
+        self.extra = None
+        self.replicas = []
+
+    @classmethod
+    def from_chunk(cls, chunk: Dict[str, Any]) -> 'ChunkRecord':
+        record = cls(LISTED)
+        record.extra = _split_fields(record, chunk, cls.STRINGS, cls.INTEGERS)
+        return record
+
+    def to_chunk(self) -> Dict[str, Any]:
+        return _join_fields(self, ('chunk_id', 'size', 'hash', 'hash_algorithm', 'sequence',
+                                   'compression', 'stored_size', 'digest'))
+
+class ChunkManifest:
+    """Compact per-file chunk manifest, packed into a small binary blob.
+
+    Holds what metadata records keep as a 'chunks' list of dicts plus a
+    'chunk_distribution' map of replica locations, as __slots__ records
+    with interned strings. Its encoded size grows with the number of
+    chunks and replicas, never with the file's bytes.
+    """
+
+    def __init__(self, records: List[ChunkRecord] = None, flags: int = 0):
+        self.records = records or []
+        self.flags = flags
+
+    @classmethod
+    def from_record(cls, chunks: Optional[List[Dict[str, Any]]],
+                    chunk_distribution: Optional[Dict[str, List[Dict[str, Any]]]]) -> 'ChunkManifest':
+        """Build a manifest from a record's 'chunks' list and 'chunk_distribution' map (either may be None)"""
+        manifest = cls()
+        by_id = {}
+        if chunks is not None:
+            manifest.flags |= HAS_CHUNKS
+            for chunk in chunks:
+                record = ChunkRecord.from_chunk(chunk)
+                manifest.records.append(record)
+                by_id.setdefault(record.chunk_id, record)
+
+        if chunk_distribution is not None:
+            manifest.flags |= HAS_DISTRIBUTION
+            for chunk_id, locations in chunk_distribution.items():
+                record = by_id.get(chunk_id)
+                if record is None:
+                    # Located but not listed: keep it so the distribution round-trips
+                    record = ChunkRecord()
+                    record.chunk_id = chunk_id
+                    manifest.records.append(record)
+                    by_id[chunk_id] = record
+                record.flags |= LOCATED
+                record.replicas = [Replica.from_location(location) for location in locations]
+        return manifest
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[ChunkRecord]:
+        return iter(self.records)
+
+    def chunks(self) -> Optional[List[Dict[str, Any]]]:
+        """The record's 'chunks' list, or None if it had none"""
+        if not self.flags & HAS_CHUNKS:
+            return None
+        return [record.to_chunk() for record in self.records if record.flags & LISTED]
+
+    def distribution(self) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        """The record's 'chunk_distribution' map, or None if it had none"""
+        if not self.flags & HAS_DISTRIBUTION:
+            return None
+        return {record.chunk_id: [replica.to_location() for replica in record.replicas]
+                for record in self.records if record.flags & LOCATED}
+
+    def chunk_count(self) -> Optional[int]:
+        """Number of listed chunks, or None if the record had no chunk list"""
+        if not self.flags & HAS_CHUNKS:
+            return None
+        return sum(1 for record in self.records if record.flags & LISTED)
+
+    def add_replica(self, chunk_id: str, location: Dict[str, Any]) -> int:
+        """Append a replica location to a chunk; returns its position"""
+        for record in self.records:
+            if record.chunk_id == chunk_id:
+                break
+        else:
+            record = ChunkRecord()
+            record.chunk_id = chunk_id
+            self.records.append(record)
+        self.flags |= HAS_DISTRIBUTION
+        record.flags |= LOCATED
+        record.replicas.append(Replica.from_location(location))
+        return len(record.replicas) - 1
+
+    def encode(self) -> bytes:
+        """Pack into the binary form: interned string table, then fixed-size chunk and replica structs"""
+        strings = _StringTable()
+        body = bytearray()
+        for record in self.records:
+            fields, values = _field_mask(record, ChunkRecord.INTEGERS + ChunkRecord.STRINGS)
+            body += _CHUNK.pack(
+                record.flags, fields,
+                *(values[name] or 0 for name in ChunkRecord.INTEGERS),
+                *(strings.add(values[name]) for name in ChunkRecord.STRINGS),
+                strings.add(_dump_extra(record.extra)), len(record.replicas)
+            )
+            for replica in record.replicas:
+                fields, values = _field_mask(replica, Replica.STRINGS + ('shard',))
+                body += _REPLICA.pack(
+                    fields, *(strings.add(values[name]) for name in Replica.STRINGS),
+                    values['shard'] if values['shard'] is not None else -1,
+                    strings.add(_dump_extra(replica.extra))
+                )
+        header = _HEADER.pack(self.flags, len(self.records), len(strings))
+        return MAGIC + zlib.compress(header + strings.encode() + bytes(body))
+
+    @classmethod
+    def decode(cls, blob: bytes) -> 'ChunkManifest':
+        """Unpack a manifest produced by encode()"""
+        if blob[:len(MAGIC)] != MAGIC:
+            raise ValueError('Not a chunk manifest')
+        data = memoryview(zlib.decompress(blob[len(MAGIC):]))
+        flags, record_count, string_count = _HEADER.unpack_from(data, 0)
+        offset = _HEADER.size
+
+        strings = [None]
+        for _ in range(string_count):
+            kind, length = _STRING.unpack_from(data, offset)
+            offset += _STRING.size
+            raw = bytes(data[offset:offset + length])
+            offset += length
+            strings.append(raw.hex() if kind == _HEX else raw.decode('utf-8'))
+
+        records = []
+        for _ in range(record_count):
+            values = _CHUNK.unpack_from(data, offset)
+            offset += _CHUNK.size
+            record = ChunkRecord(values[0])
+            _set_fields(record, values[1], ChunkRecord.INTEGERS + ChunkRecord.STRINGS,
+                        values[2:5] + tuple(strings[index] for index in values[5:10]))
+            record.extra = _load_extra(strings[values[10]])
+
+            for _ in range(values[11]):
+                replica_values = _REPLICA.unpack_from(data, offset)
+                offset += _REPLICA.size
+                replica = Replica()
+                _set_fields(replica, replica_values[0], Replica.STRINGS + ('shard',),
+                            tuple(strings[index] for index in replica_values[1:5]) + (replica_values[5],))
+                replica.extra = _load_extra(strings[replica_values[6]])
+                record.replicas.append(replica)
+            records.append(record)
+        return cls(records, flags)
+
+class _StringTable:
+    """Interned strings of a manifest being encoded; index 0 means absent"""
+
+    def __init__(self):
+        self._index = {}
+        self._entries = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return 0
+        index = self._index.get(value)
+        if index is None:
+            self._entries.append(value)
+            index = self._index[value] = len(self._entries)
+        return index
+
+    def encode(self) -> bytes:
+        out = bytearray()
+        for value in self._entries:
+            if len(value) % 2 == 0 and len(value) >= 16 and set(value) <= _HEX_DIGITS:
+                kind, raw = _HEX, bytes.fromhex(value)
+            else:
+                kind, raw = _TEXT, value.encode('utf-8')
+            out += _STRING.pack(kind, len(raw)) + raw
+        return bytes(out)
+
+def _split_fields(target, source: Dict[str, Any], strings: tuple, integers: tuple) -> Optional[Dict[str, Any]]:
+    """Copy typed fields of a dict onto slots; returns the remaining keys (or None)"""
+    extra = {}
+    for key, value in source.items():
+        if key in strings and isinstance(value, str):
+            setattr(target, key, value)
+        elif key in integers and isinstance(value, int) and not isinstance(value, bool):
+            setattr(target, key, value)
+        else:
+            extra[key] = value
+    return extra or None
+
+def _join_fields(source, order: tuple) -> Dict[str, Any]:
+    """Rebuild a dict from the slots that are set, plus the extra keys"""
+    result = {}
+    for name in order:
+        value = getattr(source, name)
+        if value is not None:
+            result[name] = value
+    if source.extra:
+        result.update(source.extra)
+    return result
+
+def _field_mask(source, names: tuple) -> tuple:
+    """Bit mask of the set slots, and their values"""
+    values = {name: getattr(source, name) for name in names}
+    mask = 0
+    for bit, name in enumerate(names):
+        if values[name] is not None:
+            mask |= 1 << bit
+    return mask, values
+
+def _set_fields(target, mask: int, names: tuple, values: tuple):
+    for bit, (name, value) in enumerate(zip(names, values)):
+        if mask & (1 << bit):
+            setattr(target, name, value)
+
+def _dump_extra(extra: Optional[Dict[str, Any]]) -> Optional[str]:
+    return json.dumps(extra, default=str, sort_keys=True) if extra else None
+
+def _load_extra(text: Optional[str]) -> Optional[Dict[str, Any]]:
+    return json.loads(text) if text else None
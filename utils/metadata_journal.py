@@ -0,0 +1,296 @@
+import gc
+import os
+import zlib
+import time
+import pickle
+import struct
+import threading
+from typing import List, Dict, Any, Tuple
+
+# Record header: payload length, payload crc32, sequence number
+_RECORD = struct.Struct('<IIQ')
+
+_PUT = 0
+_DELETE = 1
+
+class MetadataJournal:
+    """Append-only journal of metadata mutations with compacted snapshots.
+
+    State is a set of tables of key -> value, held in memory. Every put or
+    delete is appended to the current journal segment; commit() makes
+    everything appended so far durable, and callers committing at the same
+    time share one fsync (group commit). Every snapshot_every records the
+    state is written to a snapshot in the background and older segments are
+    dropped, so opening the journal loads one snapshot and replays only the
+    records after it. A torn record at the end of the journal (a crash
+    mid-append) is cut off during recovery.
+
+    Values are kept pickled in memory and decoded on read, which keeps
+    snapshots cheap to load and means callers always get their own copy.
+    """
+
+    def __init__(self, directory: str, snapshot_every: int = 100000):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        os.makedirs(directory, exist_ok=True)
+
+        self._cond = threading.Condition()
+        self._state = {}
+        self._pending = []          # encoded records not yet written
+        self._flushing = False      # someone is writing; also held while rotating segments
+        self._snapshotting = False
+        self._snapshot_lock = threading.Lock()
+        self.stats = {'appends': 0, 'commits': 0, 'fsyncs': 0, 'records_synced': 0,
+                      'snapshots': 0, 'recovered_records': 0, 'recovery_ms': 0.0}
+
+        started = time.perf_counter()
+        self._seq, replayed = self._recover()
+        self._durable_seq = self._seq
+        self._snapshot_seq = self._latest_snapshot_seq()
+        self.stats['recovered_records'] = replayed
+        self.stats['recovery_ms'] = round((time.perf_counter() - started) * 1000, 3)
+
+        self._segment_start = self._seq + 1
+        segments = self._segments()
+        if segments:
+            # Keep appending to the last segment
+            self._segment_start = segments[-1][0]
+        self._fd = os.open(self._segment_path(self._segment_start), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def put(self, table: str, key: str, value: Any) -> int:
+        """Set a key and journal the change; returns its sequence number"""
+        return self._append(_PUT, table, key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def delete(self, table: str, key: str) -> int:
+        """Remove a key and journal the change; returns its sequence number"""
+        return self._append(_DELETE, table, key, None)
+
+    def get(self, table: str, key: str, default: Any = None) -> Any:
+        with self._cond:
+            encoded = self._state.get(table, {}).get(key)
+        return default if encoded is None else pickle.loads(encoded)
+
+    def items(self, table: str) -> List[Tuple[str, Any]]:
+        with self._cond:
+            entries = list(self._state.get(table, {}).items())
+        return [(key, pickle.loads(encoded)) for key, encoded in entries]
+
+    def commit(self, seq: int = None):
+        """Block until every record up to seq (default: all so far) is on disk"""
+        with self._cond:
+            target = self._seq if seq is None else seq
+            self.stats['commits'] += 1
+            while self._durable_seq < target:
+                if not self._flushing:
+                    break
+                self._cond.wait()
+            else:
+                return
+            # Become the flusher for everything appended so far, not just our records
+            self._flushing = True
+            batch, self._pending = self._pending, []
+            upto = self._seq
+
+        try:
+            self._write(batch)
+        finally:
+            with self._cond:
+                self._flushing = False
+                self._durable_seq = max(self._durable_seq, upto)
+                self.stats['fsyncs'] += 1
+                self.stats['records_synced'] += len(batch)
+                self._cond.notify_all()
+
+    def snapshot(self):
+        """Write the current state to a snapshot and drop the journal segments it covers"""
+        with self._snapshot_lock:
+            self._snapshot()
+
+    def _snapshot(self):
+        with self._cond:
+            while self._flushing:
+                self._cond.wait()
+            self._flushing = True
+            batch, self._pending = self._pending, []
+            upto = self._seq
+            state = {table: dict(entries) for table, entries in self._state.items()}
+
+        try:
+            # Finish the current segment and start a new one at the snapshot boundary
+            self._write(batch)
+            os.close(self._fd)
+            self._segment_start = upto + 1
+            self._fd = os.open(self._segment_path(self._segment_start), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        finally:
+            with self._cond:
+                self._flushing = False
+                self._durable_seq = max(self._durable_seq, upto)
+                self._cond.notify_all()
+
+        path = self._snapshot_path(upto)
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump({'seq': upto, 'state': state}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        self._sync_directory()
+
+        for start, segment_path in self._segments():
+            if start <= upto:
+                os.remove(segment_path)
+        for seq, snapshot_path in self._snapshots():
+            if seq < upto:
+                os.remove(snapshot_path)
+
+        with self._cond:
+            self._snapshot_seq = upto
+            self.stats['snapshots'] += 1
+
+    def reset(self):
+        """Forget all state, on disk too"""
+        with self._cond:
+            while self._flushing:
+                self._cond.wait()
+            self._state = {}
+            self._pending = []
+        self.snapshot()
+
+    def close(self):
+        self.commit()
+        os.close(self._fd)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Journal counters, with how many records each fsync covered on average"""
+        with self._cond:
+            stats = dict(self.stats)
+            stats['sequence'] = self._seq
+            stats['durable_sequence'] = self._durable_seq
+            stats['records_since_snapshot'] = self._seq - self._snapshot_seq
+            stats['keys'] = sum(len(entries) for entries in self._state.values())
+        stats['records_per_fsync'] = round(stats['records_synced'] / stats['fsyncs'], 2) if stats['fsyncs'] else 0.0
+        return stats
+
+    def _append(self, op: int, table: str, key: str, value: bytes) -> int:
+        payload = pickle.dumps((op, table, key, value), protocol=pickle.HIGHEST_PROTOCOL)
+        with self._cond:
+            self._seq += 1
+            self._pending.append(_RECORD.pack(len(payload), zlib.crc32(payload), self._seq) + payload)
+            self._apply(op, table, key, value)
+            self.stats['appends'] += 1
+            seq = self._seq
+            start_snapshot = (not self._snapshotting and
+                              self._seq - self._snapshot_seq >= self.snapshot_every)
+            if start_snapshot:
+                self._snapshotting = True
+
+        if start_snapshot:
+            threading.Thread(target=self._background_snapshot, daemon=True).start()
+        return seq
+
+    def _background_snapshot(self):
+        try:
+            self.snapshot()
+        finally:
+            with self._cond:
+                self._snapshotting = False
+
+    def _apply(self, op: int, table: str, key: str, value: bytes):
+        if op == _PUT:
+            self._state.setdefault(table, {})[key] = value
+        else:
+            self._state.get(table, {}).pop(key, None)
+
+    def _write(self, batch: List[bytes]):
+        """Append encoded records to the current segment and fsync it"""
+        if batch:
+            os.write(self._fd, b''.join(batch))
+        os.fsync(self._fd)
+
+    def _recover(self) -> Tuple[int, int]:
+        """Load the newest snapshot and replay later records; returns (last sequence, records replayed)"""
+        seq = 0
+        for snapshot_seq, path in reversed(self._snapshots()):
+            try:
+                with open(path, 'rb') as f:
+                    # Skip GC passes over the freshly built objects while loading
+                    gc_enabled = gc.isenabled()
+                    gc.disable()
+                    try:
+                        snapshot = pickle.load(f)
+                    finally:
+                        if gc_enabled:
+                            gc.enable()
+            except (OSError, EOFError, pickle.UnpicklingError):
+                continue
+            self._state = snapshot['state']
+            seq = snapshot['seq']
+            break
+
+        replayed = 0
+        segments = self._segments()
+        for index, (start, path) in enumerate(segments):
+            with open(path, 'rb') as f:
+                data = f.read()
+            offset = 0
+            while offset < len(data):
+                if offset + _RECORD.size > len(data):
+                    break
+                length, crc, record_seq = _RECORD.unpack_from(data, offset)
+                payload = data[offset + _RECORD.size:offset + _RECORD.size + length]
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+                offset += _RECORD.size + length
+                if record_seq <= seq:
+                    continue
+                self._apply(*pickle.loads(payload))
+                seq = record_seq
+                replayed += 1
+
+            if offset < len(data):
+                # Torn tail: drop it and anything after it
+                with open(path, 'r+b') as f:
+                    f.truncate(offset)
+                for _, later_path in segments[index + 1:]:
+                    os.remove(later_path)
+                break
+        return seq, replayed
+
+    def _latest_snapshot_seq(self) -> int:
+        snapshots = self._snapshots()
+        return snapshots[-1][0] if snapshots else 0
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        return self._listing('journal-', '.log')
+
+    def _snapshots(self) -> List[Tuple[int, str]]:
+        return self._listing('snapshot-', '.pkl')
+
+    def _listing(self, prefix: str, suffix: str) -> List[Tuple[int, str]]:
+        """(sequence, path) of the files named prefix<sequence>suffix, in order"""
+        found = []
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and name.endswith(suffix):
+                try:
+                    found.append((int(name[len(prefix):-len(suffix)]), os.path.join(self.directory, name)))
+                except ValueError:
+                    continue
+        return sorted(found)
+
+    def _segment_path(self, start: int) -> str:
+        return os.path.join(self.directory, f'journal-{start:016d}.log')
+
+    def _snapshot_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f'snapshot-{seq:016d}.pkl')
+
+    def _sync_directory(self):
+        """Make renames in the journal directory durable, where the platform allows it"""
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
@@ -0,0 +1,269 @@
+import sys
+import json
+import sqlite3
+import threading
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+from .manifest import ChunkManifest, LISTED
+
+# Columns of the files table; every other field of a record is kept in 'attributes'
+FILE_COLUMNS = ['filename', 'owner', 'file_size', 'upload_time', 'checksum']
+
+class MetadataStore:
+    """File catalog in SQLite (WAL): files, their chunks and the chunk locations.
+
+    Records go in and come out in the same shape the JSON metadata files
+    used. A file's 'chunks' and 'chunk_distribution' are kept together as
+    one compact ChunkManifest blob, decoded only when a caller asks for
+    them; the chunks and chunk_locations tables index digests and nodes.
+    Writing one file costs O(its chunks) instead of rewriting the whole
+    catalog.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('PRAGMA foreign_keys=ON')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS files (
+            file_id TEXT PRIMARY KEY,
+            filename TEXT,
+            owner TEXT,
+            file_size INTEGER,
+            upload_time TEXT,
+            checksum TEXT,
+            chunk_count INTEGER,
+            manifest BLOB,
+            attributes TEXT NOT NULL
+        )''')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS chunks (
+            file_id TEXT NOT NULL REFERENCES files (file_id) ON DELETE CASCADE,
+            chunk_id TEXT NOT NULL,
+            sequence INTEGER,
+            digest TEXT,
+            PRIMARY KEY (file_id, chunk_id)
+        )''')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS chunk_locations (
+            file_id TEXT NOT NULL REFERENCES files (file_id) ON DELETE CASCADE,
+            chunk_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            node_id TEXT NOT NULL,
+            PRIMARY KEY (file_id, chunk_id, position)
+        )''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS files_by_owner ON files (owner)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS files_by_upload_time ON files (upload_time)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS chunks_by_digest ON chunks (digest)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS locations_by_node ON chunk_locations (node_id)')
+        self._db.commit()
+
+    def put_file(self, file_id: str, record: Dict[str, Any]):
+        """Insert or replace one file record in a single transaction"""
+        self.put_files({file_id: record})
+
+    def put_files(self, records: Dict[str, Dict[str, Any]]):
+        """Insert or replace several file records in a single transaction"""
+        with self._lock, self._db:
+            for file_id, record in records.items():
+                self._write(file_id, record)
+
+    def get_file(self, file_id: str, with_chunks: bool = True) -> Optional[Dict[str, Any]]:
+        """A file record, or None if there is no such file"""
+        with self._lock:
+            row = self._db.execute('SELECT * FROM files WHERE file_id = ?', (file_id,)).fetchone()
+        return None if row is None else self._read(row, with_chunks)
+
+    def get_manifest(self, file_id: str) -> Optional[ChunkManifest]:
+        """A file's chunk manifest, or None if it has no chunks"""
+        with self._lock:
+            row = self._db.execute('SELECT manifest FROM files WHERE file_id = ?', (file_id,)).fetchone()
+        return ChunkManifest.decode(row[0]) if row and row[0] is not None else None
+
+    def contains(self, file_id: str) -> bool:
+        with self._lock:
+            return self._db.execute('SELECT 1 FROM files WHERE file_id = ?', (file_id,)).fetchone() is not None
+
+    def delete_file(self, file_id: str, owner: str = None) -> Optional[Dict[str, Any]]:
+        """Remove a file (only if owned by owner, when given) and return its record"""
+        with self._lock, self._db:
+            row = self._db.execute('SELECT * FROM files WHERE file_id = ?', (file_id,)).fetchone()
+            if row is None or (owner is not None and row[2] != owner):
+                return None
+            self._db.execute('DELETE FROM files WHERE file_id = ?', (file_id,))
+        return self._read(row)
+
+    def update_file(self, file_id: str, **fields) -> bool:
+        """Change some top-level fields of a record without rewriting its chunks"""
+        if 'chunks' in fields or 'chunk_distribution' in fields:
+            raise ValueError("Chunks change through put_file or add_location")
+        with self._lock, self._db:
+            row = self._db.execute('SELECT attributes FROM files WHERE file_id = ?', (file_id,)).fetchone()
+            if row is None:
+                return False
+            attributes = json.loads(row[0])
+            for name, value in fields.items():
+                if name in FILE_COLUMNS:
+                    self._db.execute(f'UPDATE files SET {name} = ? WHERE file_id = ?', (value, file_id))
+                else:
+                    attributes[name] = value
+            self._db.execute('UPDATE files SET attributes = ? WHERE file_id = ?',
+                             (json.dumps(attributes, default=str), file_id))
+            return True
+
+    def increment(self, file_id: str, field: str, amount: int = 1, **fields) -> bool:
+        """Atomically add to a numeric field (e.g. a download counter), optionally setting others"""
+        with self._lock, self._db:
+            row = self._db.execute('SELECT attributes FROM files WHERE file_id = ?', (file_id,)).fetchone()
+            if row is None:
+                return False
+            attributes = json.loads(row[0])
+            attributes[field] = (attributes.get(field) or 0) + amount
+            attributes.update(fields)
+            self._db.execute('UPDATE files SET attributes = ? WHERE file_id = ?',
+                             (json.dumps(attributes, default=str), file_id))
+            return True
+
+    def add_location(self, file_id: str, chunk_id: str, location: Dict[str, Any]) -> bool:
+        """Record one more stored copy of a file's chunk"""
+        with self._lock, self._db:
+            row = self._db.execute('SELECT manifest FROM files WHERE file_id = ?', (file_id,)).fetchone()
+            if row is None:
+                return False
+            manifest = ChunkManifest.decode(row[0]) if row[0] is not None else ChunkManifest()
+            position = manifest.add_replica(chunk_id, location)
+            self._db.execute('UPDATE files SET manifest = ? WHERE file_id = ?', (manifest.encode(), file_id))
+            self._db.execute('INSERT INTO chunk_locations VALUES (?, ?, ?, ?)',
+                             (file_id, chunk_id, position, location['node_id']))
+            return True
+
+    def iter_files(self, owner: str = None, with_chunks: bool = True) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """(file_id, record) for every file, or every file of owner, oldest upload first"""
+        with self._lock:
+            if owner is None:
+                rows = self._db.execute('SELECT * FROM files ORDER BY upload_time').fetchall()
+            else:
+                rows = self._db.execute('SELECT * FROM files WHERE owner = ? ORDER BY upload_time',
+                                        (owner,)).fetchall()
+        for row in rows:
+            yield row[0], self._read(row, with_chunks)
+
+    def list_files(self, owner: str = None, with_chunks: bool = True) -> Dict[str, Dict[str, Any]]:
+        """All records (or those of owner) keyed by file id, like the old JSON metadata"""
+        return dict(self.iter_files(owner, with_chunks))
+
+    def recent_files(self, limit: int, with_chunks: bool = True) -> List[Tuple[str, Dict[str, Any]]]:
+        """The most recently uploaded files, oldest of them first"""
+        with self._lock:
+            rows = self._db.execute('SELECT * FROM files ORDER BY upload_time DESC LIMIT ?', (limit,)).fetchall()
+        return [(row[0], self._read(row, with_chunks)) for row in reversed(rows)]
+
+    def summary(self, owner: str = None) -> Dict[str, int]:
+        """File count and total bytes, without loading any records"""
+        with self._lock:
+            if owner is None:
+                count, size = self._db.execute('SELECT COUNT(*), COALESCE(SUM(file_size), 0) FROM files').fetchone()
+            else:
+                count, size = self._db.execute('SELECT COUNT(*), COALESCE(SUM(file_size), 0) FROM files WHERE owner = ?',
+                                               (owner,)).fetchone()
+        return {'files_count': count, 'storage_used': size}
+
+    def files_with_digest(self, digest: str) -> List[str]:
+        """Files that reference a chunk digest"""
+        with self._lock:
+            return [row[0] for row in self._db.execute('SELECT DISTINCT file_id FROM chunks WHERE digest = ?', (digest,))]
+
+    def clear(self):
+        """Forget every file"""
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM chunk_locations')
+            self._db.execute('DELETE FROM chunks')
+            self._db.execute('DELETE FROM files')
+
+    def import_json(self, path: str) -> int:
+        """Bring in a legacy metadata_<mode>.json file; returns how many records were imported"""
+        with open(path, 'r') as f:
+            records = json.load(f)
+        for record in records.values():
+            if isinstance(record.get('chunks'), list):
+                # Old records embedded each chunk's bytes, which live in the chunk files
+                record['chunks'] = [{k: v for k, v in chunk.items() if k != 'data'} for chunk in record['chunks']]
+        self.put_files(records)
+        return len(records)
+
+    def _write(self, file_id: str, record: Dict[str, Any]):
+        """Replace a file's rows; caller holds the lock inside a transaction"""
+        attributes = {k: v for k, v in record.items()
+                      if k not in FILE_COLUMNS and k not in ('chunks', 'chunk_distribution')}
+        chunks = record.get('chunks')
+        if not isinstance(chunks, list):
+            if 'chunks' in record:
+                # Flat files just count their chunks
+                attributes['chunks'] = chunks
+            chunks = None
+        chunk_distribution = record.get('chunk_distribution')
+
+        manifest = None
+        if chunks is not None or chunk_distribution is not None:
+            manifest = ChunkManifest.from_record(chunks, chunk_distribution)
+
+        self._db.execute('DELETE FROM files WHERE file_id = ?', (file_id,))
+        self._db.execute('INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+            file_id, *(record.get(column) for column in FILE_COLUMNS),
+            manifest.chunk_count() if manifest is not None else None,
+            manifest.encode() if manifest is not None else None,
+            json.dumps(attributes, default=str)
+        ))
+        if manifest is None:
+            return
+
+        self._db.executemany('INSERT INTO chunks VALUES (?, ?, ?, ?)', [
+            (file_id, chunk.chunk_id, chunk.sequence, chunk.digest or chunk.hash)
+            for chunk in manifest if chunk.flags & LISTED
+        ])
+        self._db.executemany('INSERT INTO chunk_locations VALUES (?, ?, ?, ?)', [
+            (file_id, chunk.chunk_id, position, replica.node_id)
+            for chunk in manifest for position, replica in enumerate(chunk.replicas)
+        ])
+
+    def _read(self, row: tuple, with_chunks: bool = True) -> Dict[str, Any]:
+        """Rebuild a record from its files row; without chunks, chunked files report their chunk count"""
+        chunk_count, manifest, attributes = row[6], row[7], row[8]
+        record = dict(zip(FILE_COLUMNS, row[1:6]))
+        record.update(json.loads(attributes))
+        if record.get('owner') is None:
+            del record['owner']
+        if manifest is None:
+            return record
+
+        if not with_chunks:
+            if chunk_count is not None:
+                record['chunks'] = chunk_count
+            return record
+
+        manifest = ChunkManifest.decode(manifest)
+        chunks = manifest.chunks()
+        if chunks is not None:
+            record['chunks'] = chunks
+        chunk_distribution = manifest.distribution()
+        if chunk_distribution is not None:
+            record['chunk_distribution'] = chunk_distribution
+        return record
+
+_metadata_stores = {}
+_metadata_stores_lock = threading.Lock()
+
+def open_metadata_store(path: str) -> MetadataStore:
+    """The shared MetadataStore for a database file"""
+    with _metadata_stores_lock:
+        if path not in _metadata_stores:
+            _metadata_stores[path] = MetadataStore(path)
+        return _metadata_stores[path]
+
+if __name__ == '__main__':
+    # python -m utils.metadata_store metadata_distributed.json metadata_distributed.db
+    if len(sys.argv) != 3:
+        print("Usage: python -m utils.metadata_store <metadata.json> <metadata.db>")
+        sys.exit(1)
+    imported = open_metadata_store(sys.argv[2]).import_json(sys.argv[1])
+    print(f"Imported {imported} file records into {sys.argv[2]}")
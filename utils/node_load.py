@@ -0,0 +1,70 @@
+import threading
+from typing import Dict, Any
+
+class NodeLoadTracker:
+    """Live write load per node: queued writes and a moving average of write latency"""
+
+    def __init__(self, smoothing: float = 0.2, failure_penalty: float = 0.5, base_latency: float = 0.001):
+        self.smoothing = smoothing
+        # A failed write counts as this slow, so a node refusing writes stops attracting them
+        self.failure_penalty = failure_penalty
+        # Added to every estimate so idle nodes are still told apart by queue depth
+        self.base_latency = base_latency
+
+        self._nodes = {}        # node_id -> {'pending', 'writes', 'failures', 'average'}
+        self._lock = threading.Lock()
+
+    def begin_write(self, node_id: str):
+        """A write was queued for a node"""
+        with self._lock:
+            self._node(node_id)['pending'] += 1
+
+    def end_write(self, node_id: str):
+        with self._lock:
+            self._node(node_id)['pending'] -= 1
+
+    def record(self, node_id: str, seconds: float, failed: bool = False):
+        """Fold one completed write into the node's moving average"""
+        if failed:
+            seconds = max(seconds, self.failure_penalty)
+        with self._lock:
+            node = self._node(node_id)
+            node['average'] = seconds if not node['writes'] else node['average'] + self.smoothing * (seconds - node['average'])
+            node['writes'] += 1
+            node['failures'] += failed
+
+    def cost(self, node: Dict[str, Any]) -> float:
+        """Expected time for a node to take one more write, inflated as it fills up.
+
+        Latency times the writes already queued ahead of it, divided by the
+        free fraction of its 'storage_limit' when it has one.
+        """
+        with self._lock:
+            state = self._nodes.get(node['node_id'])
+            average, pending = (state['average'], state['pending']) if state else (0.0, 0)
+        cost = (average + self.base_latency) * (1 + pending)
+
+        limit = node.get('storage_limit')
+        if limit:
+            free = 1 - node.get('storage_used', 0) / limit
+            cost /= max(free, 1e-6)
+        return cost
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-node queued writes, write counts and average write latency in milliseconds"""
+        with self._lock:
+            return {node_id: {
+                'pending': node['pending'],
+                'writes': node['writes'],
+                'failures': node['failures'],
+                'average_ms': round(node['average'] * 1000, 3)
+            } for node_id, node in self._nodes.items()}
+
+    def _node(self, node_id: str) -> Dict[str, Any]:
+        node = self._nodes.get(node_id)
+        if node is None:
+            node = self._nodes[node_id] = {'pending': 0, 'writes': 0, 'failures': 0, 'average': 0.0}
+        return node
+
+# Shared by the distribution layer, which records writes, and load-aware placement
+node_load = NodeLoadTracker()
@@ -0,0 +1,258 @@
+import math
+import time
+import threading
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+from .logging_utils import secure_logger
+
+ACTIVE = 'active'
+SUSPECT = 'suspect'
+FAILED = 'failed'
+
+class PhiAccrualDetector:
+    """Suspicion level (phi) of one node from the arrival times of its heartbeats.
+
+    Heartbeat intervals are modelled as a normal distribution over a
+    sliding window; phi is -log10 of the probability that a heartbeat
+    would still be this late, so phi 1 means a 10% chance the node is
+    fine, phi 8 about one in a hundred million. acceptable_pause is added
+    to the expected interval to tolerate short stalls.
+    """
+
+    def __init__(self, window: int = 200, min_std: float = 0.25, acceptable_pause: float = 2.0,
+                 first_interval: float = 1.0):
+        self.min_std = min_std
+        self.acceptable_pause = acceptable_pause
+        self._intervals = deque(maxlen=window)
+        self._sum = 0.0
+        self._squares = 0.0
+        self._last = None
+        # Until real intervals arrive, assume the configured heartbeat interval
+        self._add(first_interval)
+
+    def heartbeat(self, now: float):
+        if self._last is not None:
+            self._add(now - self._last)
+        self._last = now
+
+    def phi(self, now: float) -> float:
+        if self._last is None:
+            return 0.0
+        count = len(self._intervals)
+        mean = self._sum / count
+        std = max(self.min_std, math.sqrt(max(0.0, self._squares / count - mean * mean)))
+        # Logistic approximation of the normal CDF, as in Akka's detector, in the
+        # form log10(1 + e^z) so long-silent nodes do not underflow it
+        y = (now - self._last - mean - self.acceptable_pause) / std
+        z = y * (1.5976 + 0.070566 * y * y)
+        return math.log10(1.0 + math.exp(z)) if z < 30 else z / math.log(10)
+
+    def _add(self, interval: float):
+        if len(self._intervals) == self._intervals.maxlen:
+            old = self._intervals[0]
+            self._sum -= old
+            self._squares -= old * old
+        self._intervals.append(interval)
+        self._sum += interval
+        self._squares += interval * interval
+
+class NodeRegistry:
+    """Storage nodes and their health, held in memory and persisted through the metadata journal.
+
+    Heartbeats (pushed by nodes, or gathered by the monitor's probes) feed a
+    phi-accrual detector per node. A node whose phi crosses suspect_phi is
+    suspect: it takes no new writes, but its copies still count. One that
+    crosses failed_phi is failed. Any heartbeat makes it active again.
+    Every transition is journaled and published to subscribers as an event.
+    """
+
+    def __init__(self, journal, node_ids: List[str], attributes: Dict[str, Dict[str, Any]] = None,
+                 suspect_phi: float = 3.0, failed_phi: float = 8.0, heartbeat_interval: float = 1.0, **detector):
+        self.journal = journal
+        self.suspect_phi = suspect_phi
+        self.failed_phi = failed_phi
+        self.heartbeat_interval = heartbeat_interval
+
+        self._lock = threading.Lock()
+        # Held from a transition until its subscribers have run, so events reach them in order
+        self._publish_lock = threading.Lock()
+        self._nodes = {}
+        self._detectors = {}
+        self._subscribers = []
+        self._events = deque(maxlen=500)
+        self._event_seq = 0
+        self._monitor = None
+        self._stopping = threading.Event()
+        self.errors = 0
+
+        now = time.monotonic()
+        for node_id in node_ids:
+            saved = journal.get('nodes', node_id, {})
+            self._nodes[node_id] = {
+                'node_id': node_id,
+                'status': saved.get('status', ACTIVE),
+                'files_count': saved.get('files_count', 0),
+                'storage_used': saved.get('storage_used', 0),
+                'last_heartbeat': saved.get('last_heartbeat'),
+                **(attributes or {}).get(node_id, {})
+            }
+            # Start the clock now, so a node that never reports in is found out
+            self._detectors[node_id] = PhiAccrualDetector(first_interval=heartbeat_interval, **detector)
+            self._detectors[node_id].heartbeat(now)
+
+    def nodes(self) -> List[Dict[str, Any]]:
+        """Copies of every node's state, with its current phi"""
+        now = time.monotonic()
+        with self._lock:
+            return [{**node, 'phi': round(self._detectors[node_id].phi(now), 3)}
+                    for node_id, node in self._nodes.items()]
+
+    def heartbeat(self, node_id: str):
+        """A node showed it is alive"""
+        with self._publish_lock:
+            with self._lock:
+                if node_id not in self._nodes:
+                    raise KeyError(node_id)
+                self._detectors[node_id].heartbeat(time.monotonic())
+                node = self._nodes[node_id]
+                node['last_heartbeat'] = datetime.now().isoformat()
+                event = self._transition(node, ACTIVE, 0.0) if node['status'] != ACTIVE else None
+            self._publish(event)
+
+    def check(self):
+        """Move nodes whose heartbeats are overdue to suspect or failed"""
+        with self._publish_lock:
+            now = time.monotonic()
+            events = []
+            with self._lock:
+                for node_id, node in self._nodes.items():
+                    phi = self._detectors[node_id].phi(now)
+                    if phi >= self.failed_phi and node['status'] != FAILED:
+                        events.append(self._transition(node, FAILED, phi))
+                    elif self.suspect_phi <= phi < self.failed_phi and node['status'] == ACTIVE:
+                        events.append(self._transition(node, SUSPECT, phi))
+            for event in events:
+                self._publish(event)
+
+    def record_usage(self, usage: Dict[str, Tuple[int, int]]):
+        """Add (files, bytes) written to each node to its counters, and journal them"""
+        if not usage:
+            return
+        with self._lock:
+            # Applied as increments, so concurrent uploads and repairs do not overwrite each other
+            for node_id, (files, size) in usage.items():
+                node = self._nodes.get(node_id)
+                if node is None:
+                    continue
+                node['files_count'] += files
+                node['storage_used'] += size
+                self._persist(node)
+        self.journal.commit()
+
+    def subscribe(self, callback: Callable[[Dict[str, Any]], None]):
+        """Call back with every status transition, in order"""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def events(self, since: int = 0) -> List[Dict[str, Any]]:
+        """Recent transitions with a sequence number above since"""
+        with self._lock:
+            return [event for event in self._events if event['seq'] > since]
+
+    def start_monitor(self, probe: Callable[[str], bool] = None):
+        """Check every heartbeat_interval; probe(node_id) -> bool gathers heartbeats from nodes that do not push them"""
+        pool = ThreadPoolExecutor(max_workers=max(1, len(self._nodes)), thread_name_prefix='node-probe')
+
+        def probe_all() -> bool:
+            """Heartbeat the nodes that answer; False once the interpreter is exiting and has shut the pool down"""
+            try:
+                # Probed in parallel so one hung node cannot delay the others' heartbeats
+                futures = {node_id: pool.submit(probe, node_id) for node_id in list(self._nodes)}
+            except RuntimeError:
+                return False
+            for node_id, future in futures.items():
+                try:
+                    alive = future.result()
+                except Exception:
+                    alive = False
+                if alive:
+                    self.heartbeat(node_id)
+            return True
+
+        def run():
+            while not self._stopping.wait(self.heartbeat_interval):
+                try:
+                    if probe is not None and not probe_all():
+                        return
+                    self.check()
+                except Exception as e:
+                    # Status would freeze for the life of the process if this thread died
+                    self._log_error('Node monitor pass failed', e)
+
+        self._monitor = threading.Thread(target=run, name='node-monitor', daemon=True)
+        self._monitor.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        nodes = self.nodes()
+        with self._lock:
+            last_event = self._event_seq
+        return {
+            'suspect_phi': self.suspect_phi,
+            'failed_phi': self.failed_phi,
+            'heartbeat_interval': self.heartbeat_interval,
+            'status': {status: [n['node_id'] for n in nodes if n['status'] == status] for status in (ACTIVE, SUSPECT, FAILED)},
+            'phi': {n['node_id']: n['phi'] for n in nodes},
+            'last_event': last_event,
+            'errors': self.errors
+        }
+
+    def _transition(self, node: Dict[str, Any], status: str, phi: float) -> Dict[str, Any]:
+        """Change a node's status under the lock; returns the event to publish once released"""
+        self._event_seq += 1
+        event = {
+            'seq': self._event_seq,
+            'node_id': node['node_id'],
+            'from': node['status'],
+            'to': status,
+            'phi': round(phi, 3),
+            'time': datetime.now().isoformat()
+        }
+        node['status'] = status
+        self._events.append(event)
+        self._persist(node)
+        return event
+
+    def _persist(self, node: Dict[str, Any]):
+        state = {
+            'status': node['status'],
+            'files_count': node['files_count'],
+            'storage_used': node['storage_used'],
+            'last_heartbeat': node['last_heartbeat']
+        }
+        if self.journal.get('nodes', node['node_id']) != state:
+            self.journal.put('nodes', node['node_id'], state)
+
+    def _publish(self, event: Optional[Dict[str, Any]]):
+        if event is None:
+            return
+        # Status changes are made durable before anyone acts on them
+        self.journal.commit()
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            # A failing subscriber must not keep the event from the others
+            try:
+                callback(event)
+            except Exception as e:
+                self._log_error(f"Subscriber failed on {event['node_id']} {event['from']} -> {event['to']}", e)
+
+    def _log_error(self, message: str, exception: Optional[Exception]):
+        with self._lock:
+            self.errors += 1
+        secure_logger.log_error(message, 'node_registry', exception)
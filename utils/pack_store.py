@@ -0,0 +1,326 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, Any, Optional
+
+from .storage_node import open_node_cluster
+
+class PackStore:
+    """Append-only pack files: many small objects per segment file instead of one file each.
+
+    Every node appends to its own rolling segment. An SQLite index maps object
+    ids to (segment, offset, length); deleting an object only drops its index
+    row and compaction later rewrites segments that are mostly garbage.
+    Appends are not fsynced one by one: sync() flushes all dirty segments and
+    then commits the index, so a batch of writes costs one fsync per segment.
+    """
+
+    def __init__(self, root: str, segment_size: int = 128 * 1024 * 1024,
+                 max_object_size: int = 4 * 1024 * 1024, sync_bytes: int = 64 * 1024 * 1024):
+        self.root = root
+        self.segment_size = segment_size
+        self.max_object_size = max_object_size
+        self.sync_bytes = sync_bytes
+        os.makedirs(root, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, 'pack_index.db'), check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS segments (
+            segment INTEGER PRIMARY KEY AUTOINCREMENT,
+            node_id TEXT NOT NULL,
+            sealed INTEGER NOT NULL DEFAULT 0
+        )''')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS objects (
+            object_id TEXT PRIMARY KEY,
+            segment INTEGER NOT NULL,
+            offset INTEGER NOT NULL,
+            length INTEGER NOT NULL
+        )''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS objects_by_segment ON objects (segment)')
+        self._db.commit()
+
+        self._active = {}   # node_id -> segment currently appended to
+        self._writers = {}  # segment -> {'fd', 'size', 'pending', 'sealed'}
+        self._readers = {}  # segment -> {'fd', 'users', 'retired'}
+        self._dirty = set() # segments with writes awaiting fsync
+        self._unsynced_bytes = 0
+        self.stats = {'objects_written': 0, 'bytes_written': 0, 'syncs': 0, 'bytes_reclaimed': 0}
+
+    def segment_path(self, segment: int, node_id: str) -> str:
+        return os.path.join(self.root, node_id, f"{segment:08d}.pack")
+
+    def put(self, node_id: str, object_id: str, data: bytes) -> Dict[str, Any]:
+        """Append an object to the node's active segment"""
+        with self._lock:
+            segment, fd, offset = self._reserve(node_id, len(data))
+
+        # Space is reserved, so appends from several threads do not overlap
+        try:
+            os.pwrite(fd, data, offset)
+        except OSError:
+            with self._lock:
+                self._writers[segment]['pending'] -= 1
+            raise
+
+        with self._lock:
+            self._writers[segment]['pending'] -= 1
+            self._dirty.add(segment)
+            self._db.execute('INSERT OR REPLACE INTO objects (object_id, segment, offset, length) VALUES (?, ?, ?, ?)',
+                             (object_id, segment, offset, len(data)))
+            self._unsynced_bytes += len(data)
+            self.stats['objects_written'] += 1
+            self.stats['bytes_written'] += len(data)
+            if self._unsynced_bytes >= self.sync_bytes:
+                self._sync()
+
+        return {'node_id': node_id, 'chunk_file': object_id, 'pack': self.root}
+
+    def get(self, object_id: str) -> Optional[bytes]:
+        """Read an object, or None if it is not stored"""
+        with self._lock:
+            row = self._db.execute('SELECT segment, offset, length FROM objects WHERE object_id = ?',
+                                   (object_id,)).fetchone()
+            if row is None:
+                return None
+            segment, offset, length = row
+            fd = self._acquire_reader(segment)
+
+        try:
+            return os.pread(fd, length, offset)
+        finally:
+            with self._lock:
+                self._release_reader(segment)
+
+    def contains(self, object_id: str) -> bool:
+        with self._lock:
+            return self._db.execute('SELECT 1 FROM objects WHERE object_id = ?', (object_id,)).fetchone() is not None
+
+    def delete(self, object_id: str) -> bool:
+        """Forget an object; its bytes are reclaimed by the next compaction.
+
+        Like a put, the delete is durable after the next sync(), which commits the
+        index only once the segments it points into are flushed.
+        """
+        with self._lock:
+            return self._db.execute('DELETE FROM objects WHERE object_id = ?', (object_id,)).rowcount > 0
+
+    def sync(self):
+        """Make every write so far durable: fsync dirty segments, then commit the index"""
+        with self._lock:
+            self._sync()
+
+    def compact(self, garbage_ratio: float = 0.5) -> Dict[str, Any]:
+        """Rewrite segments where at least garbage_ratio of the bytes are deleted objects"""
+        with self._lock:
+            candidates = self._db.execute('SELECT segment, node_id FROM segments').fetchall()
+
+        compacted = 0
+        reclaimed = 0
+        for segment, node_id in candidates:
+            # Read per segment: compacting an earlier one may have copied live objects into this one
+            with self._lock:
+                sealed, live_bytes = self._db.execute('''SELECT s.sealed, COALESCE(SUM(o.length), 0)
+                    FROM segments s LEFT JOIN objects o ON o.segment = s.segment
+                    WHERE s.segment = ?''', (segment,)).fetchone()
+            path = self.segment_path(segment, node_id)
+            total_bytes = os.path.getsize(path) if os.path.exists(path) else 0
+            if not total_bytes or live_bytes > total_bytes * (1 - garbage_ratio):
+                continue
+
+            with self._lock:
+                if not sealed:
+                    # Seal the node's current segment so live objects and new appends go elsewhere
+                    self._db.execute('UPDATE segments SET sealed = 1 WHERE segment = ?', (segment,))
+                    if self._active.get(node_id) == segment:
+                        self._writers[segment]['sealed'] = True
+                        self._dirty.add(segment)
+                        del self._active[node_id]
+                    self._sync()
+
+                # Segments with appends still in flight are left for the next run
+                if segment in self._writers:
+                    continue
+                rows = self._db.execute('SELECT object_id, offset, length FROM objects WHERE segment = ?',
+                                        (segment,)).fetchall()
+                fd = self._acquire_reader(segment)
+
+            # Live objects are copied into the node's active segment without the lock, so puts and
+            # gets carry on; it is only taken to reserve space and to swap each index row
+            copied = 0
+            try:
+                for object_id, offset, length in rows:
+                    data = os.pread(fd, length, offset)
+                    with self._lock:
+                        new_segment, write_fd, new_offset = self._reserve(node_id, length)
+                    try:
+                        os.pwrite(write_fd, data, new_offset)
+                    finally:
+                        with self._lock:
+                            self._writers[new_segment]['pending'] -= 1
+                            self._dirty.add(new_segment)
+                    with self._lock:
+                        # Deleted or replaced while it was being copied: the copy is just garbage
+                        moved = self._db.execute(
+                            'UPDATE objects SET segment = ?, offset = ? WHERE object_id = ? AND segment = ? AND offset = ?',
+                            (new_segment, new_offset, object_id, segment, offset)).rowcount
+                        if moved:
+                            copied += length
+            finally:
+                with self._lock:
+                    self._release_reader(segment)
+
+            with self._lock:
+                self._db.execute('DELETE FROM segments WHERE segment = ?', (segment,))
+                self._sync()
+                self._retire_reader(segment)
+
+            if os.path.exists(path):
+                os.remove(path)
+            compacted += 1
+            reclaimed += total_bytes - copied
+
+        with self._lock:
+            self.stats['bytes_reclaimed'] += reclaimed
+        return {'segments_compacted': compacted, 'bytes_reclaimed': reclaimed}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Object and segment counts plus how much space compaction could reclaim"""
+        with self._lock:
+            objects, live_bytes = self._db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(length), 0) FROM objects').fetchone()
+            segments = self._db.execute('SELECT segment, node_id FROM segments').fetchall()
+            stats = dict(self.stats)
+
+        total_bytes = sum(os.path.getsize(self.segment_path(segment, node_id))
+                          for segment, node_id in segments if os.path.exists(self.segment_path(segment, node_id)))
+        return {
+            **stats,
+            'objects': objects,
+            'segments': len(segments),
+            'live_bytes': live_bytes,
+            'segment_bytes': total_bytes,
+            'garbage_bytes': max(0, total_bytes - live_bytes)
+        }
+
+    def _reserve(self, node_id: str, length: int) -> tuple:
+        """Claim space for an append, rolling over to a new segment when full; caller holds the lock"""
+        segment = self._active.get(node_id)
+        if segment is None:
+            segment = self._open_active_segment(node_id)
+        elif self._writers[segment]['size'] and self._writers[segment]['size'] + length > self.segment_size:
+            self._db.execute('UPDATE segments SET sealed = 1 WHERE segment = ?', (segment,))
+            # The fd stays open until pending appends land and the next sync flushes them
+            self._writers[segment]['sealed'] = True
+            self._dirty.add(segment)
+            segment = self._open_active_segment(node_id, new=True)
+
+        writer = self._writers[segment]
+        offset = writer['size']
+        writer['size'] += length
+        writer['pending'] += 1
+        return segment, writer['fd'], offset
+
+    def _open_active_segment(self, node_id: str, new: bool = False) -> int:
+        """Open the node's unsealed segment, creating one if needed; caller holds the lock"""
+        row = None
+        if not new:
+            row = self._db.execute('SELECT segment FROM segments WHERE node_id = ? AND sealed = 0',
+                                   (node_id,)).fetchone()
+        if row is None:
+            segment = self._db.execute('INSERT INTO segments (node_id) VALUES (?)', (node_id,)).lastrowid
+        else:
+            segment = row[0]
+
+        path = self.segment_path(segment, node_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o644)
+        # Bytes past the last indexed object (e.g. after a crash) are just garbage
+        self._writers[segment] = {'fd': fd, 'size': os.fstat(fd).st_size, 'pending': 0, 'sealed': False}
+        self._active[node_id] = segment
+        return segment
+
+    def _sync(self):
+        """fsync dirty segments, then commit the index; caller holds the lock"""
+        for segment in self._dirty:
+            os.fsync(self._writers[segment]['fd'])
+        self._dirty.clear()
+        self._db.commit()
+        self._unsynced_bytes = 0
+        self.stats['syncs'] += 1
+
+        # Sealed segments are done once their last append is flushed
+        for segment, writer in list(self._writers.items()):
+            if writer['sealed'] and writer['pending'] == 0:
+                os.close(writer['fd'])
+                del self._writers[segment]
+
+    def _acquire_reader(self, segment: int) -> int:
+        """Read fd for a segment, pinned until released; caller holds the lock"""
+        reader = self._readers.get(segment)
+        if reader is None:
+            node_id = self._db.execute('SELECT node_id FROM segments WHERE segment = ?', (segment,)).fetchone()[0]
+            reader = self._readers[segment] = {
+                'fd': os.open(self.segment_path(segment, node_id), os.O_RDONLY),
+                'users': 0,
+                'retired': False
+            }
+        reader['users'] += 1
+        return reader['fd']
+
+    def _release_reader(self, segment: int):
+        reader = self._readers[segment]
+        reader['users'] -= 1
+        if reader['retired'] and reader['users'] == 0:
+            os.close(reader['fd'])
+            del self._readers[segment]
+
+    def _retire_reader(self, segment: int):
+        """Close a compacted segment's read fd once no reader is using it"""
+        reader = self._readers.get(segment)
+        if reader is None:
+            return
+        reader['retired'] = True
+        if reader['users'] == 0:
+            os.close(reader['fd'])
+            del self._readers[segment]
+
+_pack_stores = {}
+_pack_stores_lock = threading.Lock()
+
+def open_pack_store(root: str, **options) -> PackStore:
+    """The shared PackStore for a directory; packed locations find their store through this"""
+    with _pack_stores_lock:
+        if root not in _pack_stores:
+            _pack_stores[root] = PackStore(root, **options)
+        return _pack_stores[root]
+
+# Locations are either loose files ({'path': ...}) or packed objects
+# ({'pack': root, 'chunk_file': object_id}); these helpers handle both.
+
+def object_exists(location: Dict[str, Any]) -> bool:
+    if 'nodes' in location:
+        return open_node_cluster(location['nodes']).contains(location['node_id'], location['chunk_file'])
+    if 'pack' in location:
+        return open_pack_store(location['pack']).contains(location['chunk_file'])
+    return os.path.exists(location['path'])
+
+def read_object(location: Dict[str, Any]) -> Optional[bytes]:
+    """Stored bytes of a replica or shard, or None if it is gone (OSError if its node is unreachable)"""
+    if 'nodes' in location:
+        return open_node_cluster(location['nodes']).get(location['node_id'], location['chunk_file'])
+    if 'pack' in location:
+        return open_pack_store(location['pack']).get(location['chunk_file'])
+    try:
+        with open(location['path'], 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def delete_object(location: Dict[str, Any]):
+    if 'nodes' in location:
+        open_node_cluster(location['nodes']).delete(location['node_id'], location['chunk_file'])
+    elif 'pack' in location:
+        open_pack_store(location['pack']).delete(location['chunk_file'])
+    elif os.path.exists(location['path']):
+        os.remove(location['path'])
@@ -0,0 +1,106 @@
+import math
+import random
+import hashlib
+from typing import List, Dict, Any
+
+from .node_load import NodeLoadTracker, node_load
+
+class RandomPlacement:
+    """Replicas on random nodes and shards round-robin from a random node; locations must be looked up"""
+
+    name = 'random'
+    deterministic = False
+
+    def select(self, key: str, nodes: List[Dict[str, Any]], count: int) -> List[Dict[str, Any]]:
+        """count distinct nodes for the replicas of a chunk"""
+        return random.sample(nodes, count)
+
+    def spread(self, key: str, nodes: List[Dict[str, Any]], count: int) -> List[Dict[str, Any]]:
+        """A node for each of count shards, each node holding as few as possible"""
+        offset = random.randrange(len(nodes))
+        return [nodes[(offset + i) % len(nodes)] for i in range(count)]
+
+class RendezvousPlacement:
+    """Weighted rendezvous (highest random weight) hashing of chunk keys onto nodes.
+
+    Every node gets a pseudo-random score for a key, scaled by its
+    'capacity' (relative weight, 1 by default), and the highest scores
+    win. Placement is therefore a pure function of the key and the set
+    of nodes: it can be computed without reading metadata, a node holds
+    a share of chunks proportional to its capacity, and adding or
+    removing a node only moves the chunks that node wins or loses
+    (about 1/N of them).
+    """
+
+    name = 'rendezvous'
+    deterministic = True
+
+    def rank(self, key: str, nodes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Nodes in order of preference for a key"""
+        return sorted(nodes, key=lambda node: self.score(key, node), reverse=True)
+
+    def select(self, key: str, nodes: List[Dict[str, Any]], count: int) -> List[Dict[str, Any]]:
+        return self.rank(key, nodes)[:count]
+
+    def spread(self, key: str, nodes: List[Dict[str, Any]], count: int) -> List[Dict[str, Any]]:
+        ranked = self.rank(key, nodes)
+        return [ranked[i % len(ranked)] for i in range(count)]
+
+    def score(self, key: str, node: Dict[str, Any]) -> float:
+        weight = node.get('capacity', 1.0)
+        if weight <= 0:
+            return 0.0
+        digest = hashlib.blake2b(f"{key}\0{node['node_id']}".encode(), digest_size=8).digest()
+        # Uniform in (0, 1); -weight / ln(u) makes each node win in proportion to its weight
+        u = (int.from_bytes(digest, 'big') + 0.5) / 2 ** 64
+        return -weight / math.log(u)
+
+class LoadAwarePlacement:
+    """Power-of-two-choices placement on live node load.
+
+    Each replica samples `choices` of the remaining nodes and takes the one
+    with the lowest cost (write latency average times queued writes, scaled
+    up as the node fills), so slow, busy or nearly full nodes get fewer
+    writes. Sampling rather than always taking the least loaded node keeps
+    a burst of uploads, which all see the same stale load, from piling onto
+    one node.
+    """
+
+    name = 'load_aware'
+    deterministic = False
+
+    def __init__(self, tracker: NodeLoadTracker, choices: int = 2, rng: random.Random = None):
+        self.tracker = tracker
+        self.choices = choices
+        self.rng = rng or random.Random()
+
+    def select(self, key: str, nodes: List[Dict[str, Any]], count: int) -> List[Dict[str, Any]]:
+        remaining = list(nodes)
+        selected = []
+        for _ in range(count):
+            candidates = remaining if len(remaining) <= self.choices else self.rng.sample(remaining, self.choices)
+            node = min(candidates, key=self.tracker.cost)
+            remaining.remove(node)
+            selected.append(node)
+        return selected
+
+    def spread(self, key: str, nodes: List[Dict[str, Any]], count: int) -> List[Dict[str, Any]]:
+        # Every shard of a chunk is needed, so deal them out cheapest node first
+        ranked = sorted(nodes, key=self.tracker.cost)
+        return [ranked[i % len(ranked)] for i in range(count)]
+
+PLACEMENT_POLICIES = {
+    'random': RandomPlacement(),
+    'rendezvous': RendezvousPlacement(),
+    'load_aware': LoadAwarePlacement(node_load)
+}
+
+def get_placement(name: str = 'random'):
+    """Placement policy by name"""
+    if name not in PLACEMENT_POLICIES:
+        raise ValueError(f"Unknown placement policy: {name}")
+    return PLACEMENT_POLICIES[name]
+
+def placement_key(chunk: Dict[str, Any]) -> str:
+    """What a chunk is placed by: its content digest, so identical chunks land on the same nodes"""
+    return chunk.get('digest') or chunk.get('hash') or chunk['chunk_id']
@@ -0,0 +1,68 @@
+import threading
+from collections import deque
+from typing import List, Dict, Any, Callable
+
+class NodeLatencyTracker:
+    """Recent read latency per node, used to order replicas and to decide when a read is slow enough to hedge"""
+
+    def __init__(self, window: int = 512, hedge_percentile: float = 95, smoothing: float = 0.2,
+                 min_samples: int = 20, default_hedge_delay: float = 0.05, min_hedge_delay: float = 0.002):
+        self.hedge_percentile = hedge_percentile
+        self.smoothing = smoothing
+        self.min_samples = min_samples
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+
+        self._samples = deque(maxlen=window)  # recent reads across all nodes
+        self._nodes = {}                      # node_id -> {'reads', 'average', 'slowest'}
+        self._lock = threading.Lock()
+
+    def record(self, node_id: str, seconds: float):
+        """Fold one completed read into the node's moving average"""
+        with self._lock:
+            self._samples.append(seconds)
+            node = self._nodes.get(node_id)
+            if node is None:
+                self._nodes[node_id] = {'reads': 1, 'average': seconds, 'slowest': seconds}
+                return
+            node['reads'] += 1
+            node['average'] += self.smoothing * (seconds - node['average'])
+            node['slowest'] = max(node['slowest'], seconds)
+
+    def estimate(self, node_id: str) -> float:
+        """Expected read latency of a node; nodes never read from count as fast so they get tried"""
+        with self._lock:
+            node = self._nodes.get(node_id)
+            return node['average'] if node else 0.0
+
+    def rank(self, locations: List[Dict[str, Any]], key: Callable[[Dict[str, Any]], Any] = None) -> List[Dict[str, Any]]:
+        """Locations ordered fastest node first, after an optional primary sort key"""
+        with self._lock:
+            averages = {node_id: node['average'] for node_id, node in self._nodes.items()}
+
+        def sort_key(location):
+            latency = averages.get(location['node_id'], 0.0)
+            return (key(location), latency) if key else latency
+
+        return sorted(locations, key=sort_key)
+
+    def hedge_delay(self) -> float:
+        """How long to wait on a read before asking another node: the configured percentile of recent reads"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return self.default_hedge_delay
+            samples = sorted(self._samples)
+
+        index = min(len(samples) - 1, int(len(samples) * self.hedge_percentile / 100))
+        return max(self.min_hedge_delay, samples[index])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-node read counts and latencies in milliseconds"""
+        hedge_delay = self.hedge_delay()
+        with self._lock:
+            nodes = {node_id: {
+                'reads': node['reads'],
+                'average_ms': round(node['average'] * 1000, 3),
+                'slowest_ms': round(node['slowest'] * 1000, 3)
+            } for node_id, node in self._nodes.items()}
+        return {'hedge_delay_ms': round(hedge_delay * 1000, 3), 'nodes': nodes}
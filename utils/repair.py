@@ -0,0 +1,180 @@
+import time
+import heapq
+import threading
+from collections import deque
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+class RepairScheduler:
+    """Background re-replication of degraded chunks, most at-risk first.
+
+    Chunks are queued by (file_id, chunk_id) and ordered by how many more
+    copies they can lose before becoming unreadable. Chunks on a node that
+    just failed wait out a grace period first, since the node may come
+    back. Scans are checked right away and bypass the index's view of a
+    chunk's health, since only reading the store finds objects gone missing.
+    A few workers run repair(file_id, chunk_id), which returns the bytes
+    it wrote. The bytes are paced to a bandwidth cap, and workers hold
+    off while foreground transfers are busy, for at most max_deferral
+    seconds at a time.
+    """
+
+    def __init__(self, repair: Callable[[str, str], int], health: Callable[[str, str], Optional[Dict[str, Any]]],
+                 replication_factor: int, workers: int = 2, bandwidth: float = 32 * 1024 * 1024,
+                 grace_period: float = 10.0, busy: Callable[[], bool] = None, max_deferral: float = 2.0):
+        self.repair = repair
+        self.health = health
+        self.replication_factor = replication_factor
+        self.bandwidth = bandwidth
+        self.grace_period = grace_period
+        self.busy = busy or (lambda: False)
+        self.max_deferral = max_deferral
+
+        self._cond = threading.Condition()
+        self._ready = []            # (margin, seq, file_id, chunk_id)
+        self._delayed = []          # (eligible at, seq, file_id, chunk_id)
+        self._queued = {}           # (file_id, chunk_id) -> when it is due; heap entries not matching are stale
+        self._verify = set()        # queued by a scan: checked against the store even if the index looks healthy
+        self._seq = 0
+        self._in_progress = 0
+        self._next_send = 0.0       # bandwidth pacing: when the next byte may go out
+        self._completed = deque(maxlen=256)     # completion times, for the repair rate
+        self._closed = False
+        self.stats = {'queued_total': 0, 'repaired': 0, 'skipped': 0, 'unrepairable': 0, 'failed': 0,
+                      'bytes_copied': 0, 'deferred_seconds': 0.0}
+
+        self._workers = [threading.Thread(target=self._work, name=f'repair-{i}', daemon=True) for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def enqueue(self, chunks: List[Tuple[str, str]], delay: float = 0.0, verify: bool = False):
+        """Queue chunks that may have lost copies; unless verifying, healthy ones are dropped when they come up"""
+        eligible_at = time.monotonic() + delay
+        with self._cond:
+            for item in chunks:
+                if verify:
+                    self._verify.add(item)
+                if item in self._queued and self._queued[item] <= eligible_at:
+                    continue
+                # New, or due sooner than already planned (a scan overtaking a grace period)
+                self._queued[item] = eligible_at
+                self._seq += 1
+                heapq.heappush(self._delayed, (eligible_at, self._seq, *item))
+                self.stats['queued_total'] += 1
+            self._cond.notify_all()
+
+    def node_failed(self, chunks: List[Tuple[str, str]]):
+        """Queue the chunks of a node that went down, after the grace period"""
+        self.enqueue(chunks, self.grace_period)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue sizes, outcomes, recent repair rate and the time left at that rate"""
+        now = time.monotonic()
+        with self._cond:
+            stats = dict(self.stats)
+            ready = len(self._ready)
+            delayed = len(self._queued) - ready
+            stats.update({'ready': ready, 'waiting_grace': delayed, 'in_progress': self._in_progress,
+                          'most_at_risk_margin': self._ready[0][0] if self._ready else None})
+            recent = [t for t in self._completed if now - t <= 60]
+        window = now - recent[0] if len(recent) > 1 else 0
+        rate = (len(recent) - 1) / window if window > 0 else 0.0
+        remaining = ready + delayed + stats['in_progress']
+        stats['chunks_per_second'] = round(rate, 3)
+        stats['eta_seconds'] = round(remaining / rate, 1) if rate and remaining else (0.0 if not remaining else None)
+        stats['bandwidth_mb'] = round(self.bandwidth / (1024 * 1024), 3)
+        stats['deferred_seconds'] = round(stats['deferred_seconds'], 3)
+        return stats
+
+    def _work(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            try:
+                self._repair(*item)
+            finally:
+                with self._cond:
+                    self._in_progress -= 1
+                    self._completed.append(time.monotonic())
+
+    def _next(self) -> Optional[Tuple[str, str]]:
+        """Block until a chunk is due, taking the one closest to being lost"""
+        with self._cond:
+            while not self._closed:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    eligible_at, seq, file_id, chunk_id = heapq.heappop(self._delayed)
+                    if self._queued.get((file_id, chunk_id)) != eligible_at:
+                        continue
+                    # Prioritised on the state it is in once due, not when it was queued
+                    health = self.health(file_id, chunk_id)
+                    margin = health['readable'] - health['needed'] if health else 0
+                    heapq.heappush(self._ready, (margin, seq, file_id, chunk_id))
+
+                if self._ready:
+                    _, _, file_id, chunk_id = heapq.heappop(self._ready)
+                    del self._queued[(file_id, chunk_id)]
+                    self._in_progress += 1
+                    return file_id, chunk_id
+
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                self._cond.wait(timeout)
+            return None
+
+    def _repair(self, file_id: str, chunk_id: str):
+        with self._cond:
+            verify = (file_id, chunk_id) in self._verify
+            self._verify.discard((file_id, chunk_id))
+        health = self.health(file_id, chunk_id)
+        # A verified chunk is left to repair() to count against the store; it writes nothing
+        # (and the chunk counts as skipped) when enough copies are held, including on suspect nodes
+        if health is None or (not verify and health['readable'] >= (health['shards'] or self.replication_factor)):
+            # Deleted, or back to full redundancy (e.g. its node returned)
+            self._count('skipped')
+            return
+        if health['readable'] < health['needed']:
+            # Nothing left to copy from until a node holding it returns
+            self._count('unrepairable')
+            return
+
+        self._defer_to_foreground()
+        try:
+            written = self.repair(file_id, chunk_id)
+        except Exception as e:
+            # Left for the next failure event or scan; the worker keeps going
+            with self._cond:
+                self.stats['failed'] += 1
+                self.stats['last_error'] = f"{file_id}/{chunk_id}: {e}"
+            return
+        # Nothing written: the store confirmed the chunk was intact
+        self._count('repaired' if written else 'skipped')
+        with self._cond:
+            self.stats['bytes_copied'] += written
+        self._pace(written)
+
+    def _defer_to_foreground(self):
+        """Wait while uploads and downloads are running, but never more than max_deferral"""
+        started = time.monotonic()
+        while self.busy() and time.monotonic() - started < self.max_deferral:
+            time.sleep(0.02)
+        with self._cond:
+            self.stats['deferred_seconds'] += time.monotonic() - started
+
+    def _pace(self, written: int):
+        """Sleep off the bytes just written so repair traffic stays under the bandwidth cap"""
+        if not written or not self.bandwidth:
+            return
+        with self._cond:
+            now = time.monotonic()
+            self._next_send = max(self._next_send, now) + written / self.bandwidth
+            delay = self._next_send - now
+        time.sleep(delay)
+
+    def _count(self, outcome: str):
+        with self._cond:
+            self.stats[outcome] += 1
@@ -0,0 +1,185 @@
+import time
+import threading
+from collections import deque
+from typing import Dict, Any, Callable, Hashable, Iterator
+
+class _Flight:
+    """One producer stream and the recent blocks it produced, shared by its subscribers"""
+
+    def __init__(self, producer: Iterator[bytes], buffer_bytes: int):
+        self.producer = producer
+        self.buffer_bytes = buffer_bytes
+        self.blocks = deque()
+        self.base = 0           # index of blocks[0]
+        self.next_index = 0     # index of the next block the producer yields
+        self.buffered = 0
+        self.subscribers = 0
+        self.pulling = False
+        self.done = False
+        self.error = None
+        self.cond = threading.Condition()
+
+    def join(self) -> bool:
+        """Subscribe from the first block, if it is still buffered; caller holds cond"""
+        if self.done or self.error is not None or self.base > 0:
+            return False
+        self.subscribers += 1
+        return True
+
+class StreamCoalescer:
+    """Single-flight streams: concurrent requests for the same key share one producer.
+
+    Blocks are fanned out from a buffer of at most buffer_bytes. Whichever
+    subscriber needs the next block pulls it from the producer, so the shared
+    stream runs at the pace of its fastest subscriber; one that falls so far
+    behind that its next block has left the buffer continues on a stream of
+    its own, opened at its current byte offset.
+    """
+
+    def __init__(self, buffer_bytes: int = 64 * 1024 * 1024):
+        self.buffer_bytes = buffer_bytes
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'coalesced': 0, 'detached': 0, 'bytes_produced': 0, 'bytes_served': 0,
+                      'leader_first_byte_seconds': 0.0, 'follower_first_byte_seconds': 0.0}
+
+    def stream(self, key: Hashable, open_stream: Callable[[int], Iterator[bytes]]) -> Iterator[bytes]:
+        """Yield the bytes of open_stream(0), sharing them with concurrent streams for the same key"""
+        # Nothing is registered until the response is actually iterated
+        flight, leader = self._subscribe(key, open_stream)
+        started = time.perf_counter()
+        index = 0
+        offset = 0
+        try:
+            while True:
+                block = self._next_block(key, flight, index)
+                if block is None:
+                    return
+                if block is _DETACHED:
+                    yield from self._stream_alone(open_stream, offset)
+                    return
+
+                with self._lock:
+                    if index == 0:
+                        self.stats['leader_first_byte_seconds' if leader else 'follower_first_byte_seconds'] += \
+                            time.perf_counter() - started
+                    self.stats['bytes_served'] += len(block)
+                index += 1
+                offset += len(block)
+                yield block
+        finally:
+            self._leave(key, flight)
+
+    def _subscribe(self, key: Hashable, open_stream: Callable[[int], Iterator[bytes]]) -> tuple:
+        """Join the key's flight while its start is still buffered, or start a new one; returns (flight, leader)"""
+        with self._lock:
+            self.stats['requests'] += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                with flight.cond:
+                    if flight.join():
+                        self.stats['coalesced'] += 1
+                        return flight, False
+
+            flight = _Flight(open_stream(0), self.buffer_bytes)
+            flight.subscribers = 1
+            self._flights[key] = flight
+            return flight, True
+
+    def _stream_alone(self, open_stream: Callable[[int], Iterator[bytes]], offset: int) -> Iterator[bytes]:
+        """Finish a detached subscriber's download from its own stream"""
+        with self._lock:
+            self.stats['detached'] += 1
+        for block in open_stream(offset):
+            with self._lock:
+                self.stats['bytes_produced'] += len(block)
+                self.stats['bytes_served'] += len(block)
+            yield block
+
+    def _next_block(self, key: Hashable, flight: _Flight, index: int):
+        """Block number index of the flight, pulling it from the producer if nobody has yet"""
+        while True:
+            with flight.cond:
+                while True:
+                    if index < flight.base:
+                        return _DETACHED
+                    if index < flight.next_index:
+                        return flight.blocks[index - flight.base]
+                    if flight.error is not None:
+                        raise flight.error
+                    if flight.done:
+                        return None
+                    if not flight.pulling:
+                        flight.pulling = True
+                        break
+                    flight.cond.wait()
+
+            # Pull outside the lock so other subscribers can keep reading the buffer
+            block, error = None, None
+            try:
+                block = next(flight.producer)
+            except StopIteration:
+                pass
+            except Exception as e:
+                error = e
+
+            with flight.cond:
+                flight.pulling = False
+                if error is not None:
+                    flight.error = error
+                elif block is None:
+                    flight.done = True
+                else:
+                    flight.blocks.append(block)
+                    flight.next_index += 1
+                    flight.buffered += len(block)
+                    # Keep the newest block even if it alone exceeds the budget
+                    while flight.buffered > flight.buffer_bytes and len(flight.blocks) > 1:
+                        flight.buffered -= len(flight.blocks.popleft())
+                        flight.base += 1
+                abandoned = flight.subscribers == 0
+                flight.cond.notify_all()
+
+            if block is not None:
+                with self._lock:
+                    self.stats['bytes_produced'] += len(block)
+            if error is not None or block is None or abandoned:
+                self._retire(key, flight)
+
+    def _leave(self, key: Hashable, flight: _Flight):
+        with flight.cond:
+            flight.subscribers -= 1
+            finished = flight.subscribers == 0 and not flight.pulling
+        if finished:
+            self._retire(key, flight)
+
+    def _retire(self, key: Hashable, flight: _Flight):
+        """Stop sharing a flight and close its producer once nobody is pulling from it"""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        with flight.cond:
+            close = flight.subscribers == 0 and not flight.pulling
+        if close and hasattr(flight.producer, 'close'):
+            flight.producer.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Coalescing counters since startup, with the work saved and first-byte latencies"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['active_flights'] = len(self._flights)
+
+        leaders = stats['requests'] - stats['coalesced']
+        leader_seconds = stats.pop('leader_first_byte_seconds')
+        follower_seconds = stats.pop('follower_first_byte_seconds')
+        stats['hit_ratio'] = stats['coalesced'] / stats['requests'] if stats['requests'] else 0.0
+        stats['bytes_saved'] = max(0, stats['bytes_served'] - stats['bytes_produced'])
+        stats['leader_first_byte_ms'] = round(leader_seconds / leaders * 1000, 3) if leaders else 0.0
+        stats['follower_first_byte_ms'] = round(follower_seconds / stats['coalesced'] * 1000, 3) if stats['coalesced'] else 0.0
+        return stats
+
+# Marks a subscriber whose next block has already left the shared buffer
+_DETACHED = object()
+
+# Global instance
+download_coalescer = StreamCoalescer()
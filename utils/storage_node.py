@@ -0,0 +1,389 @@
+import os
+import sys
+import json
+import time
+import atexit
+import signal
+import socket
+import argparse
+import threading
+import subprocess
+import http.client
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, unquote
+from typing import List, Dict, Any, Optional
+
+from .logging_utils import error_handler
+
+# Errors that mean a pooled keep-alive connection went stale and the request can be retried
+_STALE_CONNECTION = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+class NodeUnavailable(IOError):
+    """A storage node could not be reached or refused a request"""
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+class NodeClient:
+    """Keep-alive HTTP client for one storage node, reusing up to max_idle connections"""
+
+    def __init__(self, address: str, max_idle: int = 16, timeout: float = 30.0):
+        # 'host:port', or a Unix socket path
+        self.address = address
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'connections_opened': 0, 'connections_reused': 0}
+
+    def put(self, object_id: str, data: bytes):
+        status, _ = self._request('PUT', _object_path(object_id), data)
+        if status != 201:
+            raise NodeUnavailable(f"{self.address} refused {object_id}: HTTP {status}")
+
+    def get(self, object_id: str) -> Optional[bytes]:
+        status, body = self._request('GET', _object_path(object_id))
+        if status == 404:
+            return None
+        if status != 200:
+            raise NodeUnavailable(f"{self.address} failed to read {object_id}: HTTP {status}")
+        return body
+
+    def has(self, object_id: str) -> bool:
+        status, _ = self._request('HEAD', _object_path(object_id))
+        return status == 200
+
+    def delete(self, object_id: str) -> bool:
+        status, _ = self._request('DELETE', _object_path(object_id))
+        return status == 204
+
+    def sync(self):
+        """Ask the node to make its writes durable"""
+        self._request('POST', '/sync')
+
+    def node_stats(self) -> Dict[str, Any]:
+        _, body = self._request('GET', '/stats')
+        return json.loads(body)
+
+    def ping(self, timeout: float = 1.0) -> bool:
+        """Whether the node answers within timeout, on a connection of its own so a hung node cannot hold a pooled one"""
+        connection = self._new_connection(timeout)
+        try:
+            connection.request('GET', '/stats')
+            response = connection.getresponse()
+            response.read()
+            return response.status == 200
+        except (OSError, http.client.HTTPException):
+            return False
+        finally:
+            connection.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def _request(self, method: str, path: str, body: bytes = None) -> tuple:
+        """(status, body) of one request over a pooled connection"""
+        connection, reused = self._checkout()
+        try:
+            try:
+                response = self._send(connection, method, path, body)
+            except _STALE_CONNECTION:
+                if not reused:
+                    raise
+                # The node closed an idle connection; retry once on a fresh one
+                connection.close()
+                connection, reused = self._connect(), False
+                response = self._send(connection, method, path, body)
+            data = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            connection.close()
+            raise NodeUnavailable(f"{self.address}: {e}") from e
+
+        if response.will_close:
+            connection.close()
+        else:
+            self._checkin(connection)
+        return response.status, data
+
+    def _send(self, connection: http.client.HTTPConnection, method: str, path: str, body: bytes):
+        headers = {'Content-Length': str(len(body))} if body is not None else {}
+        connection.request(method, path, body=body, headers=headers)
+        return connection.getresponse()
+
+    def _checkout(self) -> tuple:
+        with self._lock:
+            self.stats['requests'] += 1
+            if self._idle:
+                self.stats['connections_reused'] += 1
+                return self._idle.pop(), True
+        return self._connect(), False
+
+    def _checkin(self, connection: http.client.HTTPConnection):
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        with self._lock:
+            self.stats['connections_opened'] += 1
+        return self._new_connection(self.timeout)
+
+    def _new_connection(self, timeout: float) -> http.client.HTTPConnection:
+        host, _, port = self.address.rpartition(':')
+        if host and port.isdigit():
+            return http.client.HTTPConnection(host, int(port), timeout=timeout)
+        return _UnixHTTPConnection(self.address, timeout)
+
+class NodeCluster:
+    """Storage-node daemons, one process per node, each keeping objects under <root>/<node_id>.
+
+    Works as the object backend of DistributionUtils (like a PackStore):
+    put() sends a replica to its node and returns a location naming the
+    cluster root, which read_object/object_exists/delete_object resolve
+    through open_node_cluster. Nodes listen on <root>/<node_id>/node.sock
+    unless an address is given for them ('host:port' for remote nodes).
+    """
+
+    def __init__(self, root: str, addresses: Dict[str, str] = None):
+        self.root = root
+        self.addresses = dict(addresses or {})
+        os.makedirs(root, exist_ok=True)
+
+        self._clients = {}
+        self._processes = {}
+        self._dirty = set()     # nodes with writes awaiting sync
+        self._lock = threading.Lock()
+        self._sync_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='node-sync')
+
+    def address(self, node_id: str) -> str:
+        return self.addresses.get(node_id) or os.path.join(self.root, node_id, 'node.sock')
+
+    def client(self, node_id: str) -> NodeClient:
+        with self._lock:
+            client = self._clients.get(node_id)
+            if client is None:
+                client = self._clients[node_id] = NodeClient(self.address(node_id))
+            return client
+
+    def start(self, node_ids: List[str], timeout: float = 10.0):
+        """Launch a daemon for every node that is not already answering"""
+        package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [package_parent, os.environ.get('PYTHONPATH')])))
+
+        started = []
+        for node_id in node_ids:
+            if self.client(node_id).ping():
+                continue
+            node_root = os.path.join(self.root, node_id)
+            os.makedirs(node_root, exist_ok=True)
+            process = subprocess.Popen(
+                [sys.executable, '-c', 'from utils.storage_node import main; main()', '--node-id', node_id,
+                 '--root', node_root, '--socket', self.address(node_id)],
+                env=env, stdin=subprocess.DEVNULL
+            )
+            with self._lock:
+                self._processes[node_id] = process
+            started.append(node_id)
+
+        deadline = time.monotonic() + timeout
+        for node_id in started:
+            while not self.client(node_id).ping():
+                if self._processes[node_id].poll() is not None or time.monotonic() > deadline:
+                    raise NodeUnavailable(f"Storage node {node_id} did not start")
+                time.sleep(0.02)
+        if started:
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Terminate the daemons this cluster launched"""
+        with self._lock:
+            processes, self._processes = self._processes, {}
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def put(self, node_id: str, object_id: str, data: bytes) -> Dict[str, Any]:
+        """Store an object on a node; it is durable after the next sync()"""
+        self.client(node_id).put(object_id, data)
+        with self._lock:
+            self._dirty.add(node_id)
+        return {'node_id': node_id, 'chunk_file': object_id, 'nodes': self.root}
+
+    def get(self, node_id: str, object_id: str) -> Optional[bytes]:
+        return self.client(node_id).get(object_id)
+
+    def contains(self, node_id: str, object_id: str) -> bool:
+        """Whether the node holds the object; an unreachable node holds nothing readable"""
+        try:
+            return self.client(node_id).has(object_id)
+        except NodeUnavailable:
+            return False
+
+    def delete(self, node_id: str, object_id: str):
+        """Best-effort delete; an unreachable node keeps an orphan until it is cleaned up"""
+        try:
+            self.client(node_id).delete(object_id)
+        except NodeUnavailable as e:
+            error_handler.handle_node_error(node_id, f"Failed to delete {object_id}: {e}")
+            return
+        with self._lock:
+            self._dirty.add(node_id)
+
+    def sync(self):
+        """Make every write so far durable, syncing the nodes in parallel"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        futures = [self._sync_pool.submit(self.client(node_id).sync) for node_id in dirty]
+        for future in futures:
+            future.result()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-node object counts from the daemons, plus connection reuse of their clients"""
+        with self._lock:
+            node_ids = sorted(set(self._clients) | set(self.addresses) | set(self._processes))
+        nodes = {}
+        for node_id in node_ids:
+            client = self.client(node_id)
+            try:
+                nodes[node_id] = {'status': 'up', **client.node_stats()}
+            except NodeUnavailable:
+                nodes[node_id] = {'status': 'unreachable'}
+            nodes[node_id]['client'] = dict(client.stats)
+            process = self._processes.get(node_id)
+            if process is not None:
+                nodes[node_id]['pid'] = process.pid
+        return {'root': self.root, 'nodes': nodes}
+
+_node_clusters = {}
+_node_clusters_lock = threading.Lock()
+
+def open_node_cluster(root: str, **options) -> NodeCluster:
+    """The shared NodeCluster for a directory; node locations find their cluster through this"""
+    with _node_clusters_lock:
+        if root not in _node_clusters:
+            _node_clusters[root] = NodeCluster(root, **options)
+        return _node_clusters[root]
+
+def _object_path(object_id: str) -> str:
+    return '/objects/' + quote(object_id, safe='')
+
+# Node daemon
+
+# Pack segments live in <root>/packs next to the daemon's index and socket
+_SEGMENTS = 'packs'
+
+class _StorageNodeHandler(BaseHTTPRequestHandler):
+    """Chunk protocol: PUT/GET/HEAD/DELETE /objects/<id>, POST /sync, GET /stats"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_PUT(self):
+        object_id = self._object_id()
+        if object_id is None:
+            return self._reply(404)
+        data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.store.put(_SEGMENTS, object_id, data)
+        self._reply(201)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            stats = {'node_id': self.server.node_id, 'pid': os.getpid(), **self.server.store.get_stats()}
+            return self._reply(200, json.dumps(stats).encode(), 'application/json')
+        object_id = self._object_id()
+        data = self.server.store.get(object_id) if object_id is not None else None
+        if data is None:
+            return self._reply(404)
+        self._reply(200, data)
+
+    def do_HEAD(self):
+        object_id = self._object_id()
+        self._reply(200 if object_id is not None and self.server.store.contains(object_id) else 404)
+
+    def do_DELETE(self):
+        object_id = self._object_id()
+        self._reply(204 if object_id is not None and self.server.store.delete(object_id) else 404)
+
+    def do_POST(self):
+        if self.path != '/sync':
+            return self._reply(404)
+        self.server.store.sync()
+        self._reply(204)
+
+    def _object_id(self) -> Optional[str]:
+        if not self.path.startswith('/objects/'):
+            return None
+        return unquote(self.path[len('/objects/'):])
+
+    def _reply(self, status: int, body: bytes = b'', content_type: str = 'application/octet-stream'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Requests are too frequent to log; errors still reach stderr
+        pass
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def serve(node_id: str, root: str, socket_path: str = None, port: int = None):
+    """Run a storage node until SIGTERM, keeping its objects in a pack store under root"""
+    from .pack_store import PackStore
+
+    store = PackStore(root)
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = _UnixHTTPServer(socket_path, _StorageNodeHandler)
+    else:
+        server = ThreadingHTTPServer(('127.0.0.1', port or 0), _StorageNodeHandler)
+        server.daemon_threads = True
+    server.store = store
+    server.node_id = node_id
+
+    def shut_down(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, shut_down)
+    signal.signal(signal.SIGINT, shut_down)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        store.sync()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Storage node daemon')
+    parser.add_argument('--node-id', required=True)
+    parser.add_argument('--root', required=True)
+    parser.add_argument('--socket', help='Unix socket path to listen on')
+    parser.add_argument('--port', type=int, help='TCP port on 127.0.0.1, when not using a socket')
+    args = parser.parse_args(argv)
+    serve(args.node_id, args.root, args.socket, args.port)
+
+if __name__ == '__main__':
+    # python -m utils.storage_node --node-id node-01 --root files_distributed/nodes/node-01 --socket ...
+    main()
@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import uuid
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Callable, Optional
+
+from .logging_utils import secure_logger
+
+OPEN = 'open'
+COMMITTING = 'committing'
+ABORTING = 'aborting'
+
+class UploadSessionManager:
+    """Tracks resumable, chunk-addressed upload sessions.
+
+    A session is persisted as a small header (<id>.json), rewritten only when
+    its state changes, plus an append-only log of acknowledged chunks
+    (<id>.chunks, one JSON record per line), so each chunk costs one short
+    append however large the upload. Only open sessions take chunks; commit
+    and abort first claim the session (open -> committing / aborting) under
+    the lock, so exactly one of them gets to act on its chunks. Chunk bytes
+    are written outside the lock; a claim waits for the writes the session
+    already admitted.
+    """
+
+    def __init__(self, sessions_dir: str = 'upload_sessions'):
+        self.sessions_dir = sessions_dir
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._writes_done = threading.Condition(self._lock)
+        self._writing = {}          # upload_id -> chunk writes admitted but not yet recorded
+        self._sweeper = None
+        self._stopping = threading.Event()
+        os.makedirs(sessions_dir, exist_ok=True)
+
+    def create_session(self, mode: str, filename: str, file_size: int, chunk_size: int,
+                       hash_algorithm: str = 'md5') -> Dict[str, Any]:
+        """Start a new upload session for a file of known size"""
+        if file_size < 0:
+            raise ValueError("file_size must be non-negative")
+
+        session = {
+            'upload_id': str(uuid.uuid4()),
+            'mode': mode,
+            'filename': filename,
+            'file_size': file_size,
+            'chunk_size': chunk_size,
+            'hash_algorithm': hash_algorithm,
+            'total_chunks': (file_size + chunk_size - 1) // chunk_size,
+            'created_at': datetime.now().isoformat(),
+            'state': OPEN,
+            'chunks': {}
+        }
+
+        with self._lock:
+            self._sessions[session['upload_id']] = session
+            self._save_header(session)
+
+        return session
+
+    def get_session(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        """Get a session by id, loading it from disk after a restart"""
+        with self._lock:
+            return self._get_session(upload_id)
+
+    def expected_chunk_size(self, session: Dict[str, Any], sequence: int) -> int:
+        """Size the chunk at this sequence must have (only the last one may be short)"""
+        if sequence < 0 or sequence >= session['total_chunks']:
+            raise ValueError(f"Chunk {sequence} is out of range for {session['total_chunks']} chunks")
+
+        start = sequence * session['chunk_size']
+        return min(session['chunk_size'], session['file_size'] - start)
+
+    def has_chunk(self, upload_id: str, sequence: int, chunk_hash: str) -> bool:
+        """Check whether an identical chunk was already acknowledged"""
+        with self._lock:
+            session = self._get_session(upload_id)
+            chunk_info = session['chunks'].get(str(sequence)) if session else None
+            return chunk_info is not None and chunk_info['hash'] == chunk_hash
+
+    def record_chunk(self, upload_id: str, chunk_info: Dict[str, Any],
+                     write: Callable[[], None] = None) -> Optional[Dict[str, Any]]:
+        """Acknowledge a stored chunk, returning the record it replaced if any.
+
+        write, if given, stores the chunk once the session is known to be open,
+        for data a commit reads in place; it runs outside the lock, so chunks of
+        one or many sessions are written in parallel. Raises KeyError if the
+        session is gone and ValueError if it is no longer open; a chunk the
+        caller stored beforehand is then still its own to release.
+        """
+        with self._lock:
+            session = self._get_session(upload_id)
+            if session is None:
+                raise KeyError(upload_id)
+            if session['state'] != OPEN:
+                raise ValueError(f"Upload session is {session['state']}")
+            if write is None:
+                return self._append_chunk(session, chunk_info)
+            self._writing[upload_id] = self._writing.get(upload_id, 0) + 1
+
+        try:
+            write()
+            with self._lock:
+                # Admitted while open: a claim made since waits for this record
+                return self._append_chunk(self._get_session(upload_id), chunk_info)
+        finally:
+            with self._lock:
+                self._writing[upload_id] -= 1
+                if not self._writing[upload_id]:
+                    del self._writing[upload_id]
+                    self._writes_done.notify_all()
+
+    def missing_chunks(self, session: Dict[str, Any]) -> List[int]:
+        """List the chunk sequences that have not been acknowledged yet"""
+        return [i for i in range(session['total_chunks']) if str(i) not in session['chunks']]
+
+    def ordered_chunks(self, session: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Acknowledged chunks sorted by sequence"""
+        return [session['chunks'][str(i)] for i in range(session['total_chunks'])
+                if str(i) in session['chunks']]
+
+    def claim(self, upload_id: str, state: str, **fields) -> Optional[Dict[str, Any]]:
+        """Move an open session to state (committing or aborting), recording fields with it.
+
+        Returns the session, or None if it is missing or another request
+        already claimed it; its chunks no longer change once claimed.
+        """
+        with self._lock:
+            session = self._get_session(upload_id)
+            if session is None or session['state'] != OPEN:
+                return None
+            session.update(fields, state=state)
+            self._save_header(session)
+            # Chunks already being written are still recorded before the caller reads them
+            while upload_id in self._writing:
+                self._writes_done.wait()
+            return session
+
+    def reopen(self, upload_id: str):
+        """Hand a claimed session back, e.g. after a commit found chunks missing"""
+        with self._lock:
+            session = self._get_session(upload_id)
+            if session is not None and session['state'] != OPEN:
+                session['state'] = OPEN
+                self._save_header(session)
+
+    def expire(self, ttl_seconds: float) -> List[Dict[str, Any]]:
+        """Sessions untouched for ttl_seconds, open ones claimed as aborting on the way.
+
+        Sessions found committing or aborting were claimed by a request that
+        never finished (the process stopped), and are returned as they are.
+        """
+        cutoff = time.time() - ttl_seconds
+        expired = []
+        with self._lock:
+            for name in os.listdir(self.sessions_dir):
+                upload_id, ext = os.path.splitext(name)
+                if ext != '.json':
+                    continue
+                session = self._get_session(upload_id)
+                if session is None or upload_id in self._writing or self._last_activity(upload_id) > cutoff:
+                    continue
+                if session['state'] == OPEN:
+                    session['state'] = ABORTING
+                    self._save_header(session)
+                expired.append(session)
+        return expired
+
+    def start_sweeper(self, ttl_seconds: float, on_expired: Callable[[Dict[str, Any]], None],
+                      interval: float = 300.0):
+        """Every interval, pass each session idle for ttl_seconds to on_expired, which must delete it"""
+        def run():
+            while not self._stopping.wait(interval):
+                try:
+                    expired = self.expire(ttl_seconds)
+                except Exception as e:
+                    secure_logger.log_error('Upload session sweep failed', 'upload_sessions', e)
+                    continue
+                for session in expired:
+                    try:
+                        on_expired(session)
+                    except Exception as e:
+                        # Left claimed, and retried on the next pass
+                        secure_logger.log_error(f"Failed to expire upload session {session['upload_id']}",
+                                                'upload_sessions', e)
+
+        self._sweeper = threading.Thread(target=run, name='upload-session-sweeper', daemon=True)
+        self._sweeper.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def delete_session(self, upload_id: str):
+        """Forget a finished or aborted session"""
+        with self._lock:
+            self._sessions.pop(upload_id, None)
+            try:
+                paths = (self._session_path(upload_id), self._chunks_path(upload_id))
+            except ValueError:
+                return
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _get_session(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a session, caller must hold the lock"""
+        if upload_id in self._sessions:
+            return self._sessions[upload_id]
+
+        try:
+            session_path = self._session_path(upload_id)
+        except ValueError:
+            return None  # Not a valid upload id
+
+        if not os.path.exists(session_path):
+            return None
+
+        with open(session_path, 'r') as f:
+            session = json.load(f)
+        chunks_path = self._chunks_path(upload_id)
+        session['chunks'] = {}
+        if os.path.exists(chunks_path):
+            with open(chunks_path, 'rb+') as f:
+                for line in iter(f.readline, b''):
+                    try:
+                        chunk_info = json.loads(line)
+                    except ValueError:
+                        # A torn last record from a crash mid-append; cut it so the next append starts clean
+                        f.truncate(f.tell() - len(line))
+                        break
+                    session['chunks'][str(chunk_info['sequence'])] = chunk_info
+        self._sessions[upload_id] = session
+        return session
+
+    def _last_activity(self, upload_id: str) -> float:
+        """When a session's header or chunk log was last written"""
+        paths = (self._session_path(upload_id), self._chunks_path(upload_id))
+        return max(os.path.getmtime(path) for path in paths if os.path.exists(path))
+
+    def _session_path(self, upload_id: str) -> str:
+        """Path of the JSON file persisting a session's header"""
+        return os.path.join(self.sessions_dir, f"{uuid.UUID(upload_id)}.json")
+
+    def _chunks_path(self, upload_id: str) -> str:
+        """Path of the append-only log of a session's chunks"""
+        return os.path.join(self.sessions_dir, f"{uuid.UUID(upload_id)}.chunks")
+
+    def _append_chunk(self, session: Dict[str, Any], chunk_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Add a chunk to a session and its log, caller must hold the lock"""
+        key = str(chunk_info['sequence'])
+        previous = session['chunks'].get(key)
+        session['chunks'][key] = chunk_info
+        with open(self._chunks_path(session['upload_id']), 'a') as f:
+            f.write(json.dumps(chunk_info, default=str) + '\n')
+        return previous
+
+    def _save_header(self, session: Dict[str, Any]):
+        """Persist a session without its chunks, which live in the chunk log"""
+        tmp_path = self._session_path(session['upload_id']) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({k: v for k, v in session.items() if k != 'chunks'}, f, default=str)
+        os.replace(tmp_path, self._session_path(session['upload_id']))
+
+# Global upload session manager
+upload_session_manager = UploadSessionManager()